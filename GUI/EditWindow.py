@@ -4,8 +4,8 @@ from functools import partial
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QGraphicsScene, QGraphicsView, QAction,
     QFileDialog, QColorDialog, QGraphicsTextItem, QInputDialog, QToolBar,
-    QComboBox, QLabel, QListWidget, QListWidgetItem, QVBoxLayout, QHBoxLayout,
-    QWidget, QCheckBox, QPushButton, QMessageBox, QToolButton
+    QComboBox, QLabel, QListView, QVBoxLayout, QHBoxLayout,
+    QWidget, QPushButton, QMessageBox, QToolButton
 )
 from PyQt5.QtGui import (
     QPen, QBrush, QPixmap, QPainterPath, QFont, QImage, QPainter, QPolygonF,
@@ -13,6 +13,10 @@ from PyQt5.QtGui import (
 )
 from PyQt5.QtCore import Qt, QPointF, QRectF, pyqtSignal
 
+from utils.annotations import AnnotationStore
+from utils.image_store import acquire_image, release_image
+from utils.detection_list import DetectionListModel, setup_detection_view
+
 
 class PaintView(QGraphicsView):
     """
@@ -62,9 +66,9 @@ class PaintApp(QMainWindow):
     Allows loading images, drawing various shapes, erasing, and managing annotations.
     Includes a checklist for drawn items.
     """
-    save_result = pyqtSignal(object, list)  # Signal to emit QPixmap and checklist on save
+    save_result = pyqtSignal(object, object)  # Signal to emit QPixmap and AnnotationStore on save
 
-    def __init__(self, bbox_checklist=None):
+    def __init__(self, annotations=None):
         super().__init__()
         screen = QApplication.primaryScreen().availableGeometry()
         self.setWindowTitle("PyQt5 Paint App (Image Annotation Tool)")
@@ -74,7 +78,13 @@ class PaintApp(QMainWindow):
         self.view = PaintView(self.scene, parent=self)
 
         # --- Right column with Select All button and Checklist ---
-        self.coord_list = QListWidget()
+        # The checklist is a view over the AnnotationStore being edited
+        self.store = annotations if annotations is not None else AnnotationStore()
+        # Copied or partly deleted boxes keep their old numbers; the checklist shows 1..n
+        self.store.renumber()
+        self.coord_model = DetectionListModel(self.store, self)
+        self.coord_list = QListView()
+        setup_detection_view(self.coord_list, self.coord_model)
         self.select_all_btn = QPushButton("Select All")
         self.select_all_btn.setCheckable(True)
         self.select_all_btn.clicked.connect(self.toggle_select_all)
@@ -107,12 +117,13 @@ class PaintApp(QMainWindow):
         self.brush = QBrush(self.fill_color)
 
         self.image_loaded = False
+        self.image_path = None  # held in the shared image store while the window is open
         self.coord_label = QLabel("X: -, Y: -")
         self.statusBar().addPermanentWidget(self.coord_label)
         self.last_image_pos = None
-        self.bbox_graphics_items = {}
-        # Mapping between QGraphicsItem and QListWidgetItem for easy lookup
-        self.item_to_listitem = {}  # QGraphicsItem -> QListWidgetItem
+        # Shapes drawn for the checked annotations, both ways for easy lookup
+        self.graphics_items = {}  # annotation id -> QGraphicsItem
+        self.item_ids = {}  # QGraphicsItem -> annotation id
 
         # Predefined defect classes for annotations
         self.defect_classes = ['crack', 'lof', 'lop', 'overlap', 'porosity', 'slag', 'spattering', 'undercut']
@@ -128,8 +139,8 @@ class PaintApp(QMainWindow):
         }
 
         self._create_toolbar()
-        if bbox_checklist:
-            self.add_checklist_to_coord_list(bbox_checklist)
+        self.store.reset.connect(self.sync_scene)
+        self.store.changed.connect(self.sync_scene)
 
     def _create_toolbar(self):
         """
@@ -293,6 +304,13 @@ class PaintApp(QMainWindow):
             self.prompt_manual_model("freehand", points)
         # Polygon finalization is handled by its own controls
 
+    def closeEvent(self, event):
+        """Lets the shared image store evict the image once no window shows it."""
+        if self.image_path:
+            release_image(self.image_path)
+            self.image_path = None
+        super().closeEvent(event)
+
     def keyPressEvent(self, ev):
         """Handles key press events for finalizing polygon drawing."""
         if self.mode == "polygon" and ev.key() == Qt.Key_Return and len(self.current_polygon) >= 3:
@@ -301,12 +319,23 @@ class PaintApp(QMainWindow):
     def load_image(self, fname):
         """Loads an image from a file path into the QGraphicsScene."""
         if fname:
+            image = acquire_image(fname)
+            if image is None:
+                QMessageBox.warning(self, "Load Image", f"Could not read {fname}")
+                return
+            if self.image_path:
+                release_image(self.image_path)
+            self.image_path = fname
             self.scene.clear()
-            pix = QPixmap(fname)
+            pix = QPixmap.fromImage(image)
             self.image_item = self.scene.addPixmap(pix)
             self.image_item.setZValue(0)
             self.scene.setSceneRect(QRectF(pix.rect()))
             self.image_loaded = True
+            # scene.clear() deleted the shapes; draw the checked annotations again
+            self.graphics_items.clear()
+            self.item_ids.clear()
+            self.sync_scene()
 
     def save_drawing(self):
         """Saves the current drawing and checklist data."""
@@ -318,23 +347,7 @@ class PaintApp(QMainWindow):
         painter.end()
         pixmap = QPixmap.fromImage(image)
 
-        checklist = []
-        for i in range(self.coord_list.count()):
-            widget = self.coord_list.itemWidget(self.coord_list.item(i))
-            if widget:
-                checkbox = widget.findChild(QCheckBox, "CheckBox_bbox")
-                if checkbox:
-                    checklist.append({
-                        "bbox": checkbox.property("bbox"),
-                        "defect_class": checkbox.property("defect_class"),
-                        "confidence": checkbox.property("confidence"),
-                        "text": checkbox.text(),
-                        "checked": checkbox.isChecked(),
-                        "points": checkbox.property("points"),  
-                        "shape_type": checkbox.property("shape_type")
-                    })
-
-        self.save_result.emit(pixmap, checklist)
+        self.save_result.emit(pixmap, self.store)
         self.close()
 
     def zoom_in(self):
@@ -360,196 +373,62 @@ class PaintApp(QMainWindow):
         else:
             self.coord_label.setText("X: -, Y: -")
             
-    def add_checklist_to_coord_list(self, checklist):
-        """Populates the checklist from an external list of annotations."""
-        self.coord_list.clear()
-        self.bbox_graphics_items.clear()   # <-- add this
-        self.item_to_listitem.clear()      # <-- add this
-
-        for idx, item in enumerate(checklist, 1):
-            container = QWidget()
-            v_layout = QVBoxLayout(container)
-            v_layout.setContentsMargins(0, 0, 0, 0)
-            v_layout.setSpacing(2)
-
-            top_row = QHBoxLayout()
-            checkbox = QCheckBox()
-            check_state = item.get("checked", False)
-            checkbox.setChecked(not check_state)
-            checkbox.setObjectName("CheckBox_bbox")
-            top_row.addWidget(checkbox)
-            
-            box_label = QLabel(f"<b><span style='color:#d32f2f;'>Box: {idx}</span></b>")
-            box_label.setTextFormat(Qt.RichText)
-            box_label.setProperty("label_type", "box_number")
-            top_row.addWidget(box_label)
-            top_row.addStretch()
-            v_layout.addLayout(top_row)
-
-            defect = item.get("defect_class", "")
-            conf = item.get("confidence", "")
-            shape_type = item.get("shape_type", "rectangle")
-            bbox = item.get("bbox", [0, 0, 0, 0]) if shape_type in ("rectangle", "circle") else None
-            points = item.get("points", None)
-
-            if shape_type in ("rectangle", "circle") and bbox is not None:
-                x, y, w, h = bbox
-                details = (
-                    f"Type of Defect: {defect}<br>"
-                    f"Confidence: {conf}<br>"
-                    f"x: {x},<br>y: {y},<br>w: {w},<br>h: {h}"
-                )
-            elif shape_type in ("polygon", "freehand") and points:
-                pts_list = [f"({int(p.x())},{int(p.y())})" for p in points]
-                pts_wrapped = "<br>".join([", ".join(pts_list[i:i + 4]) for i in range(0, len(pts_list), 4)])
-                details = (
-                    f"Type of Defect: {defect}<br>"
-                    f"Confidence: {conf}<br>"
-                    f"{shape_type.capitalize()}:<br>{pts_wrapped}"
-                )
-            else:
-                details = f"Type of Defect: {defect}<br>Confidence: {conf}"
-
-            details_label = QLabel(f"<span style='color:white;'>{details}</span>")
-            details_label.setTextFormat(Qt.RichText)
-            details_label.setStyleSheet("background: #222; border-radius: 4px; padding: 4px;")
-            v_layout.addWidget(details_label)
-
-            lw_item = QListWidgetItem()
-            lw_item.setSizeHint(container.sizeHint())
-            self.coord_list.addItem(lw_item)
-            self.coord_list.setItemWidget(lw_item, container)
-
-            checkbox.stateChanged.connect(lambda state, cb=checkbox: self.toggle_bbox_rect(state, cb))
-
-            checkbox.setProperty("bbox", bbox if shape_type in ("rectangle", "circle") else None)
-            checkbox.setProperty("points", points if shape_type in ("polygon", "freehand") else None)
-            checkbox.setProperty("manual", item.get("manual", False))
-            checkbox.setProperty("defect_class", defect)
-            checkbox.setProperty("shape_type", shape_type)
-            checkbox.setProperty("confidence", conf)
-            
-            if check_state:
-                if shape_type in ("rectangle", "circle"):
-                    self.draw_bbox_rect(bbox, idx - 1, shape_type=shape_type)
-                elif shape_type == "polygon" and points:
-                    pen = QPen(QColor(*self.class_colors.get(defect, (255, 0, 0))), self.pen_width)
-                    item_poly = self.scene.addPolygon(QPolygonF(points), pen, self.brush)
-                    item_poly.setZValue(1)
-                    self.bbox_graphics_items[idx - 1] = item_poly
-                    self.item_to_listitem[item_poly] = lw_item
-                elif shape_type == "freehand" and points:
-                    pen = QPen(QColor(*self.class_colors.get(defect, (255, 0, 0))), self.pen_width)
-                    path = QPainterPath(points[0])
-                    for p in points[1:]:
-                        path.lineTo(p)
-                    item_path = self.scene.addPath(path, pen)
-                    item_path.setZValue(1)
-                    self.bbox_graphics_items[idx - 1] = item_path
-                    self.item_to_listitem[item_path] = lw_item
-
-    def draw_bbox_rect(self, bbox, idx, shape_type="rectangle"):
-        """Draws a shape on the scene."""
-        if not self.image_loaded or not (isinstance(bbox, (list, tuple)) and len(bbox) == 4):
-            return
-
-        if not hasattr(self, "bbox_graphics_items"):
-            self.bbox_graphics_items = {}
-
-        if old_item := self.bbox_graphics_items.pop(idx, None):
-            if old_item.scene():
-                self.scene.removeItem(old_item)
-
-        x, y, w, h = bbox
-
-        widget = self.coord_list.itemWidget(self.coord_list.item(idx))
-        defect_class = widget.findChild(QCheckBox, "CheckBox_bbox").property("defect_class") if widget else ""
-        is_manual = widget.findChild(QCheckBox, "CheckBox_bbox").property("manual") if widget else False
-        color = self.class_colors.get(defect_class, (255, 0, 0))
-        pen = QPen(QColor(*color), 2)
-
-        new_item = None
-        if shape_type == "circle":
-            new_item = self.scene.addEllipse(x, y, int(w), int(h), pen)
-        else:  # Default to rectangle
-            new_item = self.scene.addRect(x, y, int(w), int(h), pen)
-
-        if new_item:
-            new_item.setZValue(1)
-            self.bbox_graphics_items[idx] = new_item
-            list_item = self.coord_list.item(idx)
-            self.item_to_listitem[new_item] = list_item
-
-    def remove_bbox_rect(self, idx):
-        """Removes a shape from the scene."""
-        if hasattr(self, "bbox_graphics_items"):
-            if item := self.bbox_graphics_items.pop(idx, None):
-                if item.scene():
-                    self.scene.removeItem(item)
-                self.item_to_listitem.pop(item, None)
-
-    def toggle_bbox_rect(self, state, checkbox):
-        """Toggles the visibility of the matching shape when the user (un)checks a box."""
-        idx = None
-        for i in range(self.coord_list.count()):
-            widget = self.coord_list.itemWidget(self.coord_list.item(i))
-            if widget and widget.findChild(QCheckBox, "CheckBox_bbox") is checkbox:
-                idx = i
-                break
-        if idx is None:
+    def sync_scene(self, ids=None):
+        """Draws the checked annotations (all, or those in ``ids``) and removes the rest from the scene."""
+        if not self.image_loaded:
             return
-
-        shape_type = checkbox.property("shape_type") or "rectangle"
-
-        defect_class = checkbox.property("defect_class") or ""
-        color = self.class_colors.get(defect_class, (255, 0, 0))
-        pen = QPen(QColor(*color), self.pen_width)
-
-        if state == Qt.Checked:
-            if shape_type == "polygon":
-                coords = checkbox.property("points")
-                if coords:
-                    item = self.scene.addPolygon(QPolygonF(coords), pen, self.brush)
-                    item.setZValue(1)
-                    self.bbox_graphics_items[idx] = item
-                    list_item = self.coord_list.item(idx)
-                    self.item_to_listitem[item] = list_item
-            elif shape_type == "freehand":
-                coords = checkbox.property("points")
-                if coords:
-                    path = QPainterPath(coords[0])
-                    for p in coords[1:]:
-                        path.lineTo(p)
-                    item = self.scene.addPath(path, pen)
-                    item.setZValue(1)
-                    self.bbox_graphics_items[idx] = item
-                    list_item = self.coord_list.item(idx)
-                    self.item_to_listitem[item] = list_item
+        if ids is None:
+            for ann_id in [i for i in self.graphics_items if i not in self.store]:
+                self.remove_shape(ann_id)
+            ids = self.store.ids()
+        for ann_id in ids:
+            if ann_id not in self.store:
+                self.remove_shape(ann_id)
+                continue
+            annotation = self.store.get(ann_id)
+            if not annotation.checked:
+                self.remove_shape(ann_id)
+            elif ann_id not in self.graphics_items:
+                self.draw_shape(annotation)
+
+    def draw_shape(self, annotation):
+        """Draws an Annotation on the scene."""
+        pen = QPen(QColor(*self.class_colors.get(annotation.defect_class, (255, 0, 0))), self.pen_width)
+        points = [QPointF(x, y) for x, y in annotation.points.tolist()] if annotation.points is not None else []
+
+        item = None
+        if annotation.shape_type in ("rectangle", "circle"):
+            x, y, w, h = annotation.bbox
+            if annotation.shape_type == "circle":
+                item = self.scene.addEllipse(x, y, w, h, pen, self.brush)
             else:
-                bbox = checkbox.property("bbox")
-                self.draw_bbox_rect(bbox, idx, shape_type=shape_type)
-        else:
-            self.remove_bbox_rect(idx)
-
-        # Reindex and update mapping
-        self._reindex_checklist_items()
-        new_map = {}
-        for item, list_item in list(self.item_to_listitem.items()):
-            row = self.coord_list.row(list_item)
+                item = self.scene.addRect(x, y, w, h, pen, self.brush)
+        elif annotation.shape_type == "polygon" and points:
+            item = self.scene.addPolygon(QPolygonF(points), pen, self.brush)
+        elif annotation.shape_type == "freehand" and points:
+            path = QPainterPath(points[0])
+            for p in points[1:]:
+                path.lineTo(p)
+            item = self.scene.addPath(path, pen)
+
+        if item:
+            item.setZValue(1)
+            self.graphics_items[annotation.id] = item
+            self.item_ids[item] = annotation.id
+
+    def remove_shape(self, ann_id):
+        """Removes the shape of an annotation from the scene."""
+        if item := self.graphics_items.pop(ann_id, None):
             if item.scene():
-                new_map[row] = item
-        self.bbox_graphics_items = new_map
-
+                self.scene.removeItem(item)
+            self.item_ids.pop(item, None)
 
     def toggle_select_all(self):
         """Toggles the checked state of all checklist items."""
         is_checked = self.select_all_btn.isChecked()
         self.select_all_btn.setText("Unselect All" if is_checked else "Select All")
-
-        for idx in range(self.coord_list.count()):
-            widget = self.coord_list.itemWidget(self.coord_list.item(idx))
-            if cb := widget.findChild(QCheckBox, "CheckBox_bbox"):
-                cb.setChecked(is_checked)
+        # One changed signal; sync_scene draws or removes the shapes
+        self.store.set_all_checked(is_checked)
 
 
     def prompt_manual_model(self, shape_type, coords):
@@ -568,80 +447,11 @@ class PaintApp(QMainWindow):
 
     def add_manual_checklist_item(self, shape_type, coords, defect_class):
         """Adds a manually created annotation to the checklist and scene."""
-        idx = self.coord_list.count()
-        
-        container = QWidget()
-        v_layout = QVBoxLayout(container)
-        v_layout.setContentsMargins(0, 0, 0, 0)
-        v_layout.setSpacing(2)
-
-        top_row = QHBoxLayout()
-        checkbox = QCheckBox()
-        checkbox.setChecked(True)
-        checkbox.setObjectName("CheckBox_bbox")
-        top_row.addWidget(checkbox)
-
-        box_label = QLabel(f"<b><span style='color:#d32f2f;'>Box: {idx + 1}</span></b>")
-        box_label.setTextFormat(Qt.RichText)
-        box_label.setProperty("label_type", "box_number")
-        top_row.addWidget(box_label)
-        top_row.addStretch()
-        v_layout.addLayout(top_row)
-        
-        details, bbox_data, current_drawing_item = "", None, None
-        pen = QPen(QColor(*self.class_colors.get(defect_class, (255, 0, 0))), self.pen_width)
-
+        # Added checked, so the store's reset draws it
         if shape_type in ("rectangle", "circle"):
-            x, y, w, h = coords
-            details = f"Model: Manual Addition<br>Type: {defect_class}<br>x: {x},<br>y: {y},<br>w:{w},<br>h:{h}"
-            bbox_data = coords
-            if shape_type == "rectangle":
-                current_drawing_item = self.scene.addRect(x, y, w, h, pen, self.brush)
-            else:
-                current_drawing_item = self.scene.addEllipse(x, y, w, h, pen, self.brush)
-        
+            self.store.add(shape_type, bbox=coords, defect_class=defect_class)
         elif shape_type in ("polygon", "freehand"):
-            pts_list = [f"({int(p.x())},{int(p.y())})" for p in coords]
-            pts_wrapped = "<br>".join([", ".join(pts_list[i:i + 4]) for i in range(0, len(pts_list), 4)])
-            details = f"Model: Manual Addition<br>Type: {defect_class}<br>{shape_type.capitalize()}:<br>{pts_wrapped}"
-            
-            if shape_type == "polygon":
-                current_drawing_item = self.scene.addPolygon(QPolygonF(coords), pen, self.brush)
-            else: # freehand
-                path = QPainterPath(coords[0])
-                for p in coords[1:]: path.lineTo(p)
-                current_drawing_item = self.scene.addPath(path, pen)
-
-        details_label = QLabel(f"<span style='color:white;'>{details}</span>")
-        details_label.setTextFormat(Qt.RichText)
-        details_label.setStyleSheet("background: #222; border-radius: 4px; padding: 4px;")
-        v_layout.addWidget(details_label)
-
-        lw_item = QListWidgetItem()
-        lw_item.setSizeHint(container.sizeHint())
-        self.coord_list.addItem(lw_item)
-        self.coord_list.setItemWidget(lw_item, container)
-        
-        if current_drawing_item:
-            self.item_to_listitem[current_drawing_item] = lw_item
-            current_drawing_item.setZValue(1)
-
-        checkbox.setProperty("bbox", bbox_data)
-        checkbox.setProperty("manual", True)
-        checkbox.setProperty("defect_class", defect_class)
-        checkbox.setProperty("shape_type", shape_type)
-        checkbox.setProperty("points", coords)  # <-- ADD THIS LINE
-        # checkbox.setProperty("confidence", 1.0)  # Default confidence for manual annotations
-        idx = self.coord_list.row(lw_item)
-        # checkbox.stateChanged.connect(partial(self.toggle_bbox_rect, checkbox=checkbox, idx=idx))
-        checkbox.stateChanged.connect(lambda state, cb=checkbox: self.toggle_bbox_rect(state, cb))
-
-        
-        # Check the checkbox, which will trigger draw_bbox_rect (if applicable)
-        checkbox.setChecked(True)
-
-        self._reindex_checklist_items() # Re-index after adding a new item
-        # return current_drawing_item, lw_item
+            self.store.add(shape_type, points=coords, defect_class=defect_class)
 
 
     def start_polygon(self, start_point):
@@ -704,26 +514,12 @@ class PaintApp(QMainWindow):
         for item in items:
             if item is self.image_item:
                 continue
-            
-            if list_item := self.item_to_listitem.pop(item, None):
-                self.scene.removeItem(item)
-                row = self.coord_list.row(list_item)
-                if row != -1:
-                    self.coord_list.takeItem(row)
-                self._reindex_checklist_items()
-                break # Erase one item at a time
 
-    def _reindex_checklist_items(self):
-        """Re-indexes the box numbers in the checklist after any removal."""
-        for i in range(self.coord_list.count()):
-            list_item = self.coord_list.item(i)
-            widget = self.coord_list.itemWidget(list_item)
-            if widget:
-                # Find the box label by property
-                for child in widget.findChildren(QLabel):
-                    if child.property("label_type") == "box_number":
-                        child.setText(f"<b><span style='color:#d32f2f;'>Box: {i + 1}</span></b>")
-                        break
+            if (ann_id := self.item_ids.get(item)) is not None:
+                # The store's reset removes the shape; the remaining boxes are numbered 1..n again
+                self.store.remove([ann_id])
+                self.store.renumber()
+                break # Erase one item at a time
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -6,17 +6,38 @@
 
 from PyQt5 import QtCore, QtGui, QtWidgets
 import os
+import time
 from utils.OriginalImage import OriginalImageWindow
 from utils.DetectedImage import DetectedImageWindow
 import sys
-import subprocess
 from PIL import Image
-import ast
-import re
-from show_bounding_copy import BoundingBoxDisplay
+from show_bounding_copy import BoundingBoxDisplay, BoxOverlay
+from utils.annotations import AnnotationStore
+from utils.detection_list import DetectionListModel, setup_detection_view
 from EditWindow import PaintApp
+from models.worker import InferenceWorkerClient
+from models.shared_image import SharedImage
+from utils.prediction_cache import PREDICTION_FLOOR, Prediction, PredictionCache, prediction_key
+from utils.detection_cache import DetectionCache
+from utils.prefetch import Prefetcher, PreviewCache
+from utils.jobs import INTERACTIVE, JobScheduler
+from utils.image_store import get_image, get_proxy
+from utils.thumbnails import ThumbnailLoader
+from utils.gallery import DirectoryScanner, GalleryModel, GalleryView, PathRole
+from models.weights import QUANTIZED_WEIGHTS
+from models.timing import StageTimer, append_trace, format_stages
+from models.cascade import SCREENED_CLEAN, CascadeStats, cascade_settings
+from models.suppression import suppression_settings
 # from models.porosity_model import DefectDetector as PorosityDefectDetector
 
+def qimage_from_shared(shared):
+    """Wraps a SharedImage's RGB pixels in a QImage without copying them.
+
+    The QImage is only valid while ``shared`` is alive.
+    """
+    return QtGui.QImage(shared.array.data, shared.width, shared.height,
+                        shared.width * shared.channels, QtGui.QImage.Format_RGB888)
+
 class LoaderDialog(QtWidgets.QDialog):
     def __init__(self, spinner_path=None,style=None):
         super().__init__()
@@ -52,20 +73,6 @@ class LoaderDialog(QtWidgets.QDialog):
             self.setStyleSheet(f.read())
         # self.setStyleSheet("background-color: rgba(30, 30, 30, 200); color: white; font-size: 16px; border-radius: 10px;")
 
-class ModelWorker(QtCore.QThread):
-    resultReady = QtCore.pyqtSignal(object)
-
-    def __init__(self, ui_instance, image_path, model_name):
-        super().__init__()
-        self.ui_instance = ui_instance
-        self.image_path = image_path
-        self.model_name = model_name
-
-    def run(self):
-        # Only run the model and emit raw result (no UI)
-        result = self.ui_instance.run_model(self.image_path, model_name=self.model_name)
-        self.resultReady.emit(result)
-
 class Ui_WeldingDefectDetection(object):
     def setupUi(self, WeldingDefectDetection):
         WeldingDefectDetection.setObjectName("WeldingDefectDetection")
@@ -81,6 +88,20 @@ class Ui_WeldingDefectDetection(object):
         WeldingDefectDetection.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
         WeldingDefectDetection.setMinimumSize(800, 600)
 
+        # Start the inference worker and warm the default model first, so the
+        # torch import, weight load and first inference overlap with building
+        # the widgets below instead of delaying the first Detect.
+        self.inference_worker = InferenceWorkerClient()
+        # Every model call goes through the job scheduler (interactive > prefetch > batch)
+        self.jobs = JobScheduler(max_workers=2)
+        self.jobs.finished.connect(self.handle_model_result)
+        self.jobs.failed.connect(self.handle_job_ended)
+        self.jobs.cancelled.connect(self.handle_job_ended)
+        self.jobs.progress.connect(self.show_job_progress)
+        self.interactive_job = None
+        self.model_ready = {}
+        self.warm_up_model("yolo")
+
         # Central widget
         self.centralwidget = QtWidgets.QWidget(WeldingDefectDetection)
         self.centralwidget.setObjectName("centralwidget")
@@ -166,22 +187,13 @@ class Ui_WeldingDefectDetection(object):
 
 
 
-        # ============= LEFT COLUMN: ScrollArea for Image List =============
-        self.ListPhotoGallery = QtWidgets.QScrollArea()
-        self.ListPhotoGallery.setWidgetResizable(True)
+        # ============= LEFT COLUMN: Image gallery =============
+        # Icon-mode list over a lazy model: only the thumbnails on screen are decoded
+        self.gallery = GalleryModel()
+        self.ListPhotoGallery = GalleryView()
         self.ListPhotoGallery.setObjectName("ListPhotoGallery")
         self.ListPhotoGallery.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
-
-        self.scrollAreaWidgetContents_1 = QtWidgets.QWidget()
-        self.scrollAreaWidgetContents_1.setObjectName("scrollAreaWidgetContents_1")
-        self.imageListLayout = QtWidgets.QVBoxLayout(self.scrollAreaWidgetContents_1)
-
-        self.BoxList1 = QtWidgets.QListView(self.scrollAreaWidgetContents_1)
-        self.BoxList1.setObjectName("BoxList1")
-        # Add the QListView to the scroll area layout
-        self.imageListLayout.addWidget(self.BoxList1)
-
-        self.ListPhotoGallery.setWidget(self.scrollAreaWidgetContents_1)
+        self.ListPhotoGallery.setModel(self.gallery)
         self.leftLayout.addWidget(self.ListPhotoGallery)
 
         # ============= CENTER COLUMN =============
@@ -224,11 +236,42 @@ class Ui_WeldingDefectDetection(object):
         
         self.ButtonDetectDefect = QtWidgets.QPushButton(self.centralwidget)
         self.ButtonDetectDefect.setObjectName("ButtonDetectDefect")
+
+        # Sliced (tiled) inference for large radiographs: tile size and overlap
+        self.CheckBoxTiled = QtWidgets.QCheckBox(self.centralwidget)
+        self.CheckBoxTiled.setObjectName("CheckBoxTiled")
+        self.SpinTileSize = QtWidgets.QSpinBox(self.centralwidget)
+        self.SpinTileSize.setObjectName("SpinTileSize")
+        self.SpinTileSize.setRange(320, 2048)
+        self.SpinTileSize.setSingleStep(64)
+        self.SpinTileSize.setValue(640)
+        self.SpinTileSize.setSuffix(" px")
+        self.SpinTileOverlap = QtWidgets.QDoubleSpinBox(self.centralwidget)
+        self.SpinTileOverlap.setObjectName("SpinTileOverlap")
+        self.SpinTileOverlap.setRange(0.0, 0.5)
+        self.SpinTileOverlap.setSingleStep(0.05)
+        self.SpinTileOverlap.setValue(0.2)
+        self.SpinTileSize.setEnabled(False)
+        self.SpinTileOverlap.setEnabled(False)
+        self.CheckBoxTiled.toggled.connect(self.SpinTileSize.setEnabled)
+        self.CheckBoxTiled.toggled.connect(self.SpinTileOverlap.setEnabled)
+        # Cascaded inference: a cheap screening pass decides whether the full pass runs
+        self.CheckBoxCascade = QtWidgets.QCheckBox(self.centralwidget)
+        self.CheckBoxCascade.setObjectName("CheckBoxCascade")
         
         # Add the two control panels into the grid layout:
         self.controlLeftLayout.addWidget(self.ButtonSelectModel)
+        self.controlLeftLayout.addWidget(self.CheckBoxTiled)
+        self.controlLeftLayout.addWidget(self.SpinTileSize)
+        self.controlLeftLayout.addWidget(self.SpinTileOverlap)
+        self.controlLeftLayout.addWidget(self.CheckBoxCascade)
         self.controlLeftLayout.addWidget(self.ButtonDetectDefect)
 
+        # Shows whether the selected model is loaded and warmed up
+        self.ModelStatusLabel = QtWidgets.QLabel(self.centralwidget)
+        self.ModelStatusLabel.setObjectName("ModelStatusLabel")
+        self.controlLeftLayout.addWidget(self.ModelStatusLabel)
+
 
 
         ############## Right control panel (aligned with BoxDetectedImage) ##############
@@ -259,6 +302,11 @@ class Ui_WeldingDefectDetection(object):
         # Connect the slider to update the label
         self.ThresholdSlider.valueChanged.connect(self.update_threshold_text_label)
         self.threshold=0.25
+        # Debounce slider moves; once it settles the cached prediction is re-filtered
+        self.thresholdTimer = QtCore.QTimer()
+        self.thresholdTimer.setSingleShot(True)
+        self.thresholdTimer.setInterval(60)
+        self.thresholdTimer.timeout.connect(self.apply_threshold)
         # Add the frame to the controlRightLayout
         self.controlRightLayout.addWidget(self.ThresholdFrame)
 
@@ -286,6 +334,7 @@ class Ui_WeldingDefectDetection(object):
         self.BoxEditImage.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
         self.BoxEditImage.setObjectName("BoxEditImage")
         self.BoxEditImage.setProperty("class", "imageBox")
+        self.box3 = BoxOverlay(self.BoxEditImage)
 
         self.imagesGrid.addWidget(self.BoxMetadataImage, 2, 0)
         self.imagesGrid.addWidget(self.BoxEditImage, 2, 1)
@@ -333,8 +382,17 @@ class Ui_WeldingDefectDetection(object):
         self.scrollAreaWidgetContents_2 = QtWidgets.QWidget()
         self.scrollAreaWidgetContents_2.setObjectName("scrollAreaWidgetContents_2")
         self.boxLayout2 = QtWidgets.QVBoxLayout(self.scrollAreaWidgetContents_2)
+        self.SelectAllBoxes = QtWidgets.QCheckBox("Select All", self.scrollAreaWidgetContents_2)
+        self.SelectAllBoxes.setObjectName("CheckBox_SelectAll")
+        self.SelectAllBoxes.setStyleSheet("font-size: 16px; color: red;")
+        self.SelectAllBoxes.hide()
+        self.boxLayout2.addWidget(self.SelectAllBoxes)
+        # Detections live in an AnnotationStore; the list is a view that paints only the visible rows
+        self.detections = AnnotationStore(self.centralwidget)
         self.BoxList2 = QtWidgets.QListView(self.scrollAreaWidgetContents_2)
         self.BoxList2.setObjectName("BoxList2")
+        self.box_list_model = DetectionListModel(self.detections, self.BoxList2)
+        setup_detection_view(self.BoxList2, self.box_list_model, uniform_rows=True)
         self.boxLayout2.addWidget(self.BoxList2)
         self.ListBoundingBoxRightUpper.setWidget(self.scrollAreaWidgetContents_2)
         self.rightLayout.addWidget(self.ListBoundingBoxRightUpper)
@@ -357,9 +415,15 @@ class Ui_WeldingDefectDetection(object):
         self.scrollAreaWidgetContents_3 = QtWidgets.QWidget()
         self.scrollAreaWidgetContents_3.setObjectName("scrollAreaWidgetContents_3")
         boxLayout3 = QtWidgets.QVBoxLayout(self.scrollAreaWidgetContents_3)
+        # The inspector's annotations: copied detections, then the edit window's result
+        self.annotations = AnnotationStore(self.centralwidget)
         self.BoxList3 = QtWidgets.QListView(self.scrollAreaWidgetContents_3)
         self.BoxList3.setObjectName("BoxList3")
+        self.lower_list_model = DetectionListModel(self.annotations, self.BoxList3)
+        setup_detection_view(self.BoxList3, self.lower_list_model)
         boxLayout3.addWidget(self.BoxList3)
+        # True while the lower list holds the edit window's result (box 3 shows its pixmap)
+        self.lower_list_edited = False
         self.ListBoundingBoxRightLower.setWidget(self.scrollAreaWidgetContents_3)
         self.rightLayout.addWidget(self.ListBoundingBoxRightLower)
 
@@ -392,6 +456,10 @@ class Ui_WeldingDefectDetection(object):
         self.statusbar = QtWidgets.QStatusBar(WeldingDefectDetection)
         self.statusbar.setObjectName("statusbar")
         WeldingDefectDetection.setStatusBar(self.statusbar)
+        # Latency breakdown of the last detection (Detect click -> box 2)
+        self.TimingHUD = QtWidgets.QLabel(self.statusbar)
+        self.TimingHUD.setObjectName("TimingHUD")
+        self.statusbar.addPermanentWidget(self.TimingHUD)
 
         # Create Open File action
         self.actionOpenFile = QtWidgets.QAction(WeldingDefectDetection)
@@ -401,6 +469,11 @@ class Ui_WeldingDefectDetection(object):
         self.actionOpen = QtWidgets.QAction(WeldingDefectDetection)
         self.actionOpen.setObjectName("actionOpen")
         self.menuFile.addAction(self.actionOpen)
+        # Open Folder also lists the images of its subfolders
+        self.actionIncludeSubfolders = QtWidgets.QAction(WeldingDefectDetection)
+        self.actionIncludeSubfolders.setObjectName("actionIncludeSubfolders")
+        self.actionIncludeSubfolders.setCheckable(True)
+        self.menuFile.addAction(self.actionIncludeSubfolders)
         
         self.actionGenerateReport = QtWidgets.QAction("Generate Report", WeldingDefectDetection)
         self.menuGenerateReport.addAction(self.actionGenerateReport)
@@ -434,22 +507,45 @@ class Ui_WeldingDefectDetection(object):
         self.ButtonMaximize2.clicked.connect(lambda: self.open_sub_window(getattr(self, "detected_image_path", ""), DetectedImageWindow))
         self.ButtonMaximize3.clicked.connect(self.open_edit_window)
         self.ButtonMaximize4.clicked.connect(self.maximize_image)
-        self.ListPhotoGallery.verticalScrollBar().valueChanged.connect(self.on_scroll)
+        self.actionIncludeSubfolders.toggled.connect(self.rescan_folder)
+        self.ListPhotoGallery.clicked.connect(lambda index: self.show_original_image_in_box1(index.data(PathRole)))
+        self.ListPhotoGallery.visibleRangeChanged.connect(self.request_thumbnails)
         self.ButtonSelectModel.currentIndexChanged.connect(self.select_model)
         self.ButtonDetectDefect.clicked.connect(self.execute_model)
         self.ButtonCopy.clicked.connect(self.copy_coordinates)
         self.ButtonDelete.clicked.connect(self.delete_selected_coordinates)
+        self.SelectAllBoxes.clicked.connect(self.detections.set_all_checked)
+        self.detections.changed.connect(self.redraw_from_upper)
+        self.detections.changed.connect(self.sync_select_all)
+        self.detections.reset.connect(self.sync_select_all)
+        self.annotations.changed.connect(self.redraw_from_lower)
         self.actionOpenFile.triggered.connect(self.open_file)  # Connect Open File action to a method
         self.ButtonToggleTheme.clicked.connect(self.toggle_theme)  # Connect theme toggle button
 
-        # Keep track of images for lazy loading
-        self.image_paths = []
-        self.loaded_images_count = 0
-        self.chunk_size = 20
+        # The gallery folder is listed on a worker thread and its rows are added as they are found
+        self.gallery_folder = None
+        self.gallery_scan = 0
+        self.gallery_scanner = DirectoryScanner()
+        self.gallery_scanner.found.connect(self.on_images_found)
+        self.gallery_scanner.finished.connect(self.on_scan_finished)
+        # Thumbnails are decoded on a thread pool and cached on disk; the model shows them as they arrive
+        self.thumbnails = ThumbnailLoader()
+        self.thumbnails.ready.connect(self.gallery.set_thumbnail)
         self.selected_model = None
+        self.prediction_cache = PredictionCache()
+        self.detection_cache = DetectionCache()
+        # Images each stage of cascaded inference handled this session (interactive and prefetched)
+        self.cascade_stats = CascadeStats()
+        self.current_prediction = None
+
+
+        # Infers the next few gallery images in the background while one is inspected
+        self.preview_size = QtCore.QSize(490, 446)
+        self.preview_cache = PreviewCache()
+        self.prefetcher = Prefetcher(self.jobs, self.detection_job, self.preview_cache, self.preview_size)
 
         self.last_edit_pixmap = None
-        self.last_edit_checklist = None
+        self.last_edit_annotations = None
 
         self.retranslateUi(WeldingDefectDetection)
         QtCore.QMetaObject.connectSlotsByName(WeldingDefectDetection)
@@ -465,14 +561,25 @@ class Ui_WeldingDefectDetection(object):
         self.BoxEditImage.setText(_translate("WeldingDefectDetection", "Edit Window"))
         self.show_detected_image_in_box2("Assets/box2.png")
         self.show_eiditable_image_in_box3('Assets/box3.png')
-        self.bbox_display = BoundingBoxDisplay(self, self.current_image_path, self.boxLayout2)
-        self.bbox_display.clear_layout()
+        self.bbox_display = BoundingBoxDisplay(self, self.current_image_path, self.BoxList2)
         self.bbox_display._show_instructions()
         # self.ButtonSelectModel.setItemText(0, _translate("WeldingDefectDetection", "Model 1"))
         # self.ButtonSelectModel.setItemText(1, _translate("WeldingDefectDetection", "Model 2"))
         # self.ButtonSelectModel.setItemText(2, _translate("WeldingDefectDetection", "Model 3"))
         self.ButtonSelectModel.addItems(["Model 1", "Model 2", "Model 3"])
+        # INT8 builds (python -m models.quantize) trade a little mAP for CPU speed
+        for label, model_name in (("Model 1 (INT8)", "yolo_int8"), ("Model 2 (INT8)", "porosity_model_int8")):
+            if os.path.exists(QUANTIZED_WEIGHTS[model_name]):
+                self.ButtonSelectModel.addItem(label)
+        # Model 1 and Model 2 in one pass, their boxes fused (models/ensemble.py)
+        self.ButtonSelectModel.addItem("Models 1 + 2")
+        if all(os.path.exists(QUANTIZED_WEIGHTS[name]) for name in ("yolo_int8", "porosity_model_int8")):
+            self.ButtonSelectModel.addItem("Models 1 + 2 (INT8)")
         self.ButtonDetectDefect.setText(_translate("WeldingDefectDetection", "Detect Defects"))
+        self.CheckBoxTiled.setText(_translate("WeldingDefectDetection", "Tiled"))
+        self.CheckBoxTiled.setToolTip(_translate("WeldingDefectDetection", "Run the model on overlapping tiles (better recall on large plates, slower)"))
+        self.CheckBoxCascade.setText(_translate("WeldingDefectDetection", "Screen"))
+        self.CheckBoxCascade.setToolTip(_translate("WeldingDefectDetection", "Screen the image at low resolution first and run the full pass only if something is found"))
         # self.ButtonEditImage.setText(_translate("WeldingDefectDetection", "Edit"))
         self.ButtonRedraw.clicked.connect(self.execute_model)  # Define redraw_action method in your class
         self.TextBoundingBox.setText(_translate("WeldingDefectDetection", "Bounding Boxes"))
@@ -483,6 +590,7 @@ class Ui_WeldingDefectDetection(object):
         # self.actionOpen.setText(_translate("WeldingDefectDetection", "Open"))
         self.actionOpenFile.setText(_translate("WeldingDefectDetection", "Open File"))  # Add Open File option
         self.actionOpen.setText(_translate("WeldingDefectDetection", "Open Folder        "))  # Rename Open to Open Folder
+        self.actionIncludeSubfolders.setText(_translate("WeldingDefectDetection", "Include Subfolders"))
         # 4. After all widgets are created, match button height to TextFileName
         self.LeftButtonFrame.setSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Fixed)
         button_height = self.TextFileName.sizeHint().height()
@@ -500,6 +608,7 @@ class Ui_WeldingDefectDetection(object):
 
         self.threshold = value / 100.0  # Scale the slider value to 0-1
         self.ThresholdTextLabel.setText(f"Threshold: {self.threshold:.2f}")  # Update the label text
+        self.thresholdTimer.start()
         
     # ---------------------------------------------------------
     #                METHODS FOR FILE OPERATIONS
@@ -511,44 +620,30 @@ class Ui_WeldingDefectDetection(object):
             self.load_images(folder)
 
     def load_images(self, folder):
-        # Clear previous thumbnails
-        while self.imageListLayout.count():
-            child = self.imageListLayout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
-
-        image_extensions = {'.png', '.jpg', '.jpeg', '.bmp', '.gif'}
-        self.image_paths = [
-            os.path.join(folder, filename)
-            for filename in os.listdir(folder)
-            if any(filename.lower().endswith(ext) for ext in image_extensions)
-        ]
-        self.loaded_images_count = 0
-        self.load_next_chunk()
-    
-    def on_scroll(self):
-        if self.ListPhotoGallery.verticalScrollBar().value() == self.ListPhotoGallery.verticalScrollBar().maximum():
-            self.load_next_chunk()
-
-    def load_next_chunk(self):
-        for _ in range(self.chunk_size):
-            if self.loaded_images_count < len(self.image_paths):
-                image_path = self.image_paths[self.loaded_images_count]
-                self.add_thumbnail(image_path)
-                self.loaded_images_count += 1
-
-    def add_thumbnail(self, image_path):
-        pixmap = QtGui.QPixmap(image_path)
-        size = self.ListPhotoGallery.size()
-        width = size.width()-60
-        pixmap = pixmap.scaled(width, width, QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
-        self.label = QtWidgets.QLabel()
-        self.label.setObjectName("thumbnailLabel")
-        self.label.setPixmap(pixmap)
-        # self.label.setStyleSheet("background-color: rgba(255, 238, 223, 0.5);")
-        self.label.setAlignment(QtCore.Qt.AlignCenter)
-        self.label.mousePressEvent = lambda event, path=image_path: self.show_original_image_in_box1(path)
-        self.imageListLayout.addWidget(self.label)
+        self.prefetcher.cancel()
+        self.thumbnails.cancel()
+        self.gallery.clear()
+        self.gallery_folder = folder
+        self.gallery_scan = self.gallery_scanner.scan(folder, self.actionIncludeSubfolders.isChecked())
+        self.statusbar.showMessage(f"Listing {folder}...")
+
+    def rescan_folder(self):
+        if self.gallery_folder:
+            self.load_images(self.gallery_folder)
+
+    def on_images_found(self, scan, paths):
+        if scan == self.gallery_scan:
+            self.gallery.append(paths)
+
+    def on_scan_finished(self, scan, count):
+        if scan == self.gallery_scan:
+            self.statusbar.showMessage(f"{count} images in {self.gallery_folder}", 5000)
+
+    def request_thumbnails(self, first, last):
+        """Decodes the thumbnails of gallery rows first..last, dropping requests for rows scrolled away from."""
+        self.thumbnails.retain(self.gallery.paths[first:last + 1])
+        for image_path in self.gallery.missing(first, last):
+            self.thumbnails.request(image_path)
 
     # def show_original_image_in_box1(self, image_path):
     #     self.current_image_path = image_path
@@ -566,10 +661,36 @@ class Ui_WeldingDefectDetection(object):
 
     def show_original_image_in_box1(self, image_path):
         self.current_image_path = image_path
-        pixmap = QtGui.QPixmap(image_path)
-        original_width = pixmap.width()
-        original_height = pixmap.height()
+        self.current_prediction = None
+
+        file_name = os.path.basename(image_path)
+        path = os.path.dirname(image_path)
+        self.TextFileName.setText(f"{path} ({file_name})")
 
+        # Already decoded and scaled by the prefetcher
+        preview = self.preview_cache.get(image_path, self.preview_size)
+        if preview is not None:
+            self.BoxOriginalImage.setPixmap(QtGui.QPixmap.fromImage(preview))
+            self.BoxOriginalImage.setAlignment(QtCore.Qt.AlignCenter)
+        else:
+            self.show_scaled_original(image_path)
+
+        self.show_prefetched_and_prefetch_next(image_path)
+
+    def show_prefetched_and_prefetch_next(self, image_path):
+        """Shows the detections of ``image_path`` if they were prefetched, then prefetches the next images."""
+        row = self.gallery.row_of(image_path)
+        if not self.selected_model or row < 0:
+            return
+        tiling = self.current_tiling()
+        cascade = self.current_cascade()
+        cached = self.prediction_cache.get(prediction_key(image_path, self.selected_model, tiling, cascade))
+        if cached is not None:
+            self.show_prediction(cached)
+        self.prefetcher.schedule(self.gallery.paths, row, self.selected_model,
+                                 tiling, skip=self.prediction_cache.__contains__, cascade=cascade)
+
+    def show_scaled_original(self, image_path):
         # Get maximum available dimensions from the container
         # max_width = self.BoxOriginalImage.width()
         # max_height = self.BoxOriginalImage.height()
@@ -577,19 +698,12 @@ class Ui_WeldingDefectDetection(object):
         max_width = 490
         max_height = 446
 
-        # Calculate the scale factor to fit the pixmap within the container
-        scale_factor = min(max_width / original_width, max_height / original_height)
-
-        # Compute the new dimensions keeping the aspect ratio intact
-        container_width = int(original_width * scale_factor)
-        container_height = int(original_height * scale_factor)
-
-        # Wrap dimensions in a QSize and scale the pixmap.
-        scaled_pixmap = pixmap.scaled(
-            QtCore.QSize(container_width, container_height),
-            QtCore.Qt.IgnoreAspectRatio,
-            QtCore.Qt.SmoothTransformation
-        )
+        # Decoded once in the shared image store and scaled from its smallest large-enough proxy
+        scaled = get_proxy(image_path, QtCore.QSize(max_width, max_height))
+        if scaled is None:
+            print(f"Error: could not read {image_path}")
+            return
+        scaled_pixmap = QtGui.QPixmap.fromImage(scaled)
         self.BoxOriginalImage.setPixmap(scaled_pixmap)
         self.BoxOriginalImage.setAlignment(QtCore.Qt.AlignCenter)  # Align the pixmap to the center
         # Scale the pixmap to the computed dimensions
@@ -597,10 +711,6 @@ class Ui_WeldingDefectDetection(object):
         #                             # QtCore.Qt.KeepAspectRatio, 
         #                             QtCore.Qt.SmoothTransformation)
 
-        file_name = os.path.basename(image_path)
-        path = os.path.dirname(image_path)
-        self.TextFileName.setText(f"{path} ({file_name})")
-
     def show_detected_image_in_box2(self, image):
         self.detected_image_path = image
         if isinstance(image, Image.Image):
@@ -608,6 +718,8 @@ class Ui_WeldingDefectDetection(object):
             data = image.tobytes("raw", "RGBA")
             qimage = QtGui.QImage(data, image.width, image.height, QtGui.QImage.Format_RGBA8888)
             pixmap = QtGui.QPixmap.fromImage(qimage)
+        elif isinstance(image, QtGui.QImage):
+            pixmap = QtGui.QPixmap.fromImage(image)
         else:
             pixmap = QtGui.QPixmap(image)
 
@@ -633,34 +745,13 @@ class Ui_WeldingDefectDetection(object):
 
 
     def show_eiditable_image_in_box3(self, pixmap_or_path):
-        # If it's a QPixmap, just scale it
-        if isinstance(pixmap_or_path, QtGui.QPixmap):
-            pixmap = pixmap_or_path
-        else:
-            pixmap = QtGui.QPixmap(pixmap_or_path)
-
-        max_width = 490
-        max_height = 446
-
-        original_width = pixmap.width()
-        original_height = pixmap.height()
-        scale_factor = min(max_width / original_width, max_height / original_height)
-
-        container_width = int(original_width * scale_factor)
-        container_height = int(original_height * scale_factor)
-
-        scaled_pixmap = pixmap.scaled(
-            QtCore.QSize(container_width, container_height),
-            QtCore.Qt.IgnoreAspectRatio,
-            QtCore.Qt.SmoothTransformation
-        )
-        self.BoxEditImage.setPixmap(scaled_pixmap)
-        self.BoxEditImage.setAlignment(QtCore.Qt.AlignCenter)
+        # Scaled once per image; ticked boxes are drawn on the overlay above it
+        self.box3.set_image(pixmap_or_path)
 
     def maximize_image(self):
         # Restore last edited state if available
-        if getattr(self, "last_edit_pixmap", None) is not None and getattr(self, "last_edit_checklist", None) is not None:
-            self.open_edit_window_with_data(self.last_edit_pixmap, self.last_edit_checklist)
+        if getattr(self, "last_edit_pixmap", None) is not None and getattr(self, "last_edit_annotations", None) is not None:
+            self.open_edit_window_with_data(self.last_edit_pixmap, self.last_edit_annotations)
         elif hasattr(self, 'current_image_path'):
             # Fallback: open original image
             self.fullscreen_window = QtWidgets.QWidget()
@@ -669,7 +760,8 @@ class Ui_WeldingDefectDetection(object):
 
             layout = QtWidgets.QVBoxLayout(self.fullscreen_window)
             label = QtWidgets.QLabel()
-            pixmap = QtGui.QPixmap(self.current_image_path)
+            image = get_image(self.current_image_path)
+            pixmap = QtGui.QPixmap.fromImage(image) if image is not None else QtGui.QPixmap()
             label.setPixmap(pixmap)
             label.setAlignment(QtCore.Qt.AlignCenter)
             layout.addWidget(label)
@@ -685,11 +777,12 @@ class Ui_WeldingDefectDetection(object):
 
             self.fullscreen_window.show()
 
-    def open_edit_window_with_data(self, pixmap, checklist):
-        self.edit_window = PaintApp(bbox_checklist=checklist)
+    def open_edit_window_with_data(self, pixmap, annotations):
+        # The edit window works on a copy; handle_edit_save takes the result back
+        self.edit_window = PaintApp(annotations=annotations.copy())
         self.edit_window.scene.clear()
-        self.edit_window.bbox_graphics_items.clear()   # <-- add this
-        self.edit_window.item_to_listitem.clear()      # <-- add this
+        self.edit_window.graphics_items.clear()
+        self.edit_window.item_ids.clear()
         self.edit_window.image_item = self.edit_window.scene.addPixmap(pixmap)
         self.edit_window.image_item.setZValue(0)
         self.edit_window.scene.setSceneRect(QtCore.QRectF(pixmap.rect()))
@@ -710,8 +803,7 @@ class Ui_WeldingDefectDetection(object):
     
     def open_edit_window(self):
         if hasattr(self, "current_image_path") and self.current_image_path:
-            bbox_checklist = self.get_lower_bbox_checklist()
-            self.edit_window = PaintApp(bbox_checklist=bbox_checklist)
+            self.edit_window = PaintApp(annotations=self.annotations.copy())
             self.edit_window.load_image(self.current_image_path)
             self.edit_window.save_result.connect(self.handle_edit_save)  # Connect the save signal
             self.edit_window.show()
@@ -726,9 +818,69 @@ class Ui_WeldingDefectDetection(object):
             self.selected_model = "porosity_model"
         elif model_name == "Model 3":
             self.selected_model = "model3"
+        elif model_name == "Model 1 (INT8)":
+            self.selected_model = "yolo_int8"
+        elif model_name == "Model 2 (INT8)":
+            self.selected_model = "porosity_model_int8"
+        elif model_name == "Models 1 + 2":
+            self.selected_model = "ensemble"
+        elif model_name == "Models 1 + 2 (INT8)":
+            self.selected_model = "ensemble_int8"
         else:
             self.selected_model = None
+        # Queued prefetches were for the previous model
+        self.prefetcher.cancel()
+        self.warm_up_model(self.selected_model)
+
+    def warm_up_model(self, model_name):
+        """Loads ``model_name`` in the inference worker and runs it once on a dummy image, in the background."""
+        if model_name and model_name not in self.model_ready and self.jobs.find(("warmup", model_name)) is None:
+            self.model_ready[model_name] = False
+            self.jobs.submit(self.warmup_job, model_name, priority=INTERACTIVE, key=("warmup", model_name),
+                             kind="warmup")
+        self.update_model_status()
+
+    def warmup_job(self, job, model_name):
+        return model_name, self.inference_worker.warmup(model_name)
+
+    def handle_warmup_result(self, job):
+        model_name, response = job.result
+        if response.get('ok'):
+            self.model_ready[model_name] = True
+            print(f"{model_name} ready: import {response.get('import_ms')} ms, "
+                  f"load {response.get('load_ms')} ms, warm-up {response.get('warmup_ms')} ms")
+        else:
+            # Retried on the next selection; Detect still works, just cold
+            self.model_ready.pop(model_name, None)
+            print(f"Warm-up of {model_name} failed:", response.get('error'))
+        self.update_model_status()
+
+    def update_model_status(self):
+        label = getattr(self, "ModelStatusLabel", None)
+        if label is None:
+            return
+        ready = self.model_ready.get(getattr(self, "selected_model", None))
+        if ready:
+            label.setText("● Ready")
+            label.setToolTip("Model loaded and warmed up")
+        elif ready is False:
+            label.setText("○ Warming up…")
+            label.setToolTip("Loading the model in the background")
+        else:
+            label.setText("")
+            label.setToolTip("")
 
+    def current_tiling(self):
+        """Tiled inference settings from the controls, or None for whole-image inference."""
+        if not self.CheckBoxTiled.isChecked():
+            return None
+        return {'tile_size': self.SpinTileSize.value(), 'overlap': round(self.SpinTileOverlap.value(), 2)}
+
+    def current_cascade(self):
+        """Screening settings of the selected model if cascaded inference is on, else None."""
+        if not self.CheckBoxCascade.isChecked() or not self.selected_model:
+            return None
+        return cascade_settings(self.selected_model)
 
     def execute_model(self):
         if not hasattr(self, 'current_image_path') or not self.current_image_path:
@@ -739,6 +891,23 @@ class Ui_WeldingDefectDetection(object):
             print("Error: No model selected.")
             return
 
+        self.detect_clicked_at = time.perf_counter()
+
+        # Already inferred: the cached prediction only needs re-filtering
+        tiling = self.current_tiling()
+        cascade = self.current_cascade()
+        key = prediction_key(self.current_image_path, self.selected_model, tiling, cascade)
+        cached = self.prediction_cache.get(key)
+        if cached is not None:
+            self.show_prediction(cached, source="memory_cache")
+            return
+
+        # A Detect for another image is no longer wanted.  Cancelled before the
+        # new loader exists: a pending job's cancellation is handled right away
+        # and closes self.loader.
+        if self.interactive_job is not None:
+            self.jobs.cancel(self.interactive_job)
+
         # Show loader
         # Decide spinner based on theme
         if getattr(self, "current_stylesheet", "new.qss") == "styled.qss":
@@ -751,10 +920,14 @@ class Ui_WeldingDefectDetection(object):
         self.loader = LoaderDialog(spinner_path=spinner_path,style=style_path)
         self.loader.show()
 
-        # Start background thread
-        self.worker = ModelWorker(self, self.current_image_path, self.selected_model)
-        self.worker.resultReady.connect(self.handle_model_result)
-        self.worker.start()
+        existing = self.jobs.find(key)
+        if existing is not None:
+            # Already queued or running (e.g. being prefetched): wait for that job instead
+            self.jobs.promote(existing.id, INTERACTIVE)
+            self.interactive_job = existing.id
+        else:
+            self.interactive_job = self.jobs.submit(self.detection_job, self.current_image_path, self.selected_model,
+                                                    tiling, cascade, priority=INTERACTIVE, key=key, kind="detect")
         
     def handle_model_result(self, result):
         self.loader.close()
@@ -778,130 +951,192 @@ class Ui_WeldingDefectDetection(object):
 
         self.show_eiditable_image_in_box3(self.current_image_path)
 
-    def handle_model_result(self, result):
-        self.loader.close()
+    def detection_job(self, job, image_path, model_name, tiling, cascade=None):
+        """Job body for interactive and prefetch detections; runs on a scheduler thread."""
+        return image_path, model_name, tiling, self.run_model(image_path, model_name=model_name, tiling=tiling,
+                                                              cascade=cascade, job=job)
 
-        try:
-            orig_path, det_path, bboxes, confidence_scores, class_labels = result
-            if not (orig_path and det_path):
-                raise Exception("Model returned invalid paths.")
-        except Exception as e:
-            print("Error parsing result:", e)
+    def handle_model_result(self, job):
+        if job.kind == "warmup":
+            self.handle_warmup_result(job)
             return
+        image_path, model_name, tiling, prediction = job.result
+        if prediction is not None:
+            self.prediction_cache.put(job.key, prediction)
+            self.count_cascade_stage(image_path, prediction)
 
-        # Show detected image
-        try:
-            detected_image = Image.open(det_path)
-            self.show_detected_image_in_box2(detected_image)
-        except Exception as e:
-            print("Error loading detected image:", e)
+        # Prefetch results only warm the cache
+        if job.id != self.interactive_job:
             return
-
-        # Editable image
-        self.show_eiditable_image_in_box3(self.current_image_path)
-        bbox_display = BoundingBoxDisplay(parent=self, image_path=self.current_image_path, boxLayout2=self.boxLayout2)
-        bbox_display.display_bbox(bboxes, confidence_scores, class_labels)
+        self.interactive_job = None
+        self.loader.close()
+        if prediction is None:
+            print("Error: detection failed.")
+        elif image_path == getattr(self, "current_image_path", None):
+            self.show_prediction(prediction, source=prediction.source)
+
+    def count_cascade_stage(self, image_path, prediction):
+        """Marks screened-clean images in the gallery and shows how many images each stage handled."""
+        if prediction.stage == SCREENED_CLEAN:
+            self.gallery.set_mark(image_path, "screened clean")
+        # Cache hits did not go through the stages again
+        if prediction.stage is None or prediction.source != "worker":
+            return
+        self.cascade_stats.add(prediction.stage)
+        self.statusbar.showMessage(f"Cascade: {self.cascade_stats.summary()}", 10000)
+
+    def handle_job_ended(self, job):
+        """A job failed or was cancelled."""
+        if job.kind == "warmup":
+            self.model_ready.pop(job.args[0], None)
+            self.update_model_status()
+            return
+        if job.id == self.interactive_job:
+            self.interactive_job = None
+            self.loader.close()
+            if job.error is not None:
+                print("Error: detection failed:", job.error)
+
+    def show_job_progress(self, job_id, done, total, message):
+        if job_id == self.interactive_job and message:
+            self.statusbar.showMessage(f"{message} ({done}/{total})")
+
+    def show_prediction(self, prediction, source=None):
+        """Displays ``prediction``; ``source`` is set when it answers a Detect click, to trace its latency."""
+        self.current_prediction = prediction
+        timer = StageTimer()
+        with timer.stage('gui_decode'):
+            if prediction.original is not None:
+                # The worker already decoded the image; wrap it once, without a copy
+                self.original_qimage = qimage_from_shared(prediction.original)
+            else:
+                # Result came from the on-disk cache; the shared store decodes it (once)
+                image = get_image(self.current_image_path)
+                self.original_qimage = image if image is not None else QtGui.QImage()
+
+        self.apply_threshold(timer)
+        if source is not None:
+            self.record_detection_timings(prediction, timer, source)
+
+    def record_detection_timings(self, prediction, gui_timer, source):
+        """Shows the Detect-to-box-2 breakdown in the HUD and appends it to the trace file."""
+        # A memory-cache hit did no worker work this time
+        stages = dict(prediction.timings or {}) if source != "memory_cache" else {}
+        stages.update(gui_timer.stages)
+        total_ms = round((time.perf_counter() - getattr(self, "detect_clicked_at", gui_timer.start)) * 1000, 2)
+        self.update_timing_hud(stages, total_ms, source)
+        append_trace({
+            'time': time.time(),
+            'image': self.current_image_path,
+            'model': self.selected_model,
+            'tiling': self.current_tiling(),
+            'cascade': self.current_cascade(),
+            'stage': prediction.stage,
+            'source': source,
+            'detections': len(prediction),
+            'total_ms': total_ms,
+            'stages': stages,
+        })
+
+    def update_timing_hud(self, stages, total_ms=None, source=None):
+        text = format_stages(stages)
+        if total_ms is not None:
+            text = f"{total_ms:.0f} ms | {text}"
+        self.TimingHUD.setText(text)
+        details = "\n".join(f"{name}: {ms}" for name, ms in stages.items())
+        self.TimingHUD.setToolTip(f"source: {source}\n{details}" if source else details)
+
+    def apply_threshold(self, timer=None):
+        """Re-filters the current prediction at the slider threshold and redraws box 2, box 3 and the list."""
+        prediction = self.current_prediction
+        if prediction is None:
+            return
+        # Slider moves get their own timer and only refresh the HUD
+        slider = timer is None
+        timer = timer or StageTimer()
+
+        bbox, confidence, classes = prediction.filtered(self.threshold)
+        bbox_display = BoundingBoxDisplay(parent=self, image_path=self.current_image_path, view=self.BoxList2)
+
+        # Detected image
+        with timer.stage('render'):
+            rendered = bbox_display.render_detections(self.original_qimage, bbox, confidence, classes)
+        with timer.stage('scale'):
+            self.show_detected_image_in_box2(rendered)
+
+        # Editable image (boxes are drawn once they are ticked in the list)
+        with timer.stage('box3'):
+            self.show_eiditable_image_in_box3(self.original_qimage)
+
+        # Convert xyxy boxes to (x, y, w, h)
+        xywh = bbox.copy()
+        xywh[:, 2:] -= xywh[:, :2]
+        with timer.stage('widgets'):
+            bbox_display.display_bbox(xywh, confidence, classes)
+            if prediction.stage == SCREENED_CLEAN:
+                bbox_display.show_screened_clean_message()
+        if slider:
+            self.update_timing_hud(timer.stages, timer.elapsed_ms(), "threshold")
 
         # Recreate bounding boxes
-        # bbox_display = BoundingBoxDisplay(self, self.current_image_path, self.boxLayout2)
+        # bbox_display = BoundingBoxDisplay(self, self.current_image_path, self.BoxList2)
         # bbox_display.display_bbox(bboxes, confidence_scores=[], cls=[])  # pass scores/classes if available
 
-    def run_model(self, input_image_path,model_name='yolo'):
-        if model_name == 'yolo':
-            command = [
-                'conda', 'run', '-n', 'yolo', 'python', '-c',
-                (
-                    'from models.model import DefectDetector; '
-                    'detector = DefectDetector(); '
-                    f'original, detected, bbox, confidence, classs = detector.run(r"{input_image_path}",{self.threshold}); '
-                    'pass'
-                )
-            ]
-        elif model_name == 'porosity_model':
-            command = [
-                'conda', 'run', '-n', 'yolo', 'python', '-c',
-                (
-                    'from models.porosity_model import DefectDetector; '
-                    'detector = DefectDetector(); '
-                    f'original, detected, bbox, confidence, classs = detector.run(r"{input_image_path}"); '
-                    'pass'
-                )
-            ]
-        result = subprocess.run(command, capture_output=True, text=True)
-        stdout = result.stdout.strip()
-        if not stdout:
-            print("No output from subprocess. Error:", result.stderr)
-            return None, None, None
-
-        lines = stdout.splitlines()
-        file_line = None
-        for line in reversed(lines):
-            if '/' in line:
-                file_line = line.strip()
-                break
-
-        if not file_line:
-            print("No valid file path line found in output.")
-            return None, None, None
-        
-        # Extract confidence scores
-        confidence_scores = []
-        # Use regex to find the confidence scores in the last line of output
-        conf_match = re.search(r'(\[[\d.,\s]+\])\s+\[[\d.,\s]+\]$', stdout.strip(), re.MULTILINE)
-        if conf_match:
-            conf_str = conf_match.group(1)
-            confidence_scores = ast.literal_eval(conf_str)
-            print("Confidence Scores:", confidence_scores)
-
-        # Extract class labels
-        class_labels = []
-        # Use regex to find the class labels in the last line of output
-        class_match = re.search(r'\[[\d.,\s]+\]\s+(\[[\d.,\s]+\])$', stdout.strip(), re.MULTILINE)
-        if class_match:
-            class_str = class_match.group(1)
-            class_labels = ast.literal_eval(class_str)
-            print("Class Labels:", class_labels)
-        
-        # Extract bounding boxes
-        match = re.search(r'(\[\[.*\]\])', stdout)
-        if match:
-            bbox_str = match.group(1)
-            # Convert the string representation to a Python list safely
-            bboxes = ast.literal_eval(bbox_str)
-            print("\n Bounding Boxes:",bboxes)
-            bboxes_adjusted = []
-            for i in bboxes:
-                x1, y1, x2, y2 = i
-                x1, y1, w, h = x1, y1, x2-x1, y2-y1
-                j = x1, y1, w, h
-                bboxes_adjusted.append(j)
-            bboxes_tuple = [tuple(i) for i in bboxes_adjusted]
-            # --- Use the new object-oriented BoundingBoxDisplay ---
-            # bbox_display = BoundingBoxDisplay(parent=self, image_path=self.current_image_path, boxLayout2=self.boxLayout2)
-            # bbox_display.clear_layout()
-            # bbox_display.display_bbox(bboxes_tuple, confidence_scores, class_labels)
-        else:
-            bboxes_tuple = []
-            class_labels = []
-            # bbox_display = BoundingBoxDisplay(parent=self, image_path=self.current_image_path, boxLayout2=self.boxLayout2)
-            # bbox_display.display_bbox(bboxes_tuple, confidence_scores, class_labels)
+    def run_model(self, input_image_path,model_name='yolo', tiling=None, job=None, cascade=None):
+        # Runs on a scheduler thread: everything it needs comes in as arguments,
+        # nothing is read from the widgets.
+        # Duplicate-box suppression runs in the worker; its settings are part of the cache key
+        suppression = suppression_settings(model_name)
+        params = {'conf': PREDICTION_FLOOR, 'suppression': suppression}
+        if tiling:
+            params['tiling'] = tiling
+        if cascade:
+            params['cascade'] = cascade
+        timer = StageTimer()
+        with timer.stage('cache_lookup'):
+            cached = self.detection_cache.get(input_image_path, model_name, params)
+        if cached is not None:
+            return Prediction(None, cached['bbox'], cached['confidence'], cached['classes'],
+                              timings=timer.stages, source="disk_cache", stage=cached['stage'])
+
+        if job is not None:
+            job.check_cancelled()
+            job.report_progress(0, 1, "Detecting defects")
+
+        # Infer once at the floor confidence with no overlay; the threshold
+        # slider filters and the GUI draws box 2 itself.
+        with timer.stage('request'):
+            response = self.inference_worker.detect(input_image_path, model_name=model_name,
+                                                    threshold=PREDICTION_FLOOR, draw=False, tiling=tiling,
+                                                    cascade=cascade, suppression=suppression)
+        if not response.get('ok'):
+            print("Error from inference worker:", response.get('error'))
+            return None
+
+        with timer.stage('parse'):
+            try:
+                original = SharedImage(response['orig'])
+            except (OSError, ValueError) as e:
+                print("Error opening shared image:", e)
+                return None
+
+        if response.get('stage') == SCREENED_CLEAN:
+            print("Screened clean: the full pass was skipped.")
+        elif not len(response['confidence']):
             print("No bounding boxes found.")
-        
-
-        try:
-            orig_path, det_path = file_line.split()[:2]
-        except Exception as e:
-            print("Error parsing file paths:", e)
-            return None, None, None, None, None
-
-        try:
-            original_image = Image.open(orig_path)
-            detected_image = Image.open(det_path)
-        except Exception as e:
-            print("Error loading images with PIL:", e)
-            return None, None, None, None, None
-
-        return orig_path, det_path, bboxes_tuple, confidence_scores, class_labels
+        if job is not None:
+            job.report_progress(1, 1, f"{len(response['confidence'])} candidate detections")
+        with timer.stage('cache_store'):
+            self.detection_cache.put(input_image_path, model_name, params,
+                                     response['bbox'], response['confidence'], response['classes'],
+                                     width=original.width, height=original.height, stage=response.get('stage'))
+
+        # Worker-side stages, plus what the round trip cost on top of them
+        worker_timings = response.get('timings') or {}
+        timer.update(worker_timings)
+        timer.add('dispatch', max(0.0, timer.stages['request'] - worker_timings.get('worker_total', 0.0)))
+        return Prediction(original, response['bbox'], response['confidence'], response['classes'],
+                          timings=timer.stages, source="worker", stage=response.get('stage'))
     
     # def run_porosity_model(self, input_image_path):
     #     command = [
@@ -939,74 +1174,23 @@ class Ui_WeldingDefectDetection(object):
     #     return orig_path, det_path, bboxes_adjusted, confidences, class_labels
 
     def copy_coordinates(self):
-        layout = self.ListBoundingBoxRightLower.widget().layout()
-        if layout is None:
-            return
-
-        while layout.count() > 0:
-            child = layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
-
-        for i in range(1, self.boxLayout2.count()):
-            item = self.boxLayout2.itemAt(i)
-            if not item:
-                continue
-            widget = item.widget()
-            if not widget:
-                continue
-
-            checkbox = widget.findChild(QtWidgets.QCheckBox, "CheckBox_bbox")
-            label = widget.findChild(QtWidgets.QLabel)
-
-            if checkbox and checkbox.isChecked():
-                # Extract stored properties
-                bbox = checkbox.property("bbox")
-                defect_class = checkbox.property("defect_class")
-                confidence = checkbox.property("confidence")
-
-                container = QtWidgets.QWidget()
-                v_layout = QtWidgets.QVBoxLayout(container)
-                v_layout.setContentsMargins(0, 0, 0, 0)
-                v_layout.setSpacing(2)
-
-                new_checkbox = QtWidgets.QCheckBox(checkbox.text())
-                new_checkbox.setObjectName("CheckBox_bbox")
-                new_checkbox.setStyleSheet(checkbox.styleSheet())
-                new_checkbox.setChecked(True)
-                new_checkbox.setProperty("bbox", bbox)
-                new_checkbox.setProperty("defect_class", defect_class)
-                new_checkbox.setProperty("confidence", confidence)
-
-                new_checkbox.stateChanged.connect(lambda state, cb=new_checkbox: self.redraw_from_lower())
-
-                # Recreate the label text using properties instead of label.text()
-                x, y, w, h = bbox if bbox else ("--", "--", "--", "--")
-                label_text = (
-                    f"<b><span style='color:blue'>Type of Defect:</span></b> {defect_class}<br>"
-                    f"<b><span style='color:blue'>Confidence:</span></b> {confidence:.2f}<br>"
-                    f"<b><span style='color:blue'>x:</span></b> {x}<br>"
-                    f"<b><span style='color:blue'>y:</span></b> {y}<br>"
-                    f"<b><span style='color:blue'>w:</span></b> {w}<br>"
-                    f"<b><span style='color:blue'>h:</span></b> {h}"
-                )
-                new_label = QtWidgets.QLabel(label_text)
-                new_label.setObjectName("lowerCheckBox")
-                # new_label.setStyleSheet("color: white; background: #222; border-radius: 4px; padding: 4px;")
-                new_label.setTextFormat(QtCore.Qt.RichText)
+        # The ticked detections become the lower list, all ticked
+        self.lower_list_edited = False
+        self.annotations.copy_from(self.detections, checked_only=True, checked=True)
 
-                v_layout.addWidget(new_checkbox)
-                v_layout.addWidget(new_label)
+    def redraw_from_upper(self, ids=None):
+        self.box3.show(self.detections, ids)
 
-                layout.addWidget(container)
+    def sync_select_all(self):
+        """Shows "Select All" only with detections listed and keeps it ticked while every row is."""
+        self.SelectAllBoxes.setVisible(len(self.detections) > 0)
+        self.SelectAllBoxes.setChecked(self.detections.all_checked())
 
-    def redraw_from_lower(self):
-        layout = self.ListBoundingBoxRightLower.widget().layout()
-        if layout is None:
+    def redraw_from_lower(self, ids=None):
+        # After an edit box 3 shows the edit window's pixmap; ticking must not replace it
+        if self.lower_list_edited:
             return
-
-        bbox_display = BoundingBoxDisplay(parent=self, image_path=self.current_image_path, boxLayout2=layout)
-        bbox_display.redraw_from_layout(layout)
+        self.box3.show(self.annotations, ids)
 
     def remove_bbox_from_image(self, bbox_to_remove):
         # Collect all remaining bounding boxes
@@ -1014,50 +1198,16 @@ class Ui_WeldingDefectDetection(object):
         remaining_confidences = []
         remaining_classes = []
 
-        # Iterate through the items in boxLayout3 to collect remaining bounding boxes
-        layout = self.ListBoundingBoxRightLower.widget().layout()
-        for i in range(layout.count()):
-            item = layout.itemAt(i)
-            if not item:
-                continue
-            widget = item.widget()
-            if not widget:
-                continue
-
-            checkbox = widget.findChild(QtWidgets.QCheckBox, "CheckBox_bbox")
-            if checkbox:
-                current_bbox = checkbox.property("bbox")
-                defect_class = checkbox.property("defect_class")
-                confidence = checkbox.property("confidence")  # Add confidence if stored
-                if current_bbox and current_bbox != bbox_to_remove:
-                    remaining_bboxes.append(current_bbox)
-                    remaining_classes.append(defect_class)
-                    remaining_confidences.append(confidence)
+        for item in self.annotations:
+            current_bbox = item.bbox
+            if current_bbox and current_bbox != tuple(bbox_to_remove):
+                remaining_bboxes.append(current_bbox)
+                remaining_classes.append(item.defect_class)
+                remaining_confidences.append(item.confidence)
 
     def delete_selected_coordinates(self):
-        # Get the layout of boxLayout3
-        layout = self.ListBoundingBoxRightLower.widget().layout()
-
-        # Iterate through the items in reverse order to avoid index shifting issues
-        for i in reversed(range(layout.count())):
-            item = layout.itemAt(i)
-            if not item:
-                continue
-            widget = item.widget()
-            if not widget:
-                continue
-
-            # Find the checkbox in the widget
-            checkbox = widget.findChild(QtWidgets.QCheckBox, "CheckBox_bbox")
-            if checkbox and not checkbox.isChecked():
-                # Remove the widget from the layout and delete it
-                layout.takeAt(i)
-                widget.deleteLater()
-
-                # Optionally, update the image to remove the corresponding bounding box
-                bbox = checkbox.property("bbox")
-                # if bbox:
-                    # self.remove_bbox_from_image(bbox) 
+        # Drops the unticked rows of the lower list
+        self.annotations.remove_unchecked()
 
     def open_file(self):
         """Opens a single file."""
@@ -1092,113 +1242,18 @@ class Ui_WeldingDefectDetection(object):
         else:
             print(f"Error: {new_stylesheet} not found.")
 
-    def get_lower_bbox_checklist(self):
-        """Extracts bbox info from ListBoundingBoxRightLower for PaintApp."""
-        layout = self.ListBoundingBoxRightLower.widget().layout()
-        checklist = []
-        for i in range(layout.count()):
-            item = layout.itemAt(i)
-            if not item:
-                continue
-            widget = item.widget()
-            if not widget:
-                continue
-            checkbox = widget.findChild(QtWidgets.QCheckBox, "CheckBox_bbox")
-            if checkbox:
-                bbox = checkbox.property("bbox")
-                defect_class = checkbox.property("defect_class")
-                confidence = checkbox.property("confidence")
-                text = checkbox.text()
-                checked = checkbox.isChecked()
-                # checkbox.property("points", None) 
-                if checkbox.property("bbox") is None:
-                    points = checkbox.property("points")  
-                    shape_type = checkbox.property("shape_type") 
-                    checklist.append({
-                        "bbox": bbox,
-                        "defect_class": defect_class,
-                        "confidence": confidence,
-                        "text": text,
-                        "checked": checked,
-                        "points": points,
-                        "shape_type": shape_type
-                    })
-                
-                else:
-                    checklist.append({
-                        "bbox": bbox,
-                        "defect_class": defect_class,
-                        "confidence": confidence,
-                        "text": text,
-                        "checked": checked
-                    })
-        return checklist
-    
-    def handle_edit_save(self, pixmap, checklist):
+    def handle_edit_save(self, pixmap, annotations):
         # Store for maximize logic
         self.last_edit_pixmap = pixmap
-        self.last_edit_checklist = checklist
+        self.last_edit_annotations = annotations
 
         # 1. Show the edited image in BoxEditImage
         self.show_eiditable_image_in_box3(pixmap)
 
-        # 2. Update ListBoundingBoxRightLower with the new checklist
-        layout = self.ListBoundingBoxRightLower.widget().layout()
-        # Clear existing items
-        while layout.count():
-            child = layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
-
-        # Add new checklist items
-        for idx, item in enumerate(checklist, 1):
-            container = QtWidgets.QWidget()
-            v_layout = QtWidgets.QVBoxLayout(container)
-            v_layout.setContentsMargins(0, 0, 0, 0)
-            v_layout.setSpacing(2)
-
-            checkbox = QtWidgets.QCheckBox(item.get("text", f"Box {idx}"))
-            checkbox.setObjectName("CheckBox_bbox")
-            checkbox.setChecked(item.get("checked", False))
-            checkbox.setProperty("bbox", item.get("bbox"))
-            checkbox.setProperty("defect_class", item.get("defect_class"))
-            checkbox.setProperty("confidence", item.get("confidence"))
-            checkbox.setProperty("points", item.get("points"))           # <-- ADD THIS LINE
-            checkbox.setProperty("shape_type", item.get("shape_type"))   # <-- ADD THIS LINE
-
-            bbox = item.get('bbox')
-            shape_type = item.get('shape_type')
-            points = item.get('points')
-
-            if bbox is not None and isinstance(bbox, (list, tuple)) and len(bbox) == 4:
-                x, y, w, h = bbox
-                bbox_text = (
-                    f"<b><span style='color:blue'>x:</span></b> {x}<br>"
-                    f"<b><span style='color:blue'>y:</span></b> {y}<br>"
-                    f"<b><span style='color:blue'>w:</span></b> {w}<br>"
-                    f"<b><span style='color:blue'>h:</span></b> {h}"
-                )
-            elif shape_type in ("polygon", "freehand") and points:
-                pts_list = [f"({int(p.x())},{int(p.y())})" for p in points]
-                pts_wrapped = "<br>".join([", ".join(pts_list[i:i + 4]) for i in range(0, len(pts_list), 4)])
-                bbox_text = f"<b><span style='color:blue'>Points:</span></b><br>{pts_wrapped}"
-            else:
-                bbox_text = "<b><span style='color:blue'>No coordinates</span></b>"
+        # 2. Update ListBoundingBoxRightLower with the edited annotations
+        self.lower_list_edited = True
+        self.annotations.copy_from(annotations)
 
-            label_text = (
-                f"<b><span style='color:blue'>Type of Defect:</span></b> {item.get('defect_class', '')}<br>"
-                f"<b><span style='color:blue'>Confidence:</span></b> {item.get('confidence', '-') if item.get('confidence') is not None else '-'}<br>"
-                f"{bbox_text}"
-            )
-            label = QtWidgets.QLabel(label_text)
-            label.setObjectName("lower_checkbox_after")
-            # label.setStyleSheet("color: white; background: #222; border-radius: 4px; padding: 4px;")
-            label.setTextFormat(QtCore.Qt.RichText)
-
-            v_layout.addWidget(checkbox)
-            v_layout.addWidget(label)
-            layout.addWidget(container)
-    
     def prompt_inspector_name(self):
         text, ok = QtWidgets.QInputDialog.getText(
             None, "Inspector Name", "Enter Inspector Name:"
@@ -1206,7 +1261,6 @@ class Ui_WeldingDefectDetection(object):
         if ok and text:
             # Call your report generation function here
             from utils.generate_report import generate_pdf_report
-            checklist = self.get_lower_bbox_checklist()
             orig_img = getattr(self, "current_image_path", "")
             det_img = getattr(self, "current_image_path", "")
             pdf_path, _ = QtWidgets.QFileDialog.getSaveFileName(
@@ -1217,7 +1271,7 @@ class Ui_WeldingDefectDetection(object):
                     pdf_path,
                     orig_img,
                     det_img,
-                    checklist,
+                    self.annotations,
                     inspector_name=text,
                     signature_path=None  # You can add a prompt for signature if needed
                 )
@@ -1239,5 +1293,9 @@ if __name__ == "__main__":
     WeldingDefectDetection = QtWidgets.QMainWindow()
     ui = Ui_WeldingDefectDetection()
     ui.setupUi(WeldingDefectDetection)
+    app.aboutToQuit.connect(ui.jobs.stop)
+    app.aboutToQuit.connect(ui.thumbnails.stop)
+    app.aboutToQuit.connect(ui.gallery_scanner.cancel)
+    app.aboutToQuit.connect(ui.inference_worker.stop)
     WeldingDefectDetection.show()
     sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,258 @@
+"""Headless batch detection over a folder of radiographs.
+
+Run from the GUI directory (like app.py)::
+
+    python batch.py /path/to/folder --model yolo --batch-size 8
+
+Images are decoded on a small thread pool while the previous batch is being
+inferred, fed to ``model.predict`` N at a time through the same
+DefectDetector the GUI uses, and one JSON record per image is appended to
+the output file (``detections.jsonl`` in the folder by default).
+
+Images already in the detection cache (same pixels, weights and threshold)
+are neither decoded nor inferred again.
+
+With ``--tile-size`` each image is instead inferred as overlapping tiles
+(see models/tiling.py), which finds small defects on large plates.
+
+With ``--cascade`` each batch is first screened at low resolution (see
+models/cascade.py) and only the images where the screen finds something get
+the full (or tiled) pass; the others are recorded with ``"stage":
+"screened_clean"`` and no boxes.  The number of images each stage handled is
+printed at the end.
+
+Duplicate and tiny boxes are suppressed with the model's settings from
+models/suppression.py; ``--merge``, ``--min-area`` and ``--containment``
+override them and ``--no-suppression`` keeps every box the model returns.
+"""
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from models.cascade import FULL, SCREENED_CLEAN, CascadeStats, cascade_settings, screen
+from models.suppression import suppression_settings
+from models.worker import DETECTOR_MODULES
+from utils.detection_cache import DetectionCache
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tif', '.tiff')
+
+# Sentinel put on the queue, as (_DONE, error), once the producer stops
+_DONE = object()
+
+
+def list_images(folder, recursive=False):
+    paths = []
+    if recursive:
+        for root, _, files in os.walk(folder):
+            paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(IMAGE_EXTENSIONS))
+    else:
+        with os.scandir(folder) as entries:
+            paths.extend(e.path for e in entries if e.is_file() and e.name.lower().endswith(IMAGE_EXTENSIONS))
+    paths.sort()
+    return paths
+
+
+def load_detector(model_name):
+    module = __import__(DETECTOR_MODULES[model_name], fromlist=['DefectDetector'])
+    return module.DefectDetector(model_name)
+
+
+def _decode_batches(detector, paths, batch_size, out_queue, decode_workers, cache, model_name, params):
+    """Producer: queues (paths, images, cached) batch by batch.
+
+    Cache hits are looked up here so they skip decoding; their image slot is None.
+    Always ends with (_DONE, error), error being the exception that stopped it
+    early or None, so the consumer never waits on a dead producer.
+    """
+    error = None
+    try:
+        with ThreadPoolExecutor(max_workers=decode_workers) as pool:
+            for start in range(0, len(paths), batch_size):
+                batch_paths = paths[start:start + batch_size]
+                cached = {}
+                if cache is not None:
+                    for p in batch_paths:
+                        hit = cache.get(p, model_name, params)
+                        if hit is not None:
+                            cached[p] = hit
+                to_decode = [p for p in batch_paths if p not in cached]
+                decoded = dict(zip(to_decode, pool.map(detector.load_image, to_decode)))
+                images = [decoded.get(p) for p in batch_paths]
+                out_queue.put((batch_paths, images, cached))
+    except Exception as e:
+        error = e
+    finally:
+        out_queue.put((_DONE, error))
+
+
+def _record(path, model_name, width, height, bbox, confidence, classs, stage=None):
+    record = {
+        'path': path,
+        'ok': True,
+        'model': model_name,
+        'width': width,
+        'height': height,
+        'boxes': bbox,
+        'confidences': confidence,
+        'classes': [int(c) for c in classs],
+    }
+    if stage is not None:
+        record['stage'] = stage
+    return record
+
+
+def run_batch(folder, model_name='yolo', batch_size=8, threshold=0.25, output=None,
+              recursive=False, decode_workers=4, prefetch=2, use_cache=True, tiling=None, cascade=None,
+              suppression=None):
+    """``cascade`` is a dict of screening settings (see models.cascade.cascade_settings) or None.
+
+    ``suppression`` is a dict of duplicate-box suppression settings (see
+    models.suppression.suppression_settings), None for the model's own or
+    empty to keep every box.
+    """
+    detector = load_detector(model_name)
+    if suppression is not None:
+        detector.suppression = suppression
+    cache = DetectionCache() if use_cache else None
+    params = {'conf': threshold, 'suppression': detector.suppression}
+    if tiling:
+        params['tiling'] = tiling
+    if cascade:
+        params['cascade'] = cascade
+    stats = CascadeStats()
+    paths = list_images(folder, recursive=recursive)
+    output = output or os.path.join(folder, 'detections.jsonl')
+    if not paths:
+        print(f"No images found in {folder}")
+        return 0
+
+    # Bounded so decoding runs at most `prefetch` batches ahead of inference
+    batches = queue.Queue(maxsize=prefetch)
+    producer = threading.Thread(
+        target=_decode_batches,
+        args=(detector, paths, batch_size, batches, decode_workers, cache, model_name, params),
+        daemon=True,
+    )
+    producer.start()
+
+    done = 0
+    start_time = time.perf_counter()
+    with open(output, 'a') as out:
+        while True:
+            item = batches.get()
+            if item[0] is _DONE:
+                if item[1] is not None:
+                    # Raised in the producer thread
+                    raise item[1]
+                break
+            batch_paths, images, cached = item
+
+            records = {}
+            for p, hit in cached.items():
+                # Counted under the stage the image went through when it was cached
+                stats.add(hit['stage'])
+                records[p] = _record(p, model_name, hit['width'], hit['height'], hit['bbox'].tolist(),
+                                     hit['confidence'].tolist(), hit['classes'].tolist(), stage=hit['stage'])
+            valid = [(p, img) for p, img in zip(batch_paths, images) if img is not None]
+            for p, img in zip(batch_paths, images):
+                if img is None and p not in cached:
+                    records[p] = {'path': p, 'ok': False, 'error': 'Failed to load image.'}
+
+            # Cascade: one low-resolution pass over the batch picks the images worth a full pass
+            stages = {}
+            full = valid
+            if valid and cascade:
+                suspect, _ = screen(detector.load_model(), [img for _, img in valid], **cascade)
+                stages = {p: FULL if s else SCREENED_CLEAN for (p, _), s in zip(valid, suspect)}
+                full = [(p, img) for p, img in valid if stages[p] == FULL]
+
+            if full and tiling:
+                # Tiles are batched inside predict_tiled, so go image by image
+                detector.threshold, detector.tiling, detector.cascade = threshold, tiling, None
+                predictions = [detector.detect_defect_boundary(img, draw=False)[2:] for _, img in full]
+            elif full:
+                predictions = detector.predict_batch([img for _, img in full], threshold=threshold)
+            else:
+                predictions = []
+            predictions = dict(zip([p for p, _ in full], predictions))
+
+            for p, img in valid:
+                bbox, confidence, classs = predictions.get(p, ([], [], []))
+                height, width = img.shape[:2]
+                stage = stages.get(p)
+                stats.add(stage)
+                records[p] = _record(p, model_name, width, height, bbox, confidence, classs, stage=stage)
+                if cache is not None:
+                    cache.put(p, model_name, params, bbox, confidence, classs, width=width, height=height,
+                              stage=stage)
+
+            for p in batch_paths:
+                out.write(json.dumps(records[p]) + '\n')
+            out.flush()
+
+            done += len(batch_paths)
+            elapsed = time.perf_counter() - start_time
+            print(f"{done}/{len(paths)} images, {done / elapsed * 3600:.0f} images/hour", file=sys.stderr)
+
+    producer.join()
+    if cache is not None:
+        cache.close()
+    if cascade:
+        print(f"Cascade: {stats.summary()}", file=sys.stderr)
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run defect detection over a folder of images.")
+    parser.add_argument('folder')
+    parser.add_argument('--model', default='yolo', choices=sorted(DETECTOR_MODULES))
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--threshold', type=float, default=0.25)
+    parser.add_argument('--output', help="JSONL file to append to (default: <folder>/detections.jsonl)")
+    parser.add_argument('--recursive', action='store_true', help="Also process subfolders")
+    parser.add_argument('--decode-workers', type=int, default=4)
+    parser.add_argument('--no-cache', action='store_true', help="Ignore and do not update the detection cache")
+    parser.add_argument('--tile-size', type=int, help="Infer overlapping tiles of this size instead of the whole image")
+    parser.add_argument('--tile-overlap', type=float, default=0.2, help="Tile overlap fraction (default: 0.2)")
+    parser.add_argument('--cascade', action='store_true',
+                        help="Screen each image at low resolution first; run the full pass only where it finds something")
+    parser.add_argument('--screen-size', type=int, help="Input size of the screening pass (default: per model)")
+    parser.add_argument('--screen-conf', type=float, help="Confidence that escalates an image (default: per model)")
+    parser.add_argument('--screen-weights', help="Separate screening model (default: the model itself)")
+    parser.add_argument('--merge', choices=['nms', 'wbf', 'none'],
+                        help="How overlapping duplicate boxes are merged (default: per model)")
+    parser.add_argument('--min-area', type=float, help="Drop boxes smaller than this many pixels (default: per model)")
+    parser.add_argument('--containment', type=float,
+                        help="Drop a box this much inside a larger one of its class (default: per model)")
+    parser.add_argument('--no-suppression', action='store_true', help="Keep every box the model returns")
+    args = parser.parse_args(argv)
+    tiling = {'tile_size': args.tile_size, 'overlap': args.tile_overlap} if args.tile_size else None
+    cascade = cascade_settings(args.model, imgsz=args.screen_size, conf=args.screen_conf,
+                               weights=args.screen_weights) if args.cascade else None
+    suppression = {} if args.no_suppression else suppression_settings(
+        args.model, min_area=args.min_area, containment=args.containment, merge=args.merge)
+    if suppression.get('merge') == 'none':
+        suppression['merge'] = None
+
+    run_batch(
+        args.folder,
+        model_name=args.model,
+        batch_size=args.batch_size,
+        threshold=args.threshold,
+        output=args.output,
+        recursive=args.recursive,
+        decode_workers=args.decode_workers,
+        use_cache=not args.no_cache,
+        tiling=tiling,
+        cascade=cascade,
+        suppression=suppression,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""Offline CPU benchmark of detection latency and throughput.
+
+Run from the GUI directory (like app.py)::
+
+    python benchmark.py --output bench.json
+    python benchmark.py --backends torch onnx int8 --batch-sizes 1 4 8
+    python benchmark.py --compare bench_baseline.json --tolerance 0.15
+
+A fixed set of synthetic weld radiographs is generated (seeded, so every run
+and every machine sees the same pixels) at several resolutions, or loaded
+from ``--images``.  For every model, backend and resolution it measures
+
+* cold latency: the first ``DefectDetector.run`` after the model cache is
+  cleared, i.e. weight loading plus the first inference;
+* warm latency: mean, p50, p95 and p99 of ``DefectDetector.run`` once the
+  model is loaded, and images/sec;
+* the batch path: ``predict_batch`` at each batch size (p50/p95/p99 per
+  batch and images/sec), plus end-to-end ``run_batch`` throughput over the
+  resolution's folder.
+
+Results are written as JSON.  With ``--compare`` they are checked against a
+stored baseline: a latency more than ``--tolerance`` slower or a throughput
+that much lower is reported as a regression and the exit status is 1.
+
+Everything runs on the CPU and needs no network.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+# Before torch / ultralytics are imported: CPU only, no update or font downloads
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+os.environ.setdefault("YOLO_OFFLINE", "1")
+
+import cv2
+import numpy as np
+
+from batch import list_images, load_detector, run_batch
+from models import weights
+from models.model_cache import clear_models
+
+BACKENDS = ('torch', 'onnx', 'int8')
+DEFAULT_RESOLUTIONS = ('640x480', '1280x960', '2048x1536')
+DEFAULT_DATA_DIR = os.path.join(os.path.expanduser("~"), ".cache", "drdo", "bench")
+SEED = 1234
+
+
+# ---------------------------------------------------------
+#                  SYNTHETIC RADIOGRAPHS
+# ---------------------------------------------------------
+
+def synthetic_radiograph(width, height, rng):
+    """A grey plate with a horizontal weld seam, film grain and a few defect-like marks."""
+    y = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    x = np.linspace(0, 1, width, dtype=np.float32)[None, :]
+    plate = 90 + 40 * x + 15 * y  # exposure gradient
+
+    # Bright weld seam with a wavy centre line
+    centre = height * (0.5 + 0.05 * np.sin(2 * np.pi * x * rng.uniform(1, 3)))
+    half_width = height * rng.uniform(0.06, 0.1)
+    seam = np.exp(-((np.arange(height, dtype=np.float32)[:, None] - centre) / half_width) ** 2)
+    image = plate + 70 * seam
+
+    image += rng.normal(0, 6, (height, width)).astype(np.float32)
+    image = np.clip(image, 0, 255).astype(np.uint8)
+
+    scale = min(width, height) / 640
+    # Porosity: small dark round pores in the seam
+    for _ in range(rng.integers(3, 12)):
+        cx = int(rng.uniform(0.05, 0.95) * width)
+        cy = int(centre[0, min(cx, width - 1)] + rng.uniform(-0.5, 0.5) * half_width)
+        cv2.circle(image, (cx, cy), max(1, int(rng.uniform(2, 7) * scale)), int(rng.uniform(30, 70)), -1)
+    # Cracks / lack of fusion: thin dark lines along the seam
+    for _ in range(rng.integers(1, 4)):
+        x0 = int(rng.uniform(0.05, 0.8) * width)
+        x1 = min(width - 1, x0 + int(rng.uniform(0.05, 0.2) * width))
+        y0 = int(centre[0, x0] + rng.uniform(-0.3, 0.3) * half_width)
+        y1 = y0 + int(rng.uniform(-0.2, 0.2) * half_width)
+        cv2.line(image, (x0, y0), (x1, y1), int(rng.uniform(40, 80)), max(1, int(scale)))
+
+    return cv2.GaussianBlur(image, (3, 3), 0)
+
+
+def parse_resolution(text):
+    width, height = (int(v) for v in text.lower().split('x'))
+    return width, height
+
+
+def synthetic_dataset(data_dir, resolutions, per_resolution):
+    """Writes (once) and returns {resolution: [paths]} of the synthetic radiographs."""
+    dataset = {}
+    for resolution in resolutions:
+        width, height = parse_resolution(resolution)
+        folder = os.path.join(data_dir, f"{width}x{height}")
+        os.makedirs(folder, exist_ok=True)
+        # Seeded per resolution, so adding a resolution does not change the others
+        rng = np.random.default_rng([SEED, width, height])
+        paths = []
+        for i in range(per_resolution):
+            path = os.path.join(folder, f"weld_{i:03d}.png")
+            image = synthetic_radiograph(width, height, rng)
+            if not os.path.exists(path):
+                cv2.imwrite(path, image)
+            paths.append(path)
+        dataset[f"{width}x{height}"] = paths
+    return dataset
+
+
+def folder_dataset(folder):
+    """Groups the images of ``folder`` by resolution."""
+    dataset = {}
+    for path in list_images(folder, recursive=True):
+        image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if image is None:
+            continue
+        dataset.setdefault(f"{image.shape[1]}x{image.shape[0]}", []).append(path)
+    return dataset
+
+
+# ---------------------------------------------------------
+#                  MEASUREMENT
+# ---------------------------------------------------------
+
+def summarize(latencies_ms, images_per_call=1):
+    latencies = np.asarray(latencies_ms, dtype=np.float64)
+    total_s = latencies.sum() / 1000
+    return {
+        'runs': len(latencies),
+        'mean_ms': round(float(latencies.mean()), 2),
+        'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'p95_ms': round(float(np.percentile(latencies, 95)), 2),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 2),
+        'images_per_s': round(len(latencies) * images_per_call / total_s, 2) if total_s else 0.0,
+    }
+
+
+def model_name_for(model, backend):
+    return f"{model}_int8" if backend == 'int8' else model
+
+
+def select_backend(model, backend):
+    """Points ``model`` at ``backend``'s weights; returns the weight file, or None if it is missing."""
+    if backend != 'int8':
+        weights.MODEL_BACKENDS[model] = backend
+    path = weights.active_weights(model_name_for(model, backend))
+    return path if os.path.exists(path) else None
+
+
+def bench_single(detector, paths, warmup, iterations, threshold, draw):
+    """Cold and warm latency of DefectDetector.run over ``paths``."""
+    clear_models()
+    start = time.perf_counter()
+    detector.run(paths[0], threshold=threshold, draw=draw)
+    cold_ms = (time.perf_counter() - start) * 1000
+
+    for i in range(warmup):
+        detector.run(paths[i % len(paths)], threshold=threshold, draw=draw)
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        detector.run(paths[i % len(paths)], threshold=threshold, draw=draw)
+        latencies.append((time.perf_counter() - start) * 1000)
+    result = summarize(latencies)
+    result['cold_ms'] = round(cold_ms, 2)
+    return result
+
+
+def bench_batch(detector, images, batch_size, warmup, iterations, threshold):
+    """Latency per predict_batch call of ``batch_size`` images, and images/sec."""
+    batches = [[images[(start + j) % len(images)] for j in range(batch_size)]
+               for start in range(0, len(images), batch_size)]
+    for i in range(warmup):
+        detector.predict_batch(batches[i % len(batches)], threshold=threshold)
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        detector.predict_batch(batches[i % len(batches)], threshold=threshold)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return summarize(latencies, images_per_call=batch_size)
+
+
+def bench_run_batch(paths, model_name, batch_size, threshold):
+    """End-to-end images/sec of batch mode over ``paths`` (decode pipeline included, detection cache off)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        # run_batch takes a folder: give it one holding just the benchmarked images
+        folder = os.path.join(tmp, 'images')
+        os.mkdir(folder)
+        for i, path in enumerate(paths):
+            link = os.path.join(folder, f"{i:05d}_{os.path.basename(path)}")
+            try:
+                os.symlink(os.path.abspath(path), link)
+            except OSError:  # no symlink permission (Windows)
+                shutil.copyfile(path, link)
+        # run_batch prints per-batch progress; keep the benchmark output readable
+        with contextlib.redirect_stderr(io.StringIO()):
+            start = time.perf_counter()
+            done = run_batch(folder, model_name=model_name, batch_size=batch_size, threshold=threshold,
+                             output=os.path.join(tmp, 'detections.jsonl'), use_cache=False)
+            elapsed = time.perf_counter() - start
+    return {'images': done, 'images_per_s': round(done / elapsed, 2) if elapsed else 0.0}
+
+
+def run_benchmark(dataset, models, backends, batch_sizes, warmup=3, iterations=20, threshold=0.25, draw=False):
+    results = []
+    for model in models:
+        for backend in backends:
+            weight_path = select_backend(model, backend)
+            if weight_path is None:
+                print(f"{model}/{backend}: weights not found, skipped")
+                continue
+            model_name = model_name_for(model, backend)
+            detector = load_detector(model_name)
+            for resolution, paths in dataset.items():
+                entry = {'model': model, 'backend': backend, 'resolution': resolution}
+                single = bench_single(detector, paths, warmup, iterations, threshold, draw)
+                results.append(dict(entry, mode='single', batch_size=1, **single))
+                print(f"{model}/{backend} {resolution} run: cold {single['cold_ms']:.0f} ms, "
+                      f"p50 {single['p50_ms']:.1f} / p95 {single['p95_ms']:.1f} / p99 {single['p99_ms']:.1f} ms, "
+                      f"{single['images_per_s']:.1f} img/s")
+
+                images = [detector.load_image(p) for p in paths]
+                for batch_size in batch_sizes:
+                    batch = bench_batch(detector, images, batch_size, warmup, iterations, threshold)
+                    batch['end_to_end_images_per_s'] = bench_run_batch(
+                        paths, model_name, batch_size, threshold)['images_per_s']
+                    results.append(dict(entry, mode='batch', batch_size=batch_size, **batch))
+                    print(f"{model}/{backend} {resolution} batch {batch_size}: "
+                          f"p50 {batch['p50_ms']:.1f} / p95 {batch['p95_ms']:.1f} / p99 {batch['p99_ms']:.1f} ms, "
+                          f"{batch['images_per_s']:.1f} img/s, end-to-end {batch['end_to_end_images_per_s']:.1f} img/s")
+    return results
+
+
+def environment():
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'host': platform.node(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+    }
+
+
+# ---------------------------------------------------------
+#                  BASELINE COMPARISON
+# ---------------------------------------------------------
+
+# Metric -> True if higher is better
+COMPARED_METRICS = {
+    'cold_ms': False, 'p50_ms': False, 'p95_ms': False, 'p99_ms': False,
+    'images_per_s': True, 'end_to_end_images_per_s': True,
+}
+
+
+# Fields that identify the same measurement in two reports
+RESULT_KEY = ('model', 'backend', 'resolution', 'mode', 'batch_size')
+
+
+def compare(results, baseline, tolerance=0.1, key_fields=RESULT_KEY, metrics=COMPARED_METRICS):
+    """Regressions of ``results`` against ``baseline``: a list of dicts, empty if none.
+
+    ``metrics`` maps metric name -> True if higher is better.
+    """
+    def result_key(result):
+        return tuple(result.get(field) for field in key_fields)
+
+    previous = {result_key(r): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        old = previous.get(result_key(result))
+        if old is None:
+            continue
+        for metric, higher_is_better in metrics.items():
+            if metric not in result or not old.get(metric):
+                continue
+            change = (result[metric] - old[metric]) / old[metric]
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append({
+                    'key': '/'.join(str(v) for v in result_key(result)),
+                    'metric': metric,
+                    'baseline': old[metric],
+                    'current': result[metric],
+                    'change': round(change, 3),
+                })
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark detection latency and throughput on the CPU.")
+    parser.add_argument('--models', nargs='+', default=sorted(weights.MODEL_WEIGHTS),
+                        help="Models to benchmark (default: all)")
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS),
+                        help="Backends among torch, onnx, int8 (default: all with weights on disk)")
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 4, 8])
+    parser.add_argument('--resolutions', nargs='+', default=list(DEFAULT_RESOLUTIONS),
+                        help="Synthetic image sizes, WIDTHxHEIGHT")
+    parser.add_argument('--per-resolution', type=int, default=8, help="Synthetic images per resolution")
+    parser.add_argument('--images', help="Benchmark on this folder of radiographs instead of synthetic ones")
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="Where the synthetic images are kept")
+    parser.add_argument('--warmup', type=int, default=3, help="Untimed runs before measuring")
+    parser.add_argument('--iterations', type=int, default=20, help="Timed runs per measurement")
+    parser.add_argument('--threshold', type=float, default=0.25)
+    parser.add_argument('--draw', action='store_true', help="Draw the overlay in DefectDetector.run")
+    parser.add_argument('--threads', type=int, help="Limit OpenCV / torch CPU threads")
+    parser.add_argument('--output', default='benchmark.json', help="Where to write the results")
+    parser.add_argument('--compare', help="Baseline JSON to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="Allowed relative slowdown before flagging a regression (default: 0.1)")
+    args = parser.parse_args()
+
+    unknown = set(args.models) - set(weights.MODEL_WEIGHTS)
+    if unknown:
+        parser.error(f"unknown model(s): {', '.join(sorted(unknown))}")
+    unknown = set(args.backends) - set(BACKENDS)
+    if unknown:
+        parser.error(f"unknown backend(s): {', '.join(sorted(unknown))}")
+    try:
+        resolutions = [f"{w}x{h}" for w, h in map(parse_resolution, args.resolutions)]
+    except ValueError:
+        parser.error("resolutions must look like 1280x960")
+
+    if args.threads:
+        cv2.setNumThreads(args.threads)
+        os.environ['OMP_NUM_THREADS'] = str(args.threads)
+    if args.images:
+        dataset = folder_dataset(args.images)
+    else:
+        dataset = synthetic_dataset(args.data_dir, resolutions, args.per_resolution)
+    if not dataset:
+        print("No images to benchmark.")
+        sys.exit(1)
+
+    results = run_benchmark(dataset, args.models, args.backends, args.batch_sizes, warmup=args.warmup,
+                            iterations=args.iterations, threshold=args.threshold, draw=args.draw)
+    report = {
+        'environment': environment(),
+        'settings': {
+            'models': args.models, 'backends': args.backends, 'batch_sizes': args.batch_sizes,
+            'images': args.images, 'resolutions': sorted(dataset), 'warmup': args.warmup,
+            'iterations': args.iterations, 'threshold': args.threshold, 'draw': args.draw, 'seed': SEED,
+        },
+        'results': results,
+    }
+
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        report['baseline'] = args.compare
+        report['regressions'] = regressions
+        for r in regressions:
+            print(f"REGRESSION {r['key']} {r['metric']}: {r['baseline']} -> {r['current']} ({r['change']:+.1%})")
+        print(f"{len(regressions)} regression(s) against {args.compare} (tolerance {args.tolerance:.0%})")
+        status = 1 if regressions else 0
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+    sys.exit(status)
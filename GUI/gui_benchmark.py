@@ -0,0 +1,228 @@
+"""Offscreen microbenchmarks of the bounding-box review panes.
+
+Run from the GUI directory (like app.py)::
+
+    python gui_benchmark.py --output gui_bench.json
+    python gui_benchmark.py --sizes 10 100 1000 --compare gui_bench_baseline.json
+
+Builds the real main window on Qt's offscreen platform (no model is loaded)
+and drives the paths that fill the detection lists or repaint the whole
+image, with 10, 100, 1,000 and 10,000 synthetic detections:
+
+* ``display_bbox``: the upper list (BoxList2) after a detection;
+* ``redraw_all_rectangles``: box 3 with every box ticked;
+* ``copy_coordinates``: the ticked boxes copied to the lower list;
+* ``handle_edit_save``: the lower list replaced by the edit window's
+  annotations (one polygon in ten, like PaintApp returns).
+
+Each step reports wall time (including the event processing that lays out
+and paints the new rows) and the peak resident memory above the level before
+the step, sampled while it runs.  Results are written as JSON; ``--compare``
+flags steps that got slower or bigger than a stored baseline.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import cv2
+import numpy as np
+from PyQt5 import QtCore, QtWidgets
+
+from app import Ui_WeldingDefectDetection
+from benchmark import compare, environment, synthetic_radiograph
+from show_bounding_copy import BoundingBoxDisplay
+
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+IMAGE_SIZE = (2048, 1536)
+SEED = 1234
+STEPS = ('display_bbox', 'redraw_all_rectangles', 'copy_coordinates', 'handle_edit_save')
+
+# Metric -> True if higher is better
+COMPARED_METRICS = {'wall_ms': False, 'peak_rss_kb': False}
+RESULT_KEY = ('step', 'detections')
+
+
+class BenchmarkWindow(Ui_WeldingDefectDetection):
+    """The main window without the inference worker: nothing here runs a model."""
+
+    def warm_up_model(self, model_name):
+        pass
+
+
+def rss_kb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+class PeakMemory:
+    """Samples the resident set size on a thread while the block runs; ``peak_kb`` is above the start."""
+
+    def __init__(self, interval=0.002):
+        self.interval = interval
+        self.peak_kb = 0
+
+    def __enter__(self):
+        self._stop = threading.Event()
+        self._start = self._peak = rss_kb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self._peak = max(self._peak, rss_kb())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._peak = max(self._peak, rss_kb())
+        self.peak_kb = self._peak - self._start
+        return False
+
+
+def synthetic_detections(count, width, height, rng):
+    """(x, y, w, h) boxes, confidences and class ids, as arrays like apply_threshold passes them."""
+    w = rng.uniform(8, width / 8, count)
+    h = rng.uniform(8, height / 8, count)
+    x = rng.uniform(0, width - w)
+    y = rng.uniform(0, height - h)
+    boxes = np.stack([x, y, w, h], axis=1).astype(np.float32)
+    confidences = rng.uniform(0.25, 1.0, count).astype(np.float32)
+    classes = rng.integers(0, 8, count).astype(np.float32)
+    return boxes, confidences, classes
+
+
+def edit_annotations(annotations):
+    """The lower list's annotations as the edit window hands them back: every tenth box became a polygon."""
+    edited = annotations.copy()
+    rows = edited.boxes[9::10]
+    edited.remove(rows['id'].tolist())
+    shape = np.array([(0, 0), (0.5, 0.1), (1, 0), (0.9, 0.5), (1, 1), (0.5, 0.9), (0, 1)], dtype=np.float32)
+    edited.extend({
+        'shape_type': 'polygon',
+        'points': np.array([x, y]) + shape * np.array([w, h]),
+        'defect_class': int(class_id),
+        'confidence': float(confidence),
+        'checked': bool(checked),
+        'number': int(number),
+    } for x, y, w, h, class_id, confidence, checked, number in zip(
+        rows['x'], rows['y'], rows['w'], rows['h'], rows['class_id'], rows['confidence'], rows['checked'],
+        rows['number']))
+    return edited
+
+
+def flush_events(app):
+    app.processEvents()
+    # Rows replaced by the step were deleteLater()'d; free them now, not in the next step
+    QtCore.QCoreApplication.sendPostedEvents(None, QtCore.QEvent.DeferredDelete)
+    app.processEvents()
+
+
+def measure(app, fn):
+    """Wall ms and peak RSS (KB) of ``fn()`` plus the event processing it triggers."""
+    flush_events(app)
+    with PeakMemory() as memory:
+        start = time.perf_counter()
+        fn()
+        app.processEvents()
+        wall_ms = (time.perf_counter() - start) * 1000
+    return wall_ms, memory.peak_kb
+
+
+def run_steps(app, ui, image_path, detections, pixmap):
+    """Runs the four steps once, in the order an inspector would; returns {step: (wall_ms, peak_kb)}."""
+    bboxes, confidences, classes = detections
+    bbox_display = BoundingBoxDisplay(parent=ui, image_path=image_path, view=ui.BoxList2)
+    timings = {}
+    timings['display_bbox'] = measure(app, lambda: bbox_display.display_bbox(bboxes, confidences, classes))
+    ui.detections.set_all_checked(True)
+    timings['redraw_all_rectangles'] = measure(app, bbox_display.redraw_all_rectangles)
+    timings['copy_coordinates'] = measure(app, ui.copy_coordinates)
+    edited = edit_annotations(ui.annotations)
+    timings['handle_edit_save'] = measure(app, lambda: ui.handle_edit_save(pixmap, edited))
+    return timings
+
+
+def run_benchmark(app, ui, image_path, sizes, repeat=3):
+    rng = np.random.default_rng(SEED)
+    pixmap = ui.BoxEditImage.pixmap().copy() if ui.BoxEditImage.pixmap() else None
+    results = []
+    for count in sizes:
+        detections = synthetic_detections(count, IMAGE_SIZE[0], IMAGE_SIZE[1], rng)
+        runs = [run_steps(app, ui, image_path, detections, pixmap) for _ in range(repeat)]
+        for step in STEPS:
+            walls = [run[step][0] for run in runs]
+            peaks = [run[step][1] for run in runs]
+            result = {
+                'step': step,
+                'detections': count,
+                'runs': repeat,
+                'wall_ms': round(statistics.median(walls), 2),
+                'wall_min_ms': round(min(walls), 2),
+                'peak_rss_kb': max(peaks),
+            }
+            results.append(result)
+            print(f"{step:<24}{count:>7} boxes: {result['wall_ms']:>10.1f} ms (min {result['wall_min_ms']:.1f}), "
+                  f"peak +{result['peak_rss_kb'] / 1024:.1f} MB")
+        # Leave the panes empty before the next size
+        ui.detections.clear()
+        ui.annotations.clear()
+        flush_events(app)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the bounding-box panes offscreen.")
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(DEFAULT_SIZES), help="Detection counts")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per size; the median is reported")
+    parser.add_argument('--output', default='gui_benchmark.json', help="Where to write the results")
+    parser.add_argument('--compare', help="Baseline JSON to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help="Allowed relative slowdown / growth before flagging a regression (default: 0.1)")
+    args = parser.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv)
+    window = QtWidgets.QMainWindow()
+    ui = BenchmarkWindow()
+    ui.setupUi(window)
+    ui.stackedLayout.setCurrentIndex(1)  # main UI, so the panes are laid out and painted
+    window.show()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        image_path = os.path.join(tmp, "weld.png")
+        cv2.imwrite(image_path, synthetic_radiograph(*IMAGE_SIZE, np.random.default_rng(SEED)))
+        ui.show_original_image_in_box1(image_path)
+        ui.show_eiditable_image_in_box3(image_path)
+        results = run_benchmark(app, ui, image_path, args.sizes, repeat=max(1, args.repeat))
+    ui.jobs.stop()
+
+    report = {
+        'environment': environment(),
+        'settings': {'sizes': args.sizes, 'repeat': args.repeat, 'image_size': list(IMAGE_SIZE),
+                     'platform': QtWidgets.QApplication.platformName(), 'seed': SEED},
+        'results': results,
+    }
+
+    status = 0
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, key_fields=RESULT_KEY, metrics=COMPARED_METRICS)
+        report['baseline'] = args.compare
+        report['regressions'] = regressions
+        for r in regressions:
+            print(f"REGRESSION {r['key']} {r['metric']}: {r['baseline']} -> {r['current']} ({r['change']:+.1%})")
+        print(f"{len(regressions)} regression(s) against {args.compare} (tolerance {args.tolerance:.0%})")
+        status = 1 if regressions else 0
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+    sys.exit(status)
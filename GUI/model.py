@@ -1,6 +1,6 @@
 import cv2
 import numpy as np
-from ultralytics import YOLO
+from models.model_cache import get_model
 import os
 import tempfile
 
@@ -34,7 +34,7 @@ class DefectDetector:
             image_rgb = image.copy()
 
         weight_path = os.path.join(base_dir, "best.pt")
-        model = YOLO(weight_path)
+        model = get_model(weight_path)
         results = model.predict(image_rgb, conf=0.25)
 
         image_detected = image_rgb.copy()
@@ -0,0 +1,217 @@
+"""Vectorised NumPy helpers for xyxy box arrays.
+
+Used to merge detections coming from several predictions of the same image
+(overlapping tiles, several models) and to suppress duplicates within one
+(models/suppression.py).  Everything works on (N, 4) float arrays of xyxy
+boxes plus length-N score and class arrays.
+
+Greedy suppression is resolved on the whole (N, N) overlap matrix at once:
+box j is dropped when a kept box ranked above it overlaps it too much, and
+that rule is re-applied to the matrix until the kept set stops changing,
+which gives exactly the result of the one-box-at-a-time greedy loop.
+Scattered boxes settle in a few passes; a chain of boxes each overlapping
+the next settles one box per pass, so after ``MAX_DENSE_PASSES`` the matrix
+is walked row by row instead.  Past ``DENSE_MAX_BOXES`` boxes (raw
+candidates of a very low confidence threshold) the matrix would cost more
+memory than it saves time, and the greedy loop computes one row at a time.
+"""
+import numpy as np
+
+
+def to_numpy(x):
+    """Tensor (torch backend) or array (ONNX backend) -> NumPy array."""
+    return x.cpu().numpy() if hasattr(x, "cpu") else np.asarray(x)
+
+
+# Largest box count resolved on a dense (N, N) overlap matrix
+DENSE_MAX_BOXES = 2048
+# Whole-matrix passes of greedy_keep before it finishes row by row
+MAX_DENSE_PASSES = 8
+
+
+def box_area(boxes):
+    return np.clip(boxes[:, 2] - boxes[:, 0], 0, None) * np.clip(boxes[:, 3] - boxes[:, 1], 0, None)
+
+
+def _intersection(a, b):
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    wh = np.clip(rb - lt, 0, None)
+    return wh[..., 0] * wh[..., 1]
+
+
+def box_iou(a, b):
+    """Pairwise IoU between (N, 4) and (M, 4) boxes, as an (N, M) array."""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    inter = _intersection(a, b)
+    union = box_area(a)[:, None] + box_area(b)[None, :] - inter
+    return inter / np.maximum(union, 1e-9)
+
+
+def box_containment(a, b):
+    """Share of each (M, 4) box ``b`` lying inside each (N, 4) box ``a``, as an (N, M) array."""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 4)
+    return _intersection(a, b) / np.maximum(box_area(b)[None, :], 1e-9)
+
+
+def greedy_keep(overlap, threshold):
+    """Greedy suppression over an (N, N) overlap matrix of boxes sorted best first.
+
+    Returns a bool mask of the boxes kept: box j is suppressed when a kept
+    box ranked above it overlaps it by more than ``threshold``.  The rule is
+    applied to all boxes at once and repeated until the mask is stable; box
+    i's decision only depends on boxes ranked above it, so the stable mask is
+    the one the sequential greedy loop finds.  If it is not stable after
+    ``MAX_DENSE_PASSES`` (long chains of overlaps), the rows are walked in
+    order instead.
+    """
+    suppresses = np.triu(np.asarray(overlap) > threshold, k=1)
+    keep = np.ones(len(suppresses), dtype=bool)
+    for _ in range(MAX_DENSE_PASSES):
+        updated = ~suppresses[keep].any(axis=0)
+        if np.array_equal(updated, keep):
+            return keep
+        keep = updated
+
+    keep = np.ones(len(suppresses), dtype=bool)
+    for i in range(len(suppresses)):
+        if keep[i]:
+            keep[i + 1:] &= ~suppresses[i, i + 1:]
+    return keep
+
+
+def greedy_suppress(ranked, overlap, threshold):
+    """Keep mask of ``ranked`` boxes (best first) under greedy suppression.
+
+    ``overlap(a, b)`` gives the pairwise (N, M) overlap of box arrays, e.g.
+    box_iou.  Up to ``DENSE_MAX_BOXES`` boxes it is computed once for all
+    pairs (greedy_keep); past that, one row per kept box.
+    """
+    if len(ranked) <= DENSE_MAX_BOXES:
+        return greedy_keep(overlap(ranked, ranked), threshold)
+
+    keep = np.zeros(len(ranked), dtype=bool)
+    remaining = np.arange(len(ranked))
+    while remaining.size:
+        best = remaining[0]
+        keep[best] = True
+        remaining = remaining[1:]
+        if remaining.size:
+            remaining = remaining[overlap(ranked[best:best + 1], ranked[remaining])[0] <= threshold]
+    return keep
+
+
+def _class_offset(boxes, classes):
+    """Shifts boxes of different classes apart so they can never overlap."""
+    if not len(boxes):
+        return boxes
+    offset = float(boxes.max()) + 1.0
+    return boxes + (classes.astype(np.float32) * offset)[:, None]
+
+
+def nms(boxes, scores, classes=None, iou_threshold=0.5):
+    """Greedy non-maximum suppression; returns the indices to keep, best first.
+
+    With ``classes`` it is class-aware (boxes of different classes never
+    suppress each other); without it every box competes with every other.
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+    if classes is not None:
+        boxes = _class_offset(boxes, np.asarray(classes).reshape(-1))
+
+    order = np.argsort(-scores, kind="stable")
+    return order[greedy_suppress(boxes[order], box_iou, iou_threshold)]
+
+
+def suppress_contained(boxes, scores, classes=None, threshold=0.85):
+    """Drops boxes lying inside better ones; returns the indices to keep, best first.
+
+    A box is dropped when more than ``threshold`` of its area lies inside a
+    kept box scoring at least as high, so a box is never dropped for the
+    boxes inside it and weaker boxes never affect stronger ones.  With
+    ``classes`` only boxes of the same class count.
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+    if classes is not None:
+        boxes = _class_offset(boxes, np.asarray(classes).reshape(-1))
+
+    order = np.argsort(-scores, kind="stable")
+    return order[greedy_suppress(boxes[order], box_containment, threshold)]
+
+
+def weighted_box_fusion(boxes, scores, classes, iou_threshold=0.55, class_aware=True, score="mean"):
+    """Weighted box fusion, class-aware unless ``class_aware`` is False.
+
+    Boxes are clustered greedily in score order (a box joins the cluster of
+    the best remaining box when their IoU exceeds ``iou_threshold``), and
+    each cluster becomes one box whose coordinates are the score-weighted
+    mean of its members, whose score is the members' mean score (their best
+    score with ``score="max"``) and whose class is that of its best box.
+
+    Returns fused (boxes, scores, classes).
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+    classes = np.asarray(classes, dtype=np.float32).reshape(-1)
+    shifted = _class_offset(boxes, classes) if class_aware else boxes
+
+    order = np.argsort(-scores, kind="stable")
+    if 0 < order.size <= DENSE_MAX_BOXES:
+        ranked = shifted[order]
+        ious = box_iou(ranked, ranked)
+        # A box always belongs to its own cluster, even a degenerate one with no area
+        np.fill_diagonal(ious, 1.0)
+        heads = np.flatnonzero(greedy_keep(ious, iou_threshold))
+        # Each box joins the best-ranked cluster head it overlaps enough: itself
+        # for a head, for any other box the head that suppressed it
+        cluster = np.argmax(ious[heads] > iou_threshold, axis=0)
+        weights = scores[order]
+        members = np.zeros((heads.size, order.size), dtype=np.float32)
+        members[cluster, np.arange(order.size)] = weights
+        totals = members.sum(axis=1)
+        fused = members @ boxes[order] / np.maximum(totals, 1e-9)[:, None]
+        if score == "max":
+            # A head is the best box of its cluster
+            fused_scores = weights[heads]
+        else:
+            fused_scores = totals / np.maximum(np.bincount(cluster, minlength=heads.size), 1)
+        return (
+            fused.astype(np.float32),
+            fused_scores.astype(np.float32),
+            classes[order[heads]],
+        )
+
+    fused_boxes, fused_scores, fused_classes = [], [], []
+    while order.size:
+        best = order[0]
+        ious = box_iou(shifted[best:best + 1], shifted[order])[0]
+        members = order[ious > iou_threshold]
+        members = members if members.size else order[:1]
+        weights = scores[members]
+        fused_boxes.append((boxes[members] * weights[:, None]).sum(axis=0) / max(weights.sum(), 1e-9))
+        fused_scores.append(weights.max() if score == "max" else weights.mean())
+        fused_classes.append(classes[best])
+        order = order[~np.isin(order, members)]
+
+    if not fused_boxes:
+        return boxes[:0], scores[:0], classes[:0]
+    return (
+        np.stack(fused_boxes).astype(np.float32),
+        np.asarray(fused_scores, dtype=np.float32),
+        np.asarray(fused_classes, dtype=np.float32),
+    )
+
+
+def merge_boxes(boxes, scores, classes, method="nms", iou_threshold=0.5):
+    """Merges duplicate detections with class-aware NMS or WBF."""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+    classes = np.asarray(classes, dtype=np.float32).reshape(-1)
+    if method == "wbf":
+        return weighted_box_fusion(boxes, scores, classes, iou_threshold)
+    keep = nms(boxes, scores, classes, iou_threshold)
+    return boxes[keep], scores[keep], classes[keep]
@@ -0,0 +1,95 @@
+"""Two-stage (cascaded) inference.
+
+Most radiographs of a production batch are defect-free, yet each of them
+used to pay for full-resolution (or tiled) inference.  In cascade mode every
+image first goes through a cheap screening pass: the model itself at a small
+input size, or a separate tiny screening model.  The full pass only runs when
+the screen finds a box at or above a deliberately low, recall-tuned
+confidence; the other images are reported as "screened clean" with no boxes.
+
+Settings are per model (``CASCADE_SETTINGS``); the INT8 builds share the
+settings of their float model.  A static-size ONNX export ignores ``imgsz``
+and screens at its own input size, so give such models a screening model of
+their own (``weights``) to gain anything outside tiled mode.
+"""
+import time
+
+import numpy as np
+
+from models.boxes import to_numpy
+from models.model_cache import get_model
+
+# What a cascaded detection did with an image
+SCREENED_CLEAN = "screened_clean"
+FULL = "full"
+
+# model name -> screening settings
+#   imgsz:   input size of the screening pass
+#   conf:    an image is escalated to the full pass when the screen finds any
+#            box at or above this; keep it low, a missed defect costs more
+#            than a full pass
+#   weights: weight file of a separate screening model, or None to screen
+#            with the model itself at ``imgsz``
+CASCADE_SETTINGS = {
+    'yolo': {'imgsz': 320, 'conf': 0.05, 'weights': None},
+    # Pores are small: screen at a larger size and a lower confidence
+    'porosity_model': {'imgsz': 480, 'conf': 0.03, 'weights': None},
+    # Screened by both networks, so settings that suit the porosity model
+    'ensemble': {'imgsz': 480, 'conf': 0.03, 'weights': None},
+}
+
+
+def cascade_settings(model_name, **overrides):
+    """Screening settings of ``model_name`` (or of its float model for an INT8 build), with ``overrides``."""
+    base = model_name[:-len("_int8")] if model_name.endswith("_int8") else model_name
+    settings = dict(CASCADE_SETTINGS.get(base, {'imgsz': 320, 'conf': 0.05, 'weights': None}))
+    settings.update({k: v for k, v in overrides.items() if v is not None})
+    return settings
+
+
+def screen(model, images, imgsz=320, conf=0.05, weights=None):
+    """Runs the screening pass over one RGB image or a list of them.
+
+    ``model`` is the detector's own model, used unless ``weights`` names a
+    separate screening model.  Returns (suspect, timings): one bool per image,
+    True when anything was found at or above ``conf``, and the screen's
+    summed time in ms.
+    """
+    images = images if isinstance(images, (list, tuple)) else [images]
+    if weights:
+        model = get_model(weights)
+    start = time.perf_counter()
+    results = model.predict(images, imgsz=imgsz, conf=conf, verbose=False)
+    suspect = [bool(len(to_numpy(result.boxes.conf))) for result in results]
+    return suspect, {'screen': round((time.perf_counter() - start) * 1000, 2)}
+
+
+def empty_result():
+    """(bbox, confidence, classes) of an image screened clean."""
+    return np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.float32)
+
+
+class CascadeStats:
+    """How many images each stage of the cascade handled."""
+
+    def __init__(self):
+        self.screened = 0
+        self.full = 0
+
+    @property
+    def clean(self):
+        return self.screened - self.full
+
+    def add(self, stage):
+        """Counts one image; ``stage`` is SCREENED_CLEAN or FULL (None, for a non-cascaded run, is ignored)."""
+        if stage is None:
+            return
+        self.screened += 1
+        if stage == FULL:
+            self.full += 1
+
+    def as_dict(self):
+        return {'screened': self.screened, 'full': self.full, 'screened_clean': self.clean}
+
+    def summary(self):
+        return f"{self.screened} screened, {self.full} full pass, {self.clean} screened clean"
@@ -0,0 +1,129 @@
+"""Model 1 and Model 2 run as one fused ensemble.
+
+Inspectors often ran "Model 1" (best.pt) and then "Model 2" (the porosity
+model) on the same radiograph: two decodes, two letterboxes, two inferences
+and two result sets to reconcile by eye.  The ensemble decodes and
+letterboxes the image once, feeds the same NCHW tensor to both networks on
+parallel threads (onnxruntime and torch both release the GIL while they
+compute), maps each network's class ids to ``class_names`` with a lookup
+table and merges the two box sets with class-aware weighted box fusion.
+A fused box scores as its best member: with the mean, boxes just above the
+GUI's inference floor would drag real detections down, so the same image
+would score differently in the GUI and in batch mode.
+
+``FusedEnsemble`` mirrors the part of ``YOLO.predict`` the detectors use
+(like ``OnnxDetector``), so the ensemble's ``DefectDetector`` is Model 1's
+with another model behind ``load_model``: tiled inference, cascade
+screening, batch mode and the worker protocol work unchanged.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from models import model as defect_model
+from models import porosity_model
+from models.boxes import to_numpy, weighted_box_fusion
+from models.model_cache import get_model
+from models.onnx_backend import OnnxBoxes, OnnxResult, postprocess, preprocess, unletterbox
+from models.weights import ENSEMBLES, active_weights
+
+# Boxes of the two networks (of the same class) overlapping more than this are fused
+FUSION_IOU = 0.55
+DEFAULT_IMGSZ = 640
+
+# Member model name (without _int8) -> class id lookup table into class_names
+APP_CLASSES = {
+    'yolo': defect_model.APP_CLASSES,
+    'porosity_model': porosity_model.APP_CLASSES,
+}
+
+# One thread per member network
+_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ensemble")
+
+
+def _base_name(model_name):
+    return model_name[:-len("_int8")] if model_name.endswith("_int8") else model_name
+
+
+def _input_size(model, imgsz):
+    """(height, width) ``model`` is fed at: a static ONNX export's own size, else ``imgsz``."""
+    if hasattr(model, "session"):
+        return model._input_size(imgsz)
+    imgsz = imgsz or DEFAULT_IMGSZ
+    return (imgsz, imgsz) if isinstance(imgsz, int) else tuple(imgsz)
+
+
+def _infer(model, blob, letterboxed, images, conf):
+    """Runs one member on the shared blob; (boxes, scores, class ids) per image, in image pixels."""
+    if hasattr(model, "session"):
+        # onnxruntime: feed the blob straight to the session
+        step = len(blob) if model.dynamic_batch else 1
+        outputs = np.concatenate([model.session.run(None, {model.input_name: blob[i:i + step]})[0]
+                                  for i in range(0, len(blob), step)])
+        return [postprocess(output, ratio, pad, image.shape, conf=conf)
+                for output, image, (ratio, pad) in zip(outputs, images, letterboxed)]
+
+    # ultralytics takes an already letterboxed BCHW tensor in 0-1 as is
+    import torch
+    results = model.predict(torch.from_numpy(blob), conf=conf, verbose=False)
+    return [(unletterbox(to_numpy(result.boxes.xyxy), ratio, pad, image.shape),
+             to_numpy(result.boxes.conf).astype(np.float32), to_numpy(result.boxes.cls).astype(np.float32))
+            for result, image, (ratio, pad) in zip(results, images, letterboxed)]
+
+
+class FusedEnsemble:
+    """Several networks behind one ``predict``; ``members`` is a list of (model, class lookup table)."""
+
+    def __init__(self, members, iou_threshold=FUSION_IOU):
+        self.members = members
+        self.iou_threshold = iou_threshold
+
+    def predict(self, source, conf=0.25, imgsz=None, verbose=False, **kwargs):
+        """Runs every member on an RGB image or a list of them; returns one fused OnnxResult per image."""
+        images = list(source) if isinstance(source, (list, tuple)) else [source]
+        t0 = time.perf_counter()
+        # Letterboxed once per input size, normally once for all members
+        blobs = {}
+        for model, _ in self.members:
+            size = _input_size(model, imgsz)
+            if size not in blobs:
+                blobs[size] = preprocess(images, size)
+        t1 = time.perf_counter()
+        futures = [_pool.submit(_infer, model, *blobs[_input_size(model, imgsz)], images, conf)
+                   for model, _ in self.members]
+        outputs = [future.result() for future in futures]
+        t2 = time.perf_counter()
+
+        results = []
+        for i in range(len(images)):
+            boxes = np.concatenate([output[i][0] for output in outputs])
+            scores = np.concatenate([output[i][1] for output in outputs])
+            # Vectorised class remap: one table lookup per member
+            classes = np.concatenate([table[output[i][2].astype(np.int64)]
+                                      for output, (_, table) in zip(outputs, self.members)]).astype(np.float32)
+            results.append(OnnxBoxes(*weighted_box_fusion(boxes, scores, classes, self.iou_threshold,
+                                                          score="max")))
+        t3 = time.perf_counter()
+
+        n = len(images) or 1
+        speed = {
+            "preprocess": (t1 - t0) * 1000 / n,
+            "inference": (t2 - t1) * 1000 / n,
+            "postprocess": (t3 - t2) * 1000 / n,
+        }
+        if verbose:
+            print(f"{len(images)} image(s), {len(self.members)} networks, {speed['inference'] * n:.1f} ms inference")
+        return [OnnxResult(boxes, dict(speed)) for boxes in results]
+
+
+class DefectDetector(defect_model.DefectDetector):
+    """Model 1's detector with the fused ensemble of ``ENSEMBLES[model_name]`` as its model."""
+
+    def __init__(self, model_name='ensemble'):
+        super().__init__(model_name)
+
+    def load_model(self):
+        members = ENSEMBLES[self.model_name]
+        return FusedEnsemble([(get_model(active_weights(member)), APP_CLASSES[_base_name(member)])
+                              for member in members])
@@ -0,0 +1,39 @@
+"""Exports the detector weights to ONNX for the onnxruntime backend.
+
+Run from the GUI directory, in the environment that has ultralytics::
+
+    python -m models.export_onnx                 # every model
+    python -m models.export_onnx yolo --imgsz 640
+
+Each ``.pt`` is exported next to itself (``best.pt`` -> ``best.onnx``) with a
+dynamic batch axis so batch mode and tiled inference can feed several images
+per run.  Select the backend with ``DRDO_BACKEND_<MODEL>=onnx``.
+"""
+import argparse
+
+from models.weights import MODEL_WEIGHTS, ONNX_WEIGHTS
+
+
+def export(model_name, imgsz=640, opset=None, simplify=True):
+    from ultralytics import YOLO
+
+    model = YOLO(MODEL_WEIGHTS[model_name])
+    path = model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=simplify, opset=opset, device="cpu")
+    if str(path) != ONNX_WEIGHTS[model_name]:
+        print(f"Warning: exported to {path}, expected {ONNX_WEIGHTS[model_name]}")
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the detector weights to ONNX.")
+    parser.add_argument("models", nargs="*", help=f"Models to export (default: all of {', '.join(sorted(MODEL_WEIGHTS))})")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--opset", type=int)
+    parser.add_argument("--no-simplify", action="store_true")
+    args = parser.parse_args()
+    unknown = set(args.models) - set(MODEL_WEIGHTS)
+    if unknown:
+        parser.error(f"unknown model(s): {', '.join(sorted(unknown))}")
+
+    for name in args.models or sorted(MODEL_WEIGHTS):
+        print(f"{name}: {export(name, imgsz=args.imgsz, opset=args.opset, simplify=not args.no_simplify)}")
@@ -1,14 +1,41 @@
 import cv2
 import numpy as np
-from ultralytics import YOLO
+from models.model_cache import get_model
 import os
-import tempfile
+import time
+from models.protocol import write_result, write_error
+from models.shared_image import reply_segments, share_image
+from models.weights import active_weights
+from models.boxes import to_numpy
+from models.tiling import predict_tiled
+from models.cascade import FULL, SCREENED_CLEAN, empty_result, screen
+from models.suppression import suppress_duplicates, suppression_settings
+from models.timing import StageTimer
+
+
+# best.pt class id -> index in class_names: trained on class_names directly, so ids pass through
+APP_CLASSES = np.arange(8, dtype=np.int64)
+
+
+def to_app_classes(class_ids):
+    """Maps best.pt class ids to class_names indices with one table lookup."""
+    return APP_CLASSES[np.asarray(class_ids, dtype=np.int64).reshape(-1)].tolist()
 
-# Base directory for assets, e.g., for best.pt weights
-base_dir = "/home/vulture/Desktop/DRDO/GUI/Assets/"
 
 class DefectDetector:
-    def __init__(self):
+    def __init__(self, model_name='yolo'):
+        # 'yolo' or its INT8 build 'yolo_int8'; picks the weight file
+        self.model_name = model_name
+        self.threshold = 0.25
+        # {'tile_size': ..., 'overlap': ...} to run sliced inference, None for whole-image
+        self.tiling = None
+        # Screening settings (models/cascade.py) to run cascaded, None to always run the full pass
+        self.cascade = None
+        # FULL or SCREENED_CLEAN after a cascaded detection, None otherwise
+        self.stage = None
+        # Duplicate-box suppression settings (models/suppression.py); empty to keep every box
+        self.suppression = suppression_settings(model_name)
+        self.timings = None
         self.class_names = ['crack', 'lof', 'lop', 'overlap', 'porosity', 'slag', 'spattering', 'undercut']
         self.class_colors = {
             'crack': (255, 0, 0),       # Red
@@ -22,57 +49,125 @@ class DefectDetector:
         }
         
 
+    def load_model(self):
+        """The network for ``model_name``, loaded once per process (models/model_cache.py)."""
+        return get_model(active_weights(self.model_name))
+
     def load_image(self, image_path):
         image = cv2.imread(image_path)
         if image is not None:
             image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
         return image
 
-    def detect_defect_boundary(self, image):
+    def detect_defect_boundary(self, image, draw=True):
         if len(image.shape) == 2:
             image_rgb = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
         else:
             image_rgb = image.copy()
 
-        weight_path = os.path.join(base_dir, "best.pt")
-        model = YOLO(weight_path)
-        results = model.predict(image_rgb, conf=self.threshold)
+        timer = StageTimer()
+        with timer.stage('weight_load'):
+            model = self.load_model()
+        self.stage = None
+        if self.cascade:
+            # Cheap pass first; the full pass only for images where it finds something
+            with timer.stage('screen'):
+                suspect, _ = screen(model, image_rgb, **self.cascade)
+            self.stage = FULL if suspect[0] else SCREENED_CLEAN
+        if self.stage == SCREENED_CLEAN:
+            boxes, scores, class_ids = empty_result()
+        elif self.tiling:
+            # Sliced inference for large plates; boxes come back in image coordinates
+            boxes, scores, class_ids, tiled = predict_tiled(model, image_rgb, conf=self.threshold, **self.tiling)
+            timer.update(tiled)
+        else:
+            result = model.predict(image_rgb, conf=self.threshold)[0]
+            timer.update(result.speed)  # ultralytics preprocess / inference / postprocess, ms
+            boxes = to_numpy(result.boxes.xyxy)  # Bounding boxes
+            scores = to_numpy(result.boxes.conf)   # Confidence scores
+            class_ids = to_numpy(result.boxes.cls) # Class indices
+        if self.suppression:
+            with timer.stage('suppress'):
+                boxes, scores, class_ids = suppress_duplicates(boxes, scores, class_ids, **self.suppression)
 
-        image_detected = image_rgb.copy()
+        with timer.stage('draw'):
+            # Without draw the caller renders its own overlay; skip the copy too
+            image_detected = image_rgb.copy() if draw else image_rgb
 
+            if draw:
+                for box, score, cls in zip(boxes.tolist(), scores.tolist(), class_ids.tolist()):
+                    x1, y1, x2, y2 = map(int, box)
+                    class_name = self.class_names[int(cls)]
+                    color = self.class_colors[class_name]
+                    cv2.rectangle(image_detected, (x1, y1), (x2, y2), color, 1)
+                    label = f"Class: {class_name}, Score: {score:.2f}"
+                    label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+                    label_y = y1 - 10 if y1 - 10 > 10 else y1 + 10 + label_size[1]
+                    cv2.putText(image_detected, label, (x1, label_y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+        self.timings = timer.stages
+
+        return image_rgb, image_detected, boxes.tolist(), scores.tolist(), class_ids.tolist()
+
+    def warmup(self, runs=2, size=640):
+        """Loads the weights and runs the model on a blank image, so the first
+        real detection already runs at steady-state speed."""
+        start = time.perf_counter()
+        model = self.load_model()
+        loaded = time.perf_counter()
+        dummy = np.zeros((size, size, 3), dtype=np.uint8)
+        for _ in range(runs):
+            model.predict(dummy, conf=self.threshold, verbose=False)
+        done = time.perf_counter()
+        return {'load_ms': round((loaded - start) * 1000, 1), 'warmup_ms': round((done - loaded) * 1000, 1)}
+
+    def predict_batch(self, images, threshold=0.25):
+        """Runs the model on a list of RGB images in a single predict call.
+
+        Used by batch mode. Returns one (bbox, confidence, classs) tuple per
+        image, with boxes in xyxy pixels, duplicates suppressed as in
+        detect_defect_boundary and no annotated copy drawn.
+        """
+        model = self.load_model()
+        results = model.predict(images, conf=threshold, verbose=False)
+        predictions = []
         for result in results:
-            boxes = result.boxes.xyxy  # Bounding boxes
-            scores = result.boxes.conf   # Confidence scores
-            class_ids = result.boxes.cls # Class indices
-
-            for box, score, cls in zip(boxes, scores, class_ids):
-                x1, y1, x2, y2 = map(int, box.tolist())
-                class_name = self.class_names[int(cls)]
-                color = self.class_colors[class_name]
-                cv2.rectangle(image_detected, (x1, y1), (x2, y2), color, 1)
-                label = f"Class: {class_name}, Score: {score:.2f}"
-                label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
-                label_y = y1 - 10 if y1 - 10 > 10 else y1 + 10 + label_size[1]
-                cv2.putText(image_detected, label, (x1, label_y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
-
-        return image_rgb, image_detected, result.boxes.xyxy.tolist(), result.boxes.conf.tolist(), result.boxes.cls.tolist() # avi
-
-    def run(self, image_path, threshold=0.25):
-        image = self.load_image(image_path)
+            boxes, scores, class_ids = (to_numpy(result.boxes.xyxy), to_numpy(result.boxes.conf),
+                                        to_numpy(result.boxes.cls))
+            if self.suppression:
+                boxes, scores, class_ids = suppress_duplicates(boxes, scores, class_ids, **self.suppression)
+            predictions.append((boxes.tolist(), scores.tolist(), class_ids.tolist()))
+        return predictions
+
+    def run(self, image_path, threshold=0.25, stream=None, request_id=None, draw=True, tiling=None, cascade=None,
+            suppression=None, segment=None):
+        timer = StageTimer()
+        with timer.stage('decode'):
+            image = self.load_image(image_path)
         self.threshold = threshold
+        self.tiling = tiling
+        self.cascade = cascade
+        # None: the model's own settings
+        self.suppression = suppression_settings(self.model_name) if suppression is None else suppression
         if image is not None:
-            original, detected, bbox ,confidence, classs = self.detect_defect_boundary(image)
-            # Save images to temporary files
-            orig_file = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
-            det_file = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
-            # Convert RGB back to BGR for cv2.imwrite
-            cv2.imwrite(orig_file.name, cv2.cvtColor(original, cv2.COLOR_RGB2BGR))
-            cv2.imwrite(det_file.name, cv2.cvtColor(detected, cv2.COLOR_RGB2BGR))
-            # Print the file paths so the main process can capture them
-            print(orig_file.name, det_file.name, bbox, confidence, classs)
-            return orig_file.name, det_file.name, bbox, confidence, classs 
+            original, detected, bbox ,confidence, classs = self.detect_defect_boundary(image, draw=draw)
+            timer.update(self.timings)
+            # Stream the result frame to the caller (the inference worker's pipe).
+            # The RGB pixels go through shared memory instead of temporary PNGs.
+            if stream is not None:
+                with timer.stage('shm_write'):
+                    # Named by the client (``segment``) so it can clean up a reply it never reads
+                    names = reply_segments(segment) if segment else {}
+                    orig_name = share_image(original, names.get('orig'))
+                    det_name = share_image(detected, names.get('det')) if draw else None
+                timer.add('worker_total', timer.elapsed_ms())
+                self.timings = timer.stages
+                write_result(stream, orig_name, det_name, bbox, confidence, classs,
+                             id=request_id, timings=self.timings, stage=self.stage)
+            return original, detected, bbox, confidence, classs 
         else:
             print("Failed to load image.")
+            if stream is not None:
+                write_error(stream, "Failed to load image.", id=request_id)
             return None, None, None, None, None
 
 if __name__ == "__main__":
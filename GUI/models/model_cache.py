@@ -0,0 +1,95 @@
+"""Process-wide cache of loaded YOLO models.
+
+Every DefectDetector variant used to call ``YOLO(weight_path)`` per image,
+reloading and re-fusing the network each time.  Models are now loaded once
+and kept here, keyed by weight path and file mtime (so replacing ``best.pt``
+on disk is picked up on the next call), and evicted least-recently-used
+first once the memory budget is exceeded.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+# Default budget, overridable with DRDO_MODEL_CACHE_MB
+DEFAULT_BUDGET_BYTES = int(os.environ.get("DRDO_MODEL_CACHE_MB", "1024")) * 1024 * 1024
+
+
+def _load_yolo(weight_path):
+    # ONNX exports run on onnxruntime and never import torch
+    if weight_path.endswith(".onnx"):
+        from models.onnx_backend import OnnxDetector
+        return OnnxDetector(weight_path)
+    # Imported lazily so that importing this module does not pull in torch
+    from ultralytics import YOLO
+    return YOLO(weight_path)
+
+
+def _model_nbytes(model, weight_path):
+    """Size of the model's parameters and buffers, falling back to the file size (ONNX)."""
+    try:
+        module = model.model
+        tensors = list(module.parameters()) + list(module.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    except Exception:
+        return os.path.getsize(weight_path)
+
+
+class ModelCache:
+    def __init__(self, budget_bytes=DEFAULT_BUDGET_BYTES, loader=_load_yolo):
+        self.budget_bytes = budget_bytes
+        self.loader = loader
+        self.total_bytes = 0
+        self._models = OrderedDict()  # (path, mtime) -> (model, nbytes)
+        self._lock = threading.Lock()
+
+    def get(self, weight_path):
+        path = os.path.abspath(weight_path)
+        key = (path, os.path.getmtime(path))
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                return entry[0]
+
+            model = self.loader(path)
+            nbytes = _model_nbytes(model, path)
+
+            # The weights were replaced on disk: drop the stale copy
+            for stale in [k for k in self._models if k[0] == path]:
+                self._evict(stale)
+
+            self._models[key] = (model, nbytes)
+            self.total_bytes += nbytes
+            # Always keep the model that was just requested, even if it alone
+            # is over budget.
+            while self.total_bytes > self.budget_bytes and len(self._models) > 1:
+                self._evict(next(iter(self._models)))
+            return model
+
+    def _evict(self, key):
+        _, nbytes = self._models.pop(key)
+        self.total_bytes -= nbytes
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self.total_bytes = 0
+
+    def __contains__(self, weight_path):
+        path = os.path.abspath(weight_path)
+        return any(k[0] == path for k in self._models)
+
+    def __len__(self):
+        return len(self._models)
+
+
+_cache = ModelCache()
+
+
+def get_model(weight_path):
+    """Returns the loaded model for ``weight_path``, loading it on first use."""
+    return _cache.get(weight_path)
+
+
+def clear_models():
+    _cache.clear()
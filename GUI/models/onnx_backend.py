@@ -0,0 +1,172 @@
+"""onnxruntime backend for the YOLO detectors (CPU stations).
+
+Runs the ONNX export of ``best.pt`` / ``porosity_model.pt`` (see
+models/export_onnx.py) with our own NumPy letterbox pre-processing and NMS
+post-processing, so neither torch nor ultralytics is imported at runtime.
+
+``OnnxDetector.predict`` mirrors the part of ``YOLO.predict`` the detectors
+use: it returns one result per image with ``boxes.xyxy`` / ``boxes.conf`` /
+``boxes.cls`` (NumPy arrays, in original image pixels) and a ``speed`` dict
+of per-stage milliseconds, so the detectors and ``predict_tiled`` work with
+either backend.
+"""
+import ast
+import time
+
+import cv2
+import numpy as np
+
+from models.boxes import nms
+
+# ultralytics' defaults, so both backends return the same boxes
+DEFAULT_IOU = 0.7
+DEFAULT_MAX_DET = 300
+PAD_VALUE = 114
+
+
+def letterbox(image, size, pad_value=PAD_VALUE):
+    """Resizes ``image`` to fit (height, width) ``size`` keeping its aspect ratio, then pads.
+
+    Returns (padded image, scale ratio, (pad_left, pad_top)).
+    """
+    height, width = image.shape[:2]
+    new_h, new_w = size
+    ratio = min(new_h / height, new_w / width)
+    resized_h, resized_w = int(round(height * ratio)), int(round(width * ratio))
+    if (resized_h, resized_w) != (height, width):
+        image = cv2.resize(image, (resized_w, resized_h), interpolation=cv2.INTER_LINEAR)
+    top = (new_h - resized_h) // 2
+    left = (new_w - resized_w) // 2
+    padded = np.full((new_h, new_w, 3), pad_value, dtype=np.uint8)
+    padded[top:top + resized_h, left:left + resized_w] = image
+    return padded, ratio, (left, top)
+
+
+def preprocess(images, size):
+    """Letterboxes RGB images into one NCHW float32 blob.
+
+    Returns (blob, [(ratio, pad), ...]).  ultralytics treats NumPy input as
+    BGR and flips it, and the detectors hand it RGB; flip the same way so
+    both backends see identical tensors.
+    """
+    letterboxed = [letterbox(image, size) for image in images]
+    blob = np.stack([padded for padded, _, _ in letterboxed])[..., ::-1].transpose(0, 3, 1, 2)
+    blob = np.ascontiguousarray(blob, dtype=np.float32) / 255.0
+    return blob, [(ratio, pad) for _, ratio, pad in letterboxed]
+
+
+def postprocess(output, ratio, pad, image_shape, conf=0.25, iou=DEFAULT_IOU, max_det=DEFAULT_MAX_DET):
+    """Decodes one image's raw YOLOv8 output, shape (4 + num_classes, num_anchors).
+
+    Rows 0-3 are centre-x, centre-y, width, height in letterboxed pixels and
+    the remaining rows are per-class scores.  Returns xyxy boxes in original
+    image pixels, scores and class ids, after class-aware NMS.
+    """
+    preds = output.T
+    class_scores = preds[:, 4:]
+    class_ids = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(preds)), class_ids]
+    keep = scores > conf
+    preds, scores, class_ids = preds[keep], scores[keep], class_ids[keep]
+
+    xy, wh = preds[:, :2], preds[:, 2:4]
+    boxes = np.concatenate([xy - wh / 2, xy + wh / 2], axis=1)
+
+    keep = nms(boxes, scores, class_ids, iou)[:max_det]
+    boxes, scores, class_ids = boxes[keep], scores[keep], class_ids[keep]
+
+    return unletterbox(boxes, ratio, pad, image_shape), scores.astype(np.float32), class_ids.astype(np.float32)
+
+
+def unletterbox(boxes, ratio, pad, image_shape):
+    """Maps xyxy boxes from letterboxed to original image pixels (float32), clipped to the image."""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4) - np.array([pad[0], pad[1], pad[0], pad[1]],
+                                                                           dtype=np.float32)
+    boxes /= ratio
+    height, width = image_shape[:2]
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+    return boxes
+
+
+class OnnxBoxes:
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+
+class OnnxResult:
+    def __init__(self, boxes, speed):
+        self.boxes = boxes
+        self.speed = speed
+
+
+def _parse_imgsz(value, input_shape):
+    """Model input size from the export metadata, else from the input shape, else 640."""
+    if value:
+        size = ast.literal_eval(value)
+        return (size, size) if isinstance(size, int) else tuple(size)
+    h, w = input_shape[2:4]
+    if isinstance(h, int) and isinstance(w, int):
+        return h, w
+    return 640, 640
+
+
+class OnnxDetector:
+    def __init__(self, onnx_path, threads=None):
+        # Imported here so the torch backend never needs onnxruntime installed
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.path = onnx_path
+        self.session = ort.InferenceSession(onnx_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+        self.dynamic_size = not all(isinstance(d, int) for d in model_input.shape[2:4])
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.imgsz = _parse_imgsz(metadata.get("imgsz"), model_input.shape)
+
+    def _input_size(self, imgsz):
+        # A static export only accepts the size it was exported at
+        if imgsz is None or not self.dynamic_size:
+            return self.imgsz
+        return (imgsz, imgsz) if isinstance(imgsz, int) else tuple(imgsz)
+
+    def predict(self, source, conf=0.25, iou=DEFAULT_IOU, imgsz=None, max_det=DEFAULT_MAX_DET, verbose=False):
+        """Runs the model on an RGB image or a list of them; returns a list of OnnxResult."""
+        images = source if isinstance(source, (list, tuple)) else [source]
+        size = self._input_size(imgsz)
+        # Static-batch exports are run one image at a time
+        step = len(images) if self.dynamic_batch else 1
+
+        results = []
+        for start in range(0, len(images), step):
+            chunk = images[start:start + step]
+            t0 = time.perf_counter()
+            blob, letterboxed = preprocess(chunk, size)
+            t1 = time.perf_counter()
+            outputs = self.session.run(None, {self.input_name: blob})[0]
+            t2 = time.perf_counter()
+
+            decoded = [
+                postprocess(output, ratio, pad, image.shape, conf=conf, iou=iou, max_det=max_det)
+                for output, image, (ratio, pad) in zip(outputs, chunk, letterboxed)
+            ]
+            t3 = time.perf_counter()
+            n = len(chunk)
+            speed = {
+                "preprocess": (t1 - t0) * 1000 / n,
+                "inference": (t2 - t1) * 1000 / n,
+                "postprocess": (t3 - t2) * 1000 / n,
+            }
+            results.extend(OnnxResult(OnnxBoxes(*boxes), dict(speed)) for boxes in decoded)
+        if verbose:
+            print(f"{len(images)} image(s), {size[0]}x{size[1]}, "
+                  f"{sum(r.speed['inference'] for r in results):.1f} ms inference")
+        return results
@@ -0,0 +1,111 @@
+"""Framed binary protocol between the detector and the GUI.
+
+Each frame is::
+
+    magic      4 bytes   b"DRDO"
+    version    uint16    PROTOCOL_VERSION
+    header_len uint32    length of the JSON header
+    body_len   uint32    length of the binary body
+    header     JSON      {"type": ..., "arrays": [{"name", "dtype", "shape", "offset"}], ...}
+    body       raw array buffers, back to back
+
+All integers are little-endian.  Numeric results (boxes, confidences,
+classes) travel as float32 buffers in the body, so decoding is a
+``np.frombuffer`` per array instead of parsing printed Python lists.
+
+Version 2: the "orig"/"det" fields of a result name shared-memory segments
+(see models/shared_image.py) instead of temporary PNG paths.
+"""
+import json
+import struct
+
+import numpy as np
+
+MAGIC = b"DRDO"
+PROTOCOL_VERSION = 2
+
+_PREFIX = struct.Struct("<4sHII")
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def write_frame(stream, header, arrays=None):
+    """Writes one frame; ``arrays`` maps names to anything np.asarray accepts."""
+    header = dict(header)
+    descriptors = []
+    buffers = []
+    offset = 0
+    for name, value in (arrays or {}).items():
+        array = np.ascontiguousarray(value)
+        descriptors.append({
+            "name": name,
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset,
+        })
+        buffers.append(array.tobytes())
+        offset += array.nbytes
+    header["arrays"] = descriptors
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    stream.write(_PREFIX.pack(MAGIC, PROTOCOL_VERSION, len(header_bytes), offset))
+    stream.write(header_bytes)
+    for buf in buffers:
+        stream.write(buf)
+    stream.flush()
+
+
+def _read_exact(stream, size):
+    data = stream.read(size)
+    if data is None or len(data) < size:
+        if not data:
+            raise EOFError("stream closed")
+        raise ProtocolError("truncated frame")
+    return data
+
+
+def read_frame(stream):
+    """Reads one frame and returns ``(header, arrays)``.
+
+    The arrays are read-only views into the received body.
+    """
+    magic, version, header_len, body_len = _PREFIX.unpack(_read_exact(stream, _PREFIX.size))
+    if magic != MAGIC:
+        raise ProtocolError(f"bad magic {magic!r}")
+    if version > PROTOCOL_VERSION:
+        raise ProtocolError(f"unsupported protocol version {version}")
+
+    header = json.loads(_read_exact(stream, header_len).decode("utf-8"))
+    body = _read_exact(stream, body_len) if body_len else b""
+
+    arrays = {}
+    for desc in header.pop("arrays", []):
+        dtype = np.dtype(desc["dtype"])
+        shape = tuple(desc["shape"])
+        count = int(np.prod(shape)) if shape else 1
+        arrays[desc["name"]] = np.frombuffer(body, dtype=dtype, count=count, offset=desc["offset"]).reshape(shape)
+    return header, arrays
+
+
+def write_result(stream, orig, det, bbox, confidence, classes, **fields):
+    """Writes a detection result frame (boxes are xyxy in image pixels).
+
+    ``orig`` and ``det`` are the names of the shared images holding the
+    original and the annotated picture; ``det`` is None when the caller asked
+    for no overlay.
+    """
+    header = {"type": "result", "ok": True, "orig": orig, "det": det}
+    header.update(fields)
+    write_frame(stream, header, {
+        "bbox": np.asarray(bbox, dtype=np.float32).reshape(-1, 4),
+        "confidence": np.asarray(confidence, dtype=np.float32).reshape(-1),
+        "classes": np.asarray(classes, dtype=np.float32).reshape(-1),
+    })
+
+
+def write_error(stream, error, **fields):
+    header = {"type": "error", "ok": False, "error": error}
+    header.update(fields)
+    write_frame(stream, header)
@@ -0,0 +1,287 @@
+"""INT8 post-training quantization of the defect models.
+
+Run from the GUI directory, in an environment with onnxruntime and onnx::
+
+    python -m models.quantize yolo --calib /data/radiographs/calib --eval /data/radiographs/val
+
+1. The FP32 ONNX export (python -m models.export_onnx) is statically
+   quantized to INT8 (QDQ, per-channel weights), with activation ranges
+   calibrated on the images in ``--calib``.  The box-decoding tail of the
+   detection head is kept in FP32, since quantizing pixel coordinates costs
+   far more accuracy than it saves time.
+2. With ``--eval``, both models are run on a labelled set.  The report gives
+   per-class AP@0.5, precision and recall for the eight classes in
+   ``DefectDetector.class_names``, plus mean latency and the INT8 - FP32
+   deltas.  Labels are YOLO txt files (``class cx cy w h``, normalised) in
+   class_names order: a ``labels/`` folder next to ``images/``, or a .txt
+   next to each image.
+
+The result is written next to the FP32 file (``best.int8.onnx``) and shows
+up as "Model 1 (INT8)" / "Model 2 (INT8)" in the model selector.
+"""
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from models.boxes import box_iou
+from models.onnx_backend import OnnxDetector, preprocess
+from models.weights import ONNX_WEIGHTS, QUANTIZED_WEIGHTS
+from models.worker import DETECTOR_MODULES
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff')
+
+# Decoding ops of the detection head, kept in FP32 when they follow the last Conv
+HEAD_OP_TYPES = {'Add', 'Concat', 'Div', 'Mul', 'Reshape', 'Sigmoid', 'Slice', 'Softmax', 'Split', 'Sub', 'Transpose'}
+
+
+def list_images(folder):
+    paths = []
+    for root, _, files in os.walk(folder):
+        paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(IMAGE_EXTENSIONS))
+    paths.sort()
+    return paths
+
+
+def load_rgb(path):
+    image = cv2.imread(path)
+    if image is None:
+        return None
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+
+class CalibrationReader:
+    """onnxruntime CalibrationDataReader over a folder of radiographs."""
+
+    def __init__(self, paths, input_name, size):
+        self.paths = iter(paths)
+        self.input_name = input_name
+        self.size = size
+
+    def get_next(self):
+        for path in self.paths:
+            image = load_rgb(path)
+            if image is not None:
+                blob, _ = preprocess([image], self.size)
+                return {self.input_name: blob}
+        return None
+
+
+def head_nodes(onnx_model):
+    """Names of the box-decoding nodes between the last Convs and the graph output."""
+    producers = {out: node for node in onnx_model.graph.node for out in node.output}
+    excluded, stack = set(), [output.name for output in onnx_model.graph.output]
+    while stack:
+        node = producers.get(stack.pop())
+        if node is None or node.name in excluded or node.op_type not in HEAD_OP_TYPES:
+            continue
+        excluded.add(node.name)
+        stack.extend(node.input)
+    return sorted(excluded)
+
+
+def quantize(model_name, calib_folder, num_calib=200, per_channel=True, method='minmax'):
+    import onnx
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    fp32_path = ONNX_WEIGHTS[model_name]
+    int8_path = QUANTIZED_WEIGHTS[f"{model_name}_int8"]
+    if not os.path.exists(fp32_path):
+        raise FileNotFoundError(f"{fp32_path} not found; run python -m models.export_onnx {model_name} first")
+
+    calib_paths = list_images(calib_folder)[:num_calib]
+    if not calib_paths:
+        raise ValueError(f"No calibration images in {calib_folder}")
+
+    # Shape inference + graph cleanup recommended before static quantization
+    prepared_path = int8_path + ".prep.onnx"
+    try:
+        quant_pre_process(fp32_path, prepared_path, skip_symbolic_shape=True)
+    except Exception as e:
+        print("Pre-processing failed, quantizing the raw export:", e)
+        prepared_path = fp32_path
+
+    fp32 = OnnxDetector(fp32_path)
+    excluded = head_nodes(onnx.load(prepared_path))
+    print(f"Calibrating on {len(calib_paths)} images, keeping {len(excluded)} head nodes in FP32")
+    quantize_static(
+        prepared_path,
+        int8_path,
+        CalibrationReader(calib_paths, fp32.input_name, fp32.imgsz),
+        quant_format=QuantFormat.QDQ,
+        per_channel=per_channel,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        calibrate_method=CalibrationMethod.Percentile if method == 'percentile' else CalibrationMethod.MinMax,
+        nodes_to_exclude=excluded,
+    )
+    if prepared_path != fp32_path:
+        os.remove(prepared_path)
+
+    # Carry the export metadata (imgsz, names) over so OnnxDetector reads the same input size
+    fp32_model, int8_model = onnx.load(fp32_path), onnx.load(int8_path)
+    del int8_model.metadata_props[:]
+    int8_model.metadata_props.extend(fp32_model.metadata_props)
+    onnx.save(int8_model, int8_path)
+    return int8_path
+
+
+# ---------------------------------------------------------
+#                  ACCURACY CHECK
+# ---------------------------------------------------------
+
+def label_path(image_path):
+    stem = os.path.splitext(image_path)[0]
+    parts = stem.split(os.sep)
+    if 'images' in parts:
+        i = len(parts) - 1 - parts[::-1].index('images')
+        candidate = os.sep.join(parts[:i] + ['labels'] + parts[i + 1:]) + '.txt'
+        if os.path.exists(candidate):
+            return candidate
+    return stem + '.txt'
+
+
+def load_labels(image_path, width, height):
+    """Ground-truth (xyxy boxes, classes) of one image from its YOLO txt file."""
+    path = label_path(image_path)
+    if not os.path.exists(path):
+        return np.zeros((0, 4), np.float32), np.zeros(0, np.int64)
+    rows = np.loadtxt(path, ndmin=2, dtype=np.float32)
+    if not rows.size:
+        return np.zeros((0, 4), np.float32), np.zeros(0, np.int64)
+    cls, cx, cy, w, h = rows[:, 0], rows[:, 1] * width, rows[:, 2] * height, rows[:, 3] * width, rows[:, 4] * height
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    return boxes, cls.astype(np.int64)
+
+
+def match(pred_boxes, pred_scores, pred_classes, gt_boxes, gt_classes, iou_threshold=0.5):
+    """True-positive flag per prediction: greedy by score, one ground truth each, same class."""
+    tp = np.zeros(len(pred_scores), dtype=bool)
+    if not len(gt_boxes) or not len(pred_boxes):
+        return tp
+    ious = box_iou(pred_boxes, gt_boxes)
+    ious[pred_classes[:, None] != gt_classes[None, :]] = 0
+    taken = np.zeros(len(gt_boxes), dtype=bool)
+    for i in np.argsort(-pred_scores, kind='stable'):
+        candidates = np.where(taken, 0, ious[i])
+        j = candidates.argmax()
+        if candidates[j] >= iou_threshold:
+            tp[i] = taken[j] = True
+    return tp
+
+
+def average_precision(scores, tp, num_gt):
+    """All-point interpolated AP from per-prediction scores and true-positive flags."""
+    if num_gt == 0 or not len(scores):
+        return 0.0
+    order = np.argsort(-scores, kind='stable')
+    tp = tp[order]
+    ctp = np.cumsum(tp)
+    recall = ctp / num_gt
+    precision = ctp / np.arange(1, len(tp) + 1)
+    # Monotone precision envelope
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    recall = np.concatenate([[0.0], recall])
+    return float(np.sum((recall[1:] - recall[:-1]) * precision))
+
+
+def evaluate(model, paths, to_app_classes, num_classes, conf=0.25, iou_threshold=0.5):
+    """Per-class AP@0.5 / precision / recall at ``conf`` and mean latency of ``model`` on ``paths``."""
+    scores = [[] for _ in range(num_classes)]
+    tps = [[] for _ in range(num_classes)]
+    num_gt = np.zeros(num_classes, dtype=np.int64)
+    latencies = []
+
+    warm = load_rgb(paths[0])
+    for _ in range(3):
+        model.predict(warm, conf=0.001)
+
+    for path in paths:
+        image = load_rgb(path)
+        if image is None:
+            continue
+        start = time.perf_counter()
+        # Low confidence floor so the precision/recall curve is complete
+        result = model.predict(image, conf=0.001)[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        pred_classes = np.asarray(to_app_classes(result.boxes.cls.tolist()), dtype=np.int64)
+        gt_boxes, gt_classes = load_labels(path, image.shape[1], image.shape[0])
+        tp = match(result.boxes.xyxy, result.boxes.conf, pred_classes, gt_boxes, gt_classes, iou_threshold)
+        np.add.at(num_gt, gt_classes[gt_classes < num_classes], 1)
+        for c in range(num_classes):
+            mask = pred_classes == c
+            scores[c].append(result.boxes.conf[mask])
+            tps[c].append(tp[mask])
+
+    per_class = []
+    for c in range(num_classes):
+        s = np.concatenate(scores[c]) if scores[c] else np.zeros(0)
+        t = np.concatenate(tps[c]) if tps[c] else np.zeros(0, dtype=bool)
+        above = s >= conf
+        hits = int(t[above].sum())
+        per_class.append({
+            'ap50': average_precision(s, t, num_gt[c]),
+            'precision': hits / max(int(above.sum()), 1),
+            'recall': hits / num_gt[c] if num_gt[c] else 0.0,
+            'instances': int(num_gt[c]),
+        })
+    present = [m['ap50'] for m in per_class if m['instances']]
+    return {
+        'per_class': per_class,
+        'map50': float(np.mean(present)) if present else 0.0,
+        'latency_ms': float(np.mean(latencies)) if latencies else 0.0,
+        'latency_p50_ms': float(np.median(latencies)) if latencies else 0.0,
+    }
+
+
+def compare(model_name, eval_folder, conf=0.25):
+    module = __import__(DETECTOR_MODULES[model_name], fromlist=['DefectDetector'])
+    class_names = module.DefectDetector(model_name).class_names
+    paths = list_images(eval_folder)
+    if not paths:
+        raise ValueError(f"No images in {eval_folder}")
+
+    fp32 = evaluate(OnnxDetector(ONNX_WEIGHTS[model_name]), paths, module.to_app_classes, len(class_names), conf)
+    int8 = evaluate(OnnxDetector(QUANTIZED_WEIGHTS[f"{model_name}_int8"]), paths, module.to_app_classes,
+                    len(class_names), conf)
+
+    print(f"\n{model_name}: {len(paths)} images, AP@0.5 and P/R at conf {conf}")
+    print(f"{'class':<12}{'n':>6}{'AP fp32':>10}{'AP int8':>10}{'dAP':>8}{'P int8':>8}{'R int8':>8}")
+    for name, a, b in zip(class_names, fp32['per_class'], int8['per_class']):
+        print(f"{name:<12}{a['instances']:>6}{a['ap50']:>10.3f}{b['ap50']:>10.3f}{b['ap50'] - a['ap50']:>+8.3f}"
+              f"{b['precision']:>8.3f}{b['recall']:>8.3f}")
+    print(f"{'mAP@0.5':<18}{fp32['map50']:>10.3f}{int8['map50']:>10.3f}{int8['map50'] - fp32['map50']:>+8.3f}")
+    speedup = fp32['latency_ms'] / int8['latency_ms'] if int8['latency_ms'] else 0.0
+    print(f"{'latency (ms)':<18}{fp32['latency_ms']:>10.1f}{int8['latency_ms']:>10.1f}"
+          f"{int8['latency_ms'] - fp32['latency_ms']:>+8.1f}  ({speedup:.2f}x)")
+    return {'model': model_name, 'class_names': class_names, 'fp32': fp32, 'int8': int8}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quantize a defect model to INT8 and check its accuracy.")
+    parser.add_argument('model', choices=sorted(ONNX_WEIGHTS))
+    parser.add_argument('--calib', help="Folder of calibration radiographs (quantize when given)")
+    parser.add_argument('--num-calib', type=int, default=200, help="Calibration images to use (default: 200)")
+    parser.add_argument('--method', choices=['minmax', 'percentile'], default='minmax')
+    parser.add_argument('--per-tensor', action='store_true', help="Per-tensor instead of per-channel weights")
+    parser.add_argument('--eval', help="Labelled folder to compare INT8 against FP32 on")
+    parser.add_argument('--conf', type=float, default=0.25, help="Confidence for precision/recall")
+    parser.add_argument('--report', help="Write the comparison as JSON here")
+    args = parser.parse_args()
+
+    if not args.calib and not args.eval:
+        parser.error("nothing to do: give --calib and/or --eval")
+    if args.calib:
+        path = quantize(args.model, args.calib, num_calib=args.num_calib,
+                        per_channel=not args.per_tensor, method=args.method)
+        print(f"Wrote {path}")
+    if args.eval:
+        report = compare(args.model, args.eval, conf=args.conf)
+        if args.report:
+            with open(args.report, 'w') as f:
+                json.dump(report, f, indent=2)
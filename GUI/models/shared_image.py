@@ -0,0 +1,103 @@
+"""Hands decoded images from the inference worker to the GUI through shared memory.
+
+``DefectDetector.run`` used to write the original and the annotated image to
+temporary PNGs (never deleted) which the GUI then decoded again.  Instead the
+worker copies the RGB pixels into a fresh ``multiprocessing.shared_memory``
+segment and only sends the segment name in its result frame.  The GUI
+attaches with ``SharedImage``, takes ownership (unlinks the name) and wraps
+the pixels in a QImage without copying them.
+
+Segment layout: a small header (magic, version, height, width, channels)
+followed by the uint8 pixels, row-major.
+
+The client picks the segment names of each reply (``reply_segments``) and
+sends them with the request, so when it drops a reply (the worker died or
+sent a broken frame) it can still unlink them with ``discard_segments``
+instead of leaving them in /dev/shm for good.
+"""
+import os
+import struct
+import uuid
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+MAGIC = b"DIMG"
+VERSION = 1
+
+HEADER = struct.Struct("<4sHIII")
+
+
+def reply_segments(prefix):
+    """Names of the segments of one reply: the original and the annotated image."""
+    return {'orig': f"{prefix}_orig", 'det': f"{prefix}_det"}
+
+
+def share_image(image, name=None):
+    """Copies an HxW or HxWxC uint8 image into a new segment and returns its name.
+
+    The segment is not unlinked here: ownership passes to whoever opens it
+    with ``SharedImage``.  ``name`` defaults to a random one.
+    """
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+    if image.ndim == 2:
+        image = image[:, :, None]
+    height, width, channels = image.shape
+
+    shm = shared_memory.SharedMemory(name=name or f"drdo_{uuid.uuid4().hex[:16]}", create=True,
+                                     size=HEADER.size + image.nbytes)
+    # The reader unlinks the segment; keep our resource tracker from
+    # "cleaning up" (and warning about) it when this process exits.  Only
+    # POSIX has a tracker, which knows segments by their /name.
+    if os.name == "posix":
+        resource_tracker.unregister("/" + shm.name, "shared_memory")
+    try:
+        HEADER.pack_into(shm.buf, 0, MAGIC, VERSION, height, width, channels)
+        np.ndarray(image.shape, np.uint8, buffer=shm.buf, offset=HEADER.size)[:] = image
+    finally:
+        shm.close()
+    return shm.name
+
+
+class SharedImage:
+    """Reader side of ``share_image``.
+
+    ``array`` is a view straight into the segment; keep this object alive for as
+    long as anything (e.g. a QImage) references the pixels.
+    """
+
+    def __init__(self, name):
+        self._shm = shared_memory.SharedMemory(name=name)
+        try:
+            magic, version, height, width, channels = HEADER.unpack_from(self._shm.buf)
+        finally:
+            # The mapping stays valid after unlink; this only removes the name
+            self._shm.unlink()
+        if magic != MAGIC or version > VERSION:
+            self._shm.close()
+            raise ValueError(f"{name} is not a shared image segment")
+        self.name = name
+        self.height = height
+        self.width = width
+        self.channels = channels
+        self.array = np.ndarray((height, width, channels), np.uint8, buffer=self._shm.buf, offset=HEADER.size)
+
+    def close(self):
+        self.array = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # Still exported (e.g. wrapped by a live QImage); the mapping is
+            # released when the last view goes away.
+            pass
+
+
+def discard_segments(names):
+    """Unlinks segments nobody is going to open; names that do not exist are skipped."""
+    for name in names:
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        except (FileNotFoundError, ValueError):
+            continue
+        shm.close()
+        shm.unlink()
@@ -0,0 +1,88 @@
+"""Duplicate-box suppression after ``model.predict``.
+
+YOLO's own NMS is per class and IoU only, so the same defect regularly came
+back twice: a box of another class on top of it, or a smaller box of the
+same class nested inside it (two 'overlap' detections of one defect, see
+GUI/txt).  Every duplicate became its own list widget, overlay and report
+row.  ``suppress_duplicates`` cleans a prediction up in three vectorised
+steps, each optional:
+
+1. boxes smaller than ``min_area`` pixels are dropped;
+2. the rest are merged with NMS or weighted box fusion at ``iou_threshold``,
+   across classes when ``cross_class`` is set (the best box's class wins);
+3. a box lying for more than ``containment`` of its area inside a box of
+   the same class (of any class with ``containment_cross_class``) scoring
+   at least as high is dropped.  A box is never dropped for containing
+   others: a large defect with small pores inside it keeps its box.
+
+Every step goes best box first and a box is only ever removed because of a
+better one, so boxes below the display threshold never change the boxes
+above it: the GUI (inferring at a low floor and filtering with the slider)
+and batch mode (inferring at the threshold) show the same detections.  (A
+WBF merge keeps the best score of each cluster, but its coordinates still
+average in the weaker members.)
+
+The detectors apply it in single-image, tiled and batch mode.  Settings are
+per model (``SUPPRESSION_SETTINGS``); the INT8 builds share the settings of
+their float model.
+"""
+import numpy as np
+
+from models.boxes import box_area, nms, suppress_contained, weighted_box_fusion
+
+# model name -> suppression settings
+#   min_area:      boxes with a smaller area (pixels) are dropped; 0 keeps all
+#   merge:         'nms', 'wbf' or None
+#   iou_threshold: IoU above which two boxes are merged
+#   containment:   share of a box's area inside a better one above which it
+#                  is dropped; None to keep nested boxes
+#   cross_class:   merge overlapping boxes whatever their classes
+#   containment_cross_class:
+#                  drop boxes nested in a better box of another class too
+SUPPRESSION_SETTINGS = {
+    # 0.5 merges the nested pair of GUI/txt (IoU 0.57), where the better box is the inner one
+    'yolo': {'min_area': 16, 'merge': 'nms', 'iou_threshold': 0.5, 'containment': 0.85, 'cross_class': True,
+             'containment_cross_class': False},
+    # Pores are small and often close together: keep small boxes and only drop nearly identical ones
+    'porosity_model': {'min_area': 4, 'merge': 'nms', 'iou_threshold': 0.7, 'containment': 0.95,
+                       'cross_class': True, 'containment_cross_class': False},
+    # The two networks' boxes are already fused per class (models/ensemble.py)
+    'ensemble': {'min_area': 16, 'merge': 'nms', 'iou_threshold': 0.5, 'containment': 0.85, 'cross_class': True,
+                 'containment_cross_class': False},
+}
+
+DEFAULT_SETTINGS = {'min_area': 0, 'merge': 'nms', 'iou_threshold': 0.6, 'containment': None, 'cross_class': False,
+                    'containment_cross_class': False}
+
+
+def suppression_settings(model_name, **overrides):
+    """Suppression settings of ``model_name`` (or of its float model for an INT8 build), with ``overrides``."""
+    base = model_name[:-len("_int8")] if model_name.endswith("_int8") else model_name
+    settings = dict(SUPPRESSION_SETTINGS.get(base, DEFAULT_SETTINGS))
+    settings.update({k: v for k, v in overrides.items() if v is not None})
+    return settings
+
+
+def suppress_duplicates(boxes, scores, classes, min_area=0, merge='nms', iou_threshold=0.6,
+                        containment=None, cross_class=False, containment_cross_class=False):
+    """Removes duplicate and tiny detections; returns (boxes, scores, classes) as float32 arrays."""
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+    classes = np.asarray(classes, dtype=np.float32).reshape(-1)
+
+    if min_area:
+        keep = box_area(boxes) >= min_area
+        boxes, scores, classes = boxes[keep], scores[keep], classes[keep]
+
+    if merge == 'wbf':
+        boxes, scores, classes = weighted_box_fusion(boxes, scores, classes, iou_threshold,
+                                                     class_aware=not cross_class, score="max")
+    elif merge == 'nms':
+        keep = nms(boxes, scores, None if cross_class else classes, iou_threshold)
+        boxes, scores, classes = boxes[keep], scores[keep], classes[keep]
+
+    if containment:
+        keep = np.sort(suppress_contained(boxes, scores, None if containment_cross_class else classes, containment))
+        boxes, scores, classes = boxes[keep], scores[keep], classes[keep]
+
+    return boxes, scores, classes
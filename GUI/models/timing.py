@@ -0,0 +1,74 @@
+"""Lightweight per-stage timing for the detection path.
+
+``StageTimer`` collects wall times (ms) of named stages.  The worker times
+decode, weight load, the ultralytics stages, overlay drawing and the shared
+memory writes and sends them in the result frame; the GUI adds dispatch,
+parsing, rendering, scaling and widget building, shows the lot in the
+status-bar HUD and appends one record per detection to a JSONL trace
+(``DRDO_TRACE`` or ~/.cache/drdo/trace.jsonl).
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+TRACE_PATH = os.environ.get("DRDO_TRACE", os.path.join(os.path.expanduser("~"), ".cache", "drdo", "trace.jsonl"))
+
+_trace_lock = threading.Lock()
+
+
+class StageTimer:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - t0) * 1000)
+
+    def add(self, name, ms):
+        self.stages[name] = round(self.stages.get(name, 0.0) + ms, 2)
+
+    def update(self, stages):
+        for name, ms in stages.items():
+            self.add(name, ms)
+
+    def elapsed_ms(self):
+        return round((time.perf_counter() - self.start) * 1000, 2)
+
+
+# Stage name -> short HUD label, in pipeline order
+HUD_LABELS = [
+    ("cache_lookup", "cache"), ("dispatch", "dispatch"), ("weight_load", "load"), ("decode", "decode"),
+    ("preprocess", "pre"), ("inference", "infer"), ("postprocess", "post"), ("merge", "merge"),
+    ("draw", "draw"), ("shm_write", "shm"), ("parse", "parse"), ("gui_decode", "gui decode"),
+    ("render", "render"), ("scale", "scale"), ("box3", "box3"), ("widgets", "widgets"),
+]
+
+
+def format_stages(stages):
+    """One-line HUD text, e.g. 'infer 212 · widgets 35 · 6 tiles, 35 ms/tile (max 41)'."""
+    parts = [f"{label} {stages[name]:.0f}" for name, label in HUD_LABELS if name in stages]
+    if stages.get("tiles"):
+        tiles = f"{stages['tiles']:.0f} tiles"
+        if "tile_mean" in stages:
+            tiles += f", {stages['tile_mean']:.0f} ms/tile (max {stages.get('tile_max', 0):.0f})"
+        parts.append(tiles)
+    return " · ".join(parts)
+
+
+def append_trace(record, path=None):
+    """Appends one JSON record to the trace file; tracing never breaks detection."""
+    path = path or TRACE_PATH
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        line = json.dumps(record) + "\n"
+        with _trace_lock, open(path, "a") as f:
+            f.write(line)
+    except (OSError, TypeError, ValueError) as e:
+        print("Could not write timing trace:", e)
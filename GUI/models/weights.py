@@ -0,0 +1,54 @@
+"""Locations of the model weights.
+
+Shared by the detectors, the inference worker and the GUI-side caches, which
+need to know which file a model name refers to without importing the
+detector modules.
+"""
+import os
+
+# Base directory for assets, e.g., for best.pt weights
+base_dir = "/home/vulture/Desktop/DRDO/GUI/Assets/"
+
+# model name (as used by Ui_WeldingDefectDetection.select_model) -> weight file
+MODEL_WEIGHTS = {
+    'yolo': os.path.join(base_dir, "best.pt"),
+    'porosity_model': os.path.join(base_dir, "porosity_model.pt"),
+}
+
+# ONNX exports (python -m models.export_onnx) sit next to the .pt files
+ONNX_WEIGHTS = {name: os.path.splitext(path)[0] + ".onnx" for name, path in MODEL_WEIGHTS.items()}
+
+# Inference backend per model: "torch" (ultralytics) or "onnx" (onnxruntime, CPU).
+# Selected with DRDO_BACKEND_<MODEL>, e.g. DRDO_BACKEND_YOLO=onnx
+MODEL_BACKENDS = {
+    name: os.environ.get(f"DRDO_BACKEND_{name.upper()}", "torch") for name in MODEL_WEIGHTS
+}
+
+
+# INT8 post-training quantized ONNX models (python -m models.quantize). They
+# are selectable as models of their own, always run on onnxruntime.
+QUANTIZED_WEIGHTS = {
+    f"{name}_int8": os.path.splitext(path)[0] + ".int8.onnx" for name, path in MODEL_WEIGHTS.items()
+}
+
+
+# Fused ensembles (models/ensemble.py): model name -> the models it runs together
+ENSEMBLES = {
+    'ensemble': ('yolo', 'porosity_model'),
+    'ensemble_int8': ('yolo_int8', 'porosity_model_int8'),
+}
+
+
+def active_weights(model_name):
+    """Weight file the configured backend of ``model_name`` loads (a tuple of them for an ensemble)."""
+    if model_name in ENSEMBLES:
+        return tuple(active_weights(member) for member in ENSEMBLES[model_name])
+    if model_name in QUANTIZED_WEIGHTS:
+        return QUANTIZED_WEIGHTS[model_name]
+    if MODEL_BACKENDS.get(model_name) == "onnx":
+        return ONNX_WEIGHTS[model_name]
+    return MODEL_WEIGHTS[model_name]
+
+
+# What each model name currently runs with; the detection cache hashes these
+ACTIVE_WEIGHTS = {name: active_weights(name) for name in list(MODEL_WEIGHTS) + list(QUANTIZED_WEIGHTS) + list(ENSEMBLES)}
@@ -0,0 +1,209 @@
+"""Long-lived inference worker.
+
+The GUI used to spawn ``conda run ... python -c`` for every detection, which
+paid for interpreter start-up, the torch/ultralytics import and the weight
+load on every single image.  ``serve`` runs once inside the ``yolo``
+environment and keeps one DefectDetector per model resident;
+``InferenceWorkerClient`` is the GUI side that talks to it over the process
+pipes and restarts it when it dies.
+
+Requests and replies are frames of the protocol in models/protocol.py; the
+detector streams its result frame straight onto the reply pipe.
+"""
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from models.protocol import ProtocolError, read_frame, write_error, write_frame
+from models.shared_image import discard_segments, reply_segments
+
+GUI_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# --no-capture-output is required, otherwise conda buffers the worker's stdout
+# until the process exits and every request would block forever.
+WORKER_COMMAND = [
+    'conda', 'run', '--no-capture-output', '-n', 'yolo',
+    'python', '-u', '-m', 'models.worker'
+]
+
+# model name (as used by Ui_WeldingDefectDetection.select_model) -> module
+DETECTOR_MODULES = {
+    'yolo': 'models.model',
+    'porosity_model': 'models.porosity_model',
+    'yolo_int8': 'models.model',
+    'porosity_model_int8': 'models.porosity_model',
+    'ensemble': 'models.ensemble',
+    'ensemble_int8': 'models.ensemble',
+}
+
+
+# ---------------------------------------------------------
+#                  WORKER (runs in the yolo env)
+# ---------------------------------------------------------
+def _get_detector(detectors, model_name):
+    if model_name not in detectors:
+        module_name = DETECTOR_MODULES.get(model_name)
+        if module_name is None:
+            raise ValueError(f"Unknown model: {model_name}")
+        module = __import__(module_name, fromlist=['DefectDetector'])
+        detectors[model_name] = module.DefectDetector(model_name)
+    return detectors[model_name]
+
+
+def _detect(detectors, request, reply):
+    model_name = request.get('model', 'yolo')
+    detector = _get_detector(detectors, model_name)
+    detector.run(
+        request['image_path'],
+        request.get('threshold', 0.25),
+        stream=reply,
+        request_id=request.get('id'),
+        draw=request.get('draw', True),
+        tiling=request.get('tiling'),
+        cascade=request.get('cascade'),
+        suppression=request.get('suppression'),
+        segment=request.get('segment'),
+    )
+
+
+def _warmup(detectors, request, reply):
+    start = time.perf_counter()
+    detector = _get_detector(detectors, request.get('model', 'yolo'))
+    import_ms = round((time.perf_counter() - start) * 1000, 1)
+    timings = detector.warmup()
+    write_frame(reply, {'type': 'warmup', 'ok': True, 'id': request.get('id'), 'import_ms': import_ms, **timings})
+
+
+def serve():
+    # ultralytics and the detectors print progress to stdout. Keep a private
+    # handle on the real stdout for replies and send everything else to stderr.
+    reply = os.fdopen(os.dup(sys.stdout.fileno()), 'wb')
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    requests = sys.stdin.buffer
+
+    detectors = {}
+    while True:
+        try:
+            request, _ = read_frame(requests)
+        except EOFError:
+            break
+
+        cmd = request.get('cmd')
+        request_id = request.get('id')
+        if cmd == 'quit':
+            break
+        try:
+            if cmd == 'ping':
+                write_frame(reply, {'type': 'pong', 'ok': True, 'id': request_id})
+            elif cmd == 'detect':
+                _detect(detectors, request, reply)
+            elif cmd == 'warmup':
+                _warmup(detectors, request, reply)
+            else:
+                write_error(reply, f"Unknown command: {cmd}", id=request_id)
+        except Exception as e:
+            write_error(reply, str(e), id=request_id)
+
+
+# ---------------------------------------------------------
+#                  CLIENT (runs in the GUI)
+# ---------------------------------------------------------
+class InferenceWorkerClient:
+    """Owns the worker process and serialises requests to it.
+
+    If the worker crashes (or was never able to start) the request is retried
+    once on a freshly started process.
+    """
+
+    def __init__(self, command=None, cwd=GUI_DIR):
+        self.command = command or WORKER_COMMAND
+        self.cwd = cwd
+        self._proc = None
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def start(self):
+        with self._lock:
+            self._ensure_started()
+
+    def is_running(self):
+        return self._proc is not None and self._proc.poll() is None
+
+    def _ensure_started(self):
+        if self.is_running():
+            return
+        self._proc = subprocess.Popen(
+            self.command,
+            cwd=self.cwd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+
+    def _kill(self):
+        if self._proc is None:
+            return
+        try:
+            self._proc.kill()
+            self._proc.wait(timeout=5)
+        except Exception:
+            pass
+        self._proc = None
+
+    def request(self, payload):
+        """Sends one request and returns the reply header with its arrays merged in."""
+        with self._lock:
+            self._next_id += 1
+            for attempt in range(2):
+                # Shared-memory names of the reply's images, chosen here so a lost reply can be cleaned up
+                segment = f"drdo_{os.getpid()}_{self._next_id}_{attempt}"
+                payload = dict(payload, id=self._next_id, segment=segment)
+                try:
+                    self._ensure_started()
+                    write_frame(self._proc.stdin, payload)
+                    header, arrays = read_frame(self._proc.stdout)
+                except (OSError, EOFError, ProtocolError) as e:
+                    print(f"Inference worker failed ({e}), restarting...")
+                    self._kill()
+                    discard_segments(reply_segments(segment).values())
+                    continue
+                if not header.get('ok'):
+                    # e.g. failed between sharing the original and the annotated image
+                    discard_segments(reply_segments(segment).values())
+                header.update(arrays)
+                return header
+            return {'ok': False, 'error': 'Inference worker unavailable.'}
+
+    def detect(self, image_path, model_name='yolo', threshold=0.25, draw=True, tiling=None, cascade=None,
+               suppression=None):
+        return self.request({
+            'cmd': 'detect',
+            'model': model_name,
+            'image_path': image_path,
+            'threshold': threshold,
+            'draw': draw,
+            'tiling': tiling,
+            'cascade': cascade,
+            'suppression': suppression,
+        })
+
+    def warmup(self, model_name='yolo'):
+        """Imports, loads and runs ``model_name`` once on a dummy image in the worker."""
+        return self.request({'cmd': 'warmup', 'model': model_name})
+
+    def stop(self):
+        with self._lock:
+            if not self.is_running():
+                self._proc = None
+                return
+            try:
+                write_frame(self._proc.stdin, {'cmd': 'quit'})
+                self._proc.wait(timeout=5)
+            except Exception:
+                pass
+            self._kill()
+
+
+if __name__ == "__main__":
+    serve()
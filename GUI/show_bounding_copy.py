@@ -1,227 +1,237 @@
+import numpy as np
 from PyQt5 import QtWidgets, QtGui, QtCore
 
+from utils.image_store import get_image, get_proxy
+
+CLASS_NAMES = ['crack', 'lof', 'lop', 'overlap', 'porosity', 'slag', 'spattering', 'undercut']
+CLASS_COLORS = {
+    'crack': (255, 0, 0),
+    'lof': (0, 255, 0),
+    'lop': (0, 0, 255),
+    'overlap': (255, 255, 0),
+    'porosity': (255, 0, 255),
+    'slag': (0, 255, 255),
+    'spattering': (128, 0, 128),
+    'undercut': (0, 128, 128)
+}
+
+
+class BoxOverlay:
+    """Box 3: the image scaled once, under a transparent layer holding the ticked boxes.
+
+    Ticking a box draws it on the layer; unticking clears its footprint and
+    repaints only the boxes under it.  The image is read and smooth-scaled
+    once per image instead of on every toggle.
+    """
+
+    def __init__(self, label, max_size=QtCore.QSize(490, 446)):
+        self.label = label
+        self.max_size = max_size
+        self.key = None
+        self.base = None
+        self.layer = None
+        self.scale = 1.0
+        self.store = None
+        self.footprints = {}  # annotation id -> QRect covered on the layer (box and label)
+
+    # ----- base image -----
+
+    def set_image(self, image):
+        """Shows ``image`` (path, QImage or QPixmap) without boxes; scales it only if it is a new image."""
+        key = image if isinstance(image, str) else image.cacheKey()
+        if key != self.key or self.base is None:
+            if isinstance(image, str):
+                # Paths come from the shared image store, scaled from a proxy
+                full = get_image(image)
+                if full is None:
+                    return
+                self.base = QtGui.QPixmap.fromImage(get_proxy(image, self.max_size))
+                self.scale = self.base.width() / full.width()
+            else:
+                pixmap = image if isinstance(image, QtGui.QPixmap) else QtGui.QPixmap.fromImage(image)
+                if pixmap.isNull():
+                    return
+                self.scale = min(self.max_size.width() / pixmap.width(), self.max_size.height() / pixmap.height())
+                self.base = pixmap.scaled(
+                    QtCore.QSize(int(pixmap.width() * self.scale), int(pixmap.height() * self.scale)),
+                    QtCore.Qt.IgnoreAspectRatio,
+                    QtCore.Qt.SmoothTransformation
+                )
+            self.key = key
+        self.layer = QtGui.QImage(self.base.size(), QtGui.QImage.Format_ARGB32_Premultiplied)
+        self.layer.fill(QtCore.Qt.transparent)
+        self._track(None)
+        self._compose()
+
+    # ----- overlay -----
+
+    def show(self, store, ids=None):
+        """Brings the layer in line with the ticked rows of ``store``; ``ids`` are the rows that changed."""
+        if self.base is None:
+            return
+        # Another store, rows added or removed, or most rows changed (Select All): repaint the layer
+        if store is not self.store or ids is None or len(ids) > len(store) // 2:
+            self._track(store)
+            self.layer.fill(QtCore.Qt.transparent)
+            painter = self._painter()
+            for row in self._rows(store.checked_rows()):
+                self._draw(painter, *row)
+            painter.end()
+            self._compose()
+            return
+
+        painter = self._painter()
+        cleared = QtGui.QRegion()
+        for ann_id in ids:
+            footprint = self.footprints.pop(ann_id, None)
+            if footprint is not None:
+                cleared += footprint
+        if not cleared.isEmpty():
+            painter.setCompositionMode(QtGui.QPainter.CompositionMode_Clear)
+            for rect in cleared.rects():
+                painter.fillRect(rect, QtCore.Qt.transparent)
+            painter.setCompositionMode(QtGui.QPainter.CompositionMode_SourceOver)
+            # Boxes that overlapped the cleared ones lost pixels there
+            painter.setClipRegion(cleared)
+            under = [store.row(ann_id) for ann_id, footprint in self.footprints.items() if cleared.intersects(footprint)]
+            for row in self._rows(store.boxes[under]):
+                self._draw(painter, *row)
+            painter.setClipping(False)
+        ticked = [store.row(ann_id) for ann_id in ids if ann_id in store and ann_id not in self.footprints]
+        for row in self._rows(store.boxes[ticked]):
+            if row[-1]:  # ticked, not unticked
+                self._draw(painter, *row)
+        painter.end()
+        self._compose()
+
+    def _track(self, store):
+        # Rows added or removed under the layer's feet make the next update a full repaint
+        if self.store is not None:
+            try:
+                self.store.reset.disconnect(self._store_reset)
+            except TypeError:
+                pass
+        self.store = store
+        self.footprints = {}
+        if store is not None:
+            store.reset.connect(self._store_reset)
+
+    def _store_reset(self):
+        self._track(None)
+
+    def _painter(self):
+        painter = QtGui.QPainter(self.layer)
+        font = QtGui.QFont("Arial")
+        font.setPixelSize(max(8, round(16 * self.scale)))
+        painter.setFont(font)
+        return painter
+
+    def _rows(self, boxes):
+        """Plain Python tuples of the fields _draw needs (plus the check state), for the boxed shapes."""
+        boxes = boxes[boxes['shape'] <= 1]  # polygons and strokes have no box
+        scaled = np.rint(np.stack([boxes['x'], boxes['y'], boxes['w'], boxes['h']], axis=1) * self.scale)
+        confidences = np.nan_to_num(boxes['confidence'], nan=0.0)  # NaN for manual boxes
+        return zip(boxes['id'].tolist(), boxes['shape'].tolist(), scaled.astype(int).tolist(),
+                   confidences.tolist(), boxes['class_id'].tolist(), boxes['checked'].tolist())
+
+    def _draw(self, painter, ann_id, shape, xywh, confidence, class_id, checked=True):
+        defect_class = CLASS_NAMES[class_id] if 0 <= class_id < len(CLASS_NAMES) else ''
+        rect = QtCore.QRect(*xywh)
+
+        pen = QtGui.QPen(QtGui.QColor(*CLASS_COLORS.get(defect_class, (255, 255, 255))))
+        pen.setWidth(max(1, round(2 * self.scale)))
+        painter.setPen(pen)
+        if shape == 1:
+            painter.drawEllipse(rect)
+        else:
+            painter.drawRect(rect)
+        txt = f"Class: {defect_class} (Cnf: {confidence:.2f})"
+        baseline = QtCore.QPoint(rect.x(), rect.y() - 2)
+        painter.drawText(baseline, txt)
+
+        metrics = painter.fontMetrics()
+        text_rect = metrics.boundingRect(txt).translated(baseline)
+        margin = pen.width() + 1
+        self.footprints[ann_id] = rect.adjusted(-margin, -margin, margin, margin).united(text_rect)
+
+    def _compose(self):
+        pixmap = QtGui.QPixmap(self.base)
+        painter = QtGui.QPainter(pixmap)
+        painter.drawImage(0, 0, self.layer)
+        painter.end()
+        self.label.setPixmap(pixmap)
+        self.label.setAlignment(QtCore.Qt.AlignCenter)
+
 
 class BoundingBoxDisplay:
-    def __init__(self, parent, image_path, boxLayout2):
+    def __init__(self, parent, image_path, view):
         self.parent = parent
         self.image_path = image_path
-        self.boxLayout2 = boxLayout2
-
-        self.bbox_colors = {}
-        self.conf_scores = {}
-
-        self.class_names = ['crack', 'lof', 'lop', 'overlap', 'porosity', 'slag', 'spattering', 'undercut']
-        self.class_colors = {
-            'crack': (255, 0, 0),
-            'lof': (0, 255, 0),
-            'lop': (0, 0, 255),
-            'overlap': (255, 255, 0),
-            'porosity': (255, 0, 255),
-            'slag': (0, 255, 255),
-            'spattering': (128, 0, 128),
-            'undercut': (0, 128, 128)
-        }
+        # QListView over a DetectionListModel (utils/detection_list.py)
+        self.view = view
+        self.model = view.model()
+        # AnnotationStore (utils/annotations.py) behind the list
+        self.store = self.model.store
 
-    def display_bbox(self, bounding_boxes, cf, cls):
-        self.clear_layout()
+        self.class_names = CLASS_NAMES
+        self.class_colors = CLASS_COLORS
 
-        if bounding_boxes == '--instructions--':
-            self.display_instructions()
+    def display_bbox(self, bounding_boxes, cf, cls):
+        if isinstance(bounding_boxes, str) and bounding_boxes == '--instructions--':
+            self._show_instructions()
             return
 
-        if not bounding_boxes:
+        if bounding_boxes is None or not len(bounding_boxes):
             self.show_no_defect_message()
             return
 
-        # Add "Select All" checkbox
-        select_all_checkbox = QtWidgets.QCheckBox("Select All")
-        select_all_checkbox.setStyleSheet("font-size: 16px; color: red;")
-        select_all_checkbox.setObjectName("CheckBox_SelectAll")
-        select_all_checkbox.stateChanged.connect(self.toggle_all)
-        self.boxLayout2.addWidget(select_all_checkbox)
+        # One store reset; the view only paints the rows that are visible
+        self.model.set_message(None)
+        self.store.set_detections(bounding_boxes, cf, cls)
 
-        for idx, (bbox, confidence, defect_class) in enumerate(zip(bounding_boxes, cf, cls), start=1):
-            x, y, w, h = bbox
+    def render_detections(self, image, boxes, confidences, classes):
+        """Returns a copy of ``image`` (QImage) with xyxy boxes and class/score labels drawn, like the detector's overlay."""
+        detected = image.convertToFormat(QtGui.QImage.Format_RGB32)
+        painter = QtGui.QPainter(detected)
+        painter.setFont(QtGui.QFont("Arial", 10))
 
-            try:
-                defect_class_idx = int(defect_class)
-                defect_class_name = self.class_names[defect_class_idx]
-            except (ValueError, IndexError, TypeError):
-                defect_class_name = str(defect_class).strip().lower()
-
-            color = self.class_colors.get(defect_class_name, (255, 255, 255))  # white fallback
-            self.bbox_colors[bbox] = color
-            self.conf_scores[bbox] = confidence
-
-            container = QtWidgets.QWidget()
-            v_layout = QtWidgets.QVBoxLayout(container)
-            v_layout.setContentsMargins(0, 0, 0, 0)
-            v_layout.setSpacing(2)
-
-            checkbox = QtWidgets.QCheckBox(f"Box: {idx}")
-            checkbox.setObjectName("CheckBox_bbox")
-            checkbox.setStyleSheet("font-size: 16px; color: red;")
-            checkbox.setChecked(False)
-
-            checkbox.setProperty("bbox", (x, y, w, h))
-            checkbox.setProperty("defect_class", defect_class_name)
-            checkbox.setProperty("confidence", confidence)
-            checkbox.setProperty("model_delected",1)
-
-            checkbox.stateChanged.connect(lambda state, cb=checkbox: self.redraw_all_rectangles())
-
-            label = QtWidgets.QLabel(
-                f"<b> <span style='color:blue'>Type of Defect: </span></b> {defect_class_name}<br>"
-                f"<b><span style='color:blue'>Confidence:</span></b> {confidence:.2f}<br>"
-                f"<b><span style='color:blue'>x: </span></b> {x}<br>"
-                f"<b><span style='color:blue'>y: </span></b> {y}<br>"
-                f"<b><span style='color:blue'>w: </span></b> {w}<br>"
-                f"<b><span style='color:blue'>h: </span></b> {h}"
-            )
-            # label.setStyleSheet("margin: 0; padding: 0.5; color: black;")
-            label.setObjectName("checkBoxLabel")
-
-            v_layout.addWidget(checkbox)
-            v_layout.addWidget(label)
-
-            self.boxLayout2.addWidget(container)
-
-    def redraw_all_rectangles(self):
-        original_pixmap = QtGui.QPixmap(self.image_path)
-        painter = QtGui.QPainter(original_pixmap)
-        painter.setFont(QtGui.QFont("Arial", 12))
-
-        for i in range(1, self.boxLayout2.count()):
-            item = self.boxLayout2.itemAt(i)
-            if not item:
-                continue
-            widget = item.widget()
-            if not widget:
-                continue
-
-            checkbox = widget.findChild(QtWidgets.QCheckBox, "CheckBox_bbox")
-            if checkbox and checkbox.isChecked():
-                bbox = checkbox.property("bbox")
-                if bbox:
-                    x, y, w, h = bbox
-                    defect_class = checkbox.property("defect_class")
-                    confidence = checkbox.property("confidence")
-                    color = self.bbox_colors.get(bbox, (255, 255, 255))
-
-                    pen = QtGui.QPen(QtGui.QColor(*color))
-                    pen.setWidth(2)
-                    painter.setPen(pen)
-
-                    painter.drawRect(int(x), int(y), int(w), int(h))
-                    txt = f"Class: {defect_class} (Cnf: {confidence:.2f})"
-                    painter.drawText(int(x), int(y) - 5, txt)
+        for (x1, y1, x2, y2), confidence, defect_class in zip(boxes.tolist(), confidences.tolist(), classes.tolist()):
+            class_name = self.class_names[int(defect_class)]
+            painter.setPen(QtGui.QPen(QtGui.QColor(*self.class_colors[class_name]), 1))
+            painter.drawRect(int(x1), int(y1), int(x2 - x1), int(y2 - y1))
+            label_y = y1 - 10 if y1 - 10 > 10 else y1 + 25
+            painter.drawText(int(x1), int(label_y), f"Class: {class_name}, Score: {confidence:.2f}")
 
         painter.end()
+        return detected
 
-        max_width = 490
-        max_height = 446
-        original_width = original_pixmap.width()
-        original_height = original_pixmap.height()
-        scale_factor = min(max_width / original_width, max_height / original_height)
-
-        scaled_pixmap = original_pixmap.scaled(
-            QtCore.QSize(int(original_width * scale_factor), int(original_height * scale_factor)),
-            QtCore.Qt.IgnoreAspectRatio,
-            QtCore.Qt.SmoothTransformation
-        )
-
-        self.parent.show_eiditable_image_in_box3(scaled_pixmap)
+    def redraw_all_rectangles(self):
+        self.redraw_from_store(self.store)
 
     def toggle_all(self, state):
-        for i in range(1, self.boxLayout2.count()):
-            item = self.boxLayout2.itemAt(i)
-            if not item:
-                continue
-            widget = item.widget()
-            if not widget:
-                continue
-
-            checkbox = widget.findChild(QtWidgets.QCheckBox, "CheckBox_bbox")
-            if checkbox:
-                checkbox.setChecked(state == QtCore.Qt.Checked)
-
-        self.redraw_all_rectangles()
-    
-    def redraw_from_layout(self, layout):
-        original_pixmap = QtGui.QPixmap(self.image_path)
-        painter = QtGui.QPainter(original_pixmap)
-        painter.setFont(QtGui.QFont("Arial", 12))
-
-        for i in range(layout.count()):
-            item = layout.itemAt(i)
-            if not item:
-                continue
-            widget = item.widget()
-            if not widget:
-                continue
-
-            checkbox = widget.findChild(QtWidgets.QCheckBox, "CheckBox_bbox")
-            if checkbox and checkbox.isChecked():
-                bbox = checkbox.property("bbox")
-                defect_class = checkbox.property("defect_class")
-                confidence = checkbox.property("confidence")
-                if not bbox:
-                    continue
-
-                x, y, w, h = bbox
-                color = self.class_colors.get(str(defect_class).lower(), (255, 255, 255))
-
-                pen = QtGui.QPen(QtGui.QColor(*color))
-                pen.setWidth(2)
-                painter.setPen(pen)
-                painter.drawRect(int(x), int(y), int(w), int(h))
-                txt = f"Class: {defect_class} (Cnf: {confidence:.2f})"
-                painter.drawText(int(x), int(y) - 5, txt)
-
-        painter.end()
-
-        # Scale to fit the display
-        original_width = original_pixmap.width()
-        original_height = original_pixmap.height()
-        scale_factor = min(490 / original_width, 446 / original_height)
-
-        scaled_pixmap = original_pixmap.scaled(
-            QtCore.QSize(int(original_width * scale_factor), int(original_height * scale_factor)),
-            QtCore.Qt.IgnoreAspectRatio,
-            QtCore.Qt.SmoothTransformation
-        )
+        # The store emits changed once, which redraws box 3
+        self.store.set_all_checked(state == QtCore.Qt.Checked)
 
-        self.parent.show_eiditable_image_in_box3(scaled_pixmap)
+    def redraw_from_store(self, store, ids=None):
+        """Shows the ticked annotations of ``store`` in box 3 (only ``ids`` changed, if given)."""
+        self.parent.box3.show(store, ids)
 
-
-    def clear_layout(self):
-        while self.boxLayout2.count() > 0:
-            child = self.boxLayout2.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
+    def clear(self):
+        self.model.set_message(None)
+        self.store.clear()
 
     def show_no_defect_message(self):
-        label = QtWidgets.QLabel("No defect detected")
-        # label.setStyleSheet("font-size: 16px; color: red;")
-        label.setObjectName("checkBoxLabel")
-        label.setAlignment(QtCore.Qt.AlignCenter)
-        self.boxLayout2.addWidget(label)
-
-    def _show_instructions(self):
-        container = QtWidgets.QWidget()
-        v_layout = QtWidgets.QVBoxLayout(container)
-        v_layout.setContentsMargins(0, 0, 0, 0)
-        v_layout.setSpacing(2)
-
-        select_all_checkbox = QtWidgets.QCheckBox("Select All")
-        select_all_checkbox.setStyleSheet("font-size: 16px; color: blue;")
-        select_all_checkbox.setObjectName("CheckBox_SelectAll")
+        self.store.clear()
+        self.model.set_message("No defect detected")
 
-        checkbox = QtWidgets.QCheckBox("Box: 1")
-        checkbox.setObjectName("CheckBox_bbox")
-        checkbox.setStyleSheet("font-size: 16px; color: red;")
+    def show_screened_clean_message(self):
+        self.store.clear()
+        self.model.set_message("<b>Screened clean</b><br>The screening pass found nothing, "
+                               "so the full-resolution pass was skipped.")
 
-        label = QtWidgets.QLabel(
+    def _show_instructions(self):
+        self.store.clear()
+        self.model.set_message(
             "<b>Instructions:</b><br>"
             "1. Select a folder containing images to begin.<br>"
             "2. Images will appear in the left panel.<br>"
@@ -230,12 +240,3 @@ class BoundingBoxDisplay:
             "5. Click <b>Detect Defects</b> to run detection.<br>"
             "6. Detected image will appear on the right."
         )
-        label.setWordWrap(True)
-        # label.setStyleSheet("margin: 0; padding: 0.5;")
-        label.setObjectName("checkBoxLabel")
-
-        v_layout.addWidget(select_all_checkbox)
-        v_layout.addWidget(checkbox)
-        v_layout.addWidget(label)
-
-        self.boxLayout2.addWidget(container)
@@ -1,6 +1,8 @@
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PIL import Image
 
+from utils.image_store import get_image
+
 class Ui_MainWindow(object):  # Change to object (not QMainWindow)
     def setupUi(self, MainWindow):
         screen = QtWidgets.QApplication.primaryScreen().availableGeometry()
@@ -65,8 +67,12 @@ class DetectedImageWindow(QtWidgets.QMainWindow):  # Now this is a proper window
                 data = image.tobytes("raw", "RGBA")
                 qimage = QtGui.QImage(data, image.width, image.height, QtGui.QImage.Format_RGBA8888)
                 pixmap = QtGui.QPixmap.fromImage(qimage)
+            elif isinstance(self.image_path, QtGui.QImage):
+                pixmap = QtGui.QPixmap.fromImage(self.image_path)
             else:
-                pixmap = QtGui.QPixmap(self.image_path)
+                # Paths are decoded once, in the shared image store
+                image = get_image(self.image_path)
+                pixmap = QtGui.QPixmap.fromImage(image) if image is not None else QtGui.QPixmap()
             if not pixmap.isNull():
                 target_width = self.ui.label.width()
                 target_height = self.ui.label.height()
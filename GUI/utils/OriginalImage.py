@@ -1,6 +1,8 @@
 from PyQt5 import QtCore, QtGui, QtWidgets
 import os
 
+from utils.image_store import acquire_image, release_image
+
 class Ui_MainWindow(object):  # Change to object (not QMainWindow)
     def setupUi(self, MainWindow):
         screen = QtWidgets.QApplication.primaryScreen().availableGeometry()
@@ -42,13 +44,18 @@ class OriginalImageWindow(QtWidgets.QMainWindow):  # Now this is a proper window
         super().__init__()
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
-        self.image_path = image_path
+        self.image_path = None
+        self.image = None
         if image_path:
             self.set_image_path(image_path)
 
     def set_image_path(self, image_path):
         """Sets the image and updates the UI."""
+        # Held in the shared image store while shown, so resizing never decodes it again
+        if self.image_path:
+            release_image(self.image_path)
         self.image_path = image_path
+        self.image = acquire_image(image_path) if image_path else None
         self.update_image()
 
     def update_image(self):
@@ -60,7 +67,7 @@ class OriginalImageWindow(QtWidgets.QMainWindow):  # Now this is a proper window
         it displays the image at its original size to avoid quality degradation.
         """
         if hasattr(self, 'image_path') and self.image_path:
-            pixmap = QtGui.QPixmap(self.image_path)
+            pixmap = QtGui.QPixmap.fromImage(self.image) if self.image is not None else QtGui.QPixmap()
             if not pixmap.isNull():
                 target_width = self.ui.label.width()
                 target_height = self.ui.label.height()
@@ -87,3 +94,10 @@ class OriginalImageWindow(QtWidgets.QMainWindow):  # Now this is a proper window
         self.ui.label.setGeometry(0, 0, self.ui.centralwidget.width(), self.ui.centralwidget.height())
         self.update_image()
         super().resizeEvent(event)
+
+    def closeEvent(self, event):
+        if self.image_path:
+            release_image(self.image_path)
+            self.image_path = None
+            self.image = None
+        super().closeEvent(event)
@@ -0,0 +1,262 @@
+"""Typed store of the annotations of one image.
+
+Boxes, classes, confidences, check state and polygon vertices used to live
+as ``setProperty`` values on QCheckBoxes, so every redraw, copy, edit and
+report walked widget trees with ``findChild``.  They now live here, in
+compact arrays: one NumPy structured row per annotation (``BOX_DTYPE``) and
+the vertices of every polygon / freehand stroke in one flat float32 array.
+Annotations are looked up by id in O(1).
+
+The store is shared by the main window (the detections of the upper list
+and the inspector's annotations in the lower one), ``BoundingBoxDisplay``,
+the edit window (``PaintApp`` edits a copy and hands it back on save) and
+``generate_report``.  Widgets are views over it: they listen to ``reset``
+(rows added, removed or replaced) and ``changed`` (fields of existing rows,
+e.g. the check state, with the ids concerned).
+"""
+import numpy as np
+from PyQt5 import QtCore
+
+# Same order as DefectDetector.class_names; class_id indexes it, -1 means none
+CLASS_NAMES = ['crack', 'lof', 'lop', 'overlap', 'porosity', 'slag', 'spattering', 'undercut']
+SHAPE_TYPES = ('rectangle', 'circle', 'polygon', 'freehand')
+
+BOX_DTYPE = np.dtype([
+    ('id', np.int64),
+    ('number', np.int32),        # "Box: n" shown in the lists
+    ('x', np.float32),           # bounding rectangle; the shape itself for rectangles and circles
+    ('y', np.float32),
+    ('w', np.float32),
+    ('h', np.float32),
+    ('confidence', np.float32),  # NaN for manual annotations
+    ('class_id', np.int16),
+    ('shape', np.uint8),         # index into SHAPE_TYPES
+    ('checked', np.bool_),
+    ('manual', np.bool_),
+    ('point_start', np.int64),   # first vertex in AnnotationStore.points (vertex index, not float index)
+    ('point_count', np.int32),
+])
+
+
+def class_id(defect_class):
+    """CLASS_NAMES index of a class name or id; -1 if unknown."""
+    if defect_class is None:
+        return -1
+    if isinstance(defect_class, str):
+        name = defect_class.strip().lower()
+        return CLASS_NAMES.index(name) if name in CLASS_NAMES else -1
+    try:
+        return int(defect_class)
+    except (TypeError, ValueError):
+        return -1
+
+
+def as_vertices(points):
+    """(N, 2) float32 array from QPointFs, (x, y) pairs or an array."""
+    if points is None:
+        return np.zeros((0, 2), np.float32)
+    points = list(points) if not isinstance(points, np.ndarray) else points
+    if len(points) and hasattr(points[0], 'x'):
+        points = [(p.x(), p.y()) for p in points]
+    return np.asarray(points, dtype=np.float32).reshape(-1, 2)
+
+
+class Annotation:
+    """Read-only snapshot of one row, for code that handles annotations one at a time."""
+
+    def __init__(self, record, vertices):
+        self.id = int(record['id'])
+        self.number = int(record['number'])
+        self.shape_type = SHAPE_TYPES[record['shape']]
+        # Rectangles and circles have a bbox (x, y, w, h); polygons and strokes have points
+        if self.shape_type in ('rectangle', 'circle'):
+            self.bbox = (float(record['x']), float(record['y']), float(record['w']), float(record['h']))
+            self.points = None
+        else:
+            self.bbox = None
+            self.points = vertices
+        cid = int(record['class_id'])
+        self.class_id = cid
+        self.defect_class = CLASS_NAMES[cid] if 0 <= cid < len(CLASS_NAMES) else ''
+        confidence = float(record['confidence'])
+        self.confidence = None if np.isnan(confidence) else confidence
+        self.checked = bool(record['checked'])
+        self.manual = bool(record['manual'])
+
+    @property
+    def text(self):
+        return f"Box: {self.number}"
+
+
+class AnnotationStore(QtCore.QObject):
+    reset = QtCore.pyqtSignal()          # rows added, removed or replaced
+    changed = QtCore.pyqtSignal(object)  # list of ids whose fields changed
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.boxes = np.zeros(0, dtype=BOX_DTYPE)
+        self.points = np.zeros((0, 2), dtype=np.float32)
+        self._rows = {}  # id -> row
+        self._next_id = 1
+
+    # ----- lookup -----
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __iter__(self):
+        for row in range(len(self.boxes)):
+            yield self.at(row)
+
+    def __contains__(self, ann_id):
+        return ann_id in self._rows
+
+    def row(self, ann_id):
+        return self._rows[ann_id]
+
+    def id_at(self, row):
+        return int(self.boxes['id'][row])
+
+    def ids(self):
+        return self.boxes['id'].tolist()
+
+    def vertices(self, row):
+        start, count = self.boxes['point_start'][row], self.boxes['point_count'][row]
+        return self.points[start:start + count]
+
+    def at(self, row):
+        return Annotation(self.boxes[row], self.vertices(row))
+
+    def get(self, ann_id):
+        return self.at(self._rows[ann_id])
+
+    def checked_rows(self):
+        """Structured rows of the checked annotations (a copy)."""
+        return self.boxes[self.boxes['checked']]
+
+    def all_checked(self):
+        return len(self.boxes) > 0 and bool(self.boxes['checked'].all())
+
+    # ----- building -----
+
+    def _set_arrays(self, boxes, points):
+        self.boxes = boxes
+        self.points = points
+        self._rows = dict(zip(boxes['id'].tolist(), range(len(boxes))))
+        if len(boxes):
+            self._next_id = max(self._next_id, int(boxes['id'].max()) + 1)
+        self.reset.emit()
+
+    def _new_ids(self, count):
+        ids = np.arange(self._next_id, self._next_id + count, dtype=np.int64)
+        self._next_id += count
+        return ids
+
+    def set_detections(self, boxes_xywh, confidences, class_ids):
+        """Replaces every row with model detections (unchecked rectangles numbered 1..n)."""
+        boxes_xywh = np.asarray(boxes_xywh, dtype=np.float32).reshape(-1, 4)
+        n = len(boxes_xywh)
+        boxes = np.zeros(n, dtype=BOX_DTYPE)
+        boxes['id'] = self._new_ids(n)
+        boxes['number'] = np.arange(1, n + 1)
+        boxes['x'], boxes['y'], boxes['w'], boxes['h'] = boxes_xywh.T
+        boxes['confidence'] = np.asarray(confidences, dtype=np.float32).reshape(-1)[:n]
+        boxes['class_id'] = np.asarray(class_ids, dtype=np.float32).reshape(-1)[:n]
+        self._set_arrays(boxes, np.zeros((0, 2), dtype=np.float32))
+
+    def extend(self, records):
+        """Appends annotations given as dicts with the keys of ``add``; returns their ids."""
+        records = list(records)
+        boxes = np.zeros(len(records), dtype=BOX_DTYPE)
+        boxes['id'] = ids = self._new_ids(len(records))
+        new_points = []
+        offset = len(self.points)
+        # After the highest number in use, which need not be len() once rows were copied or removed
+        first_number = int(self.boxes['number'].max()) + 1 if len(self.boxes) else 1
+        for i, (row, record) in enumerate(zip(boxes, records)):
+            shape_type = record.get('shape_type') or 'rectangle'
+            row['shape'] = SHAPE_TYPES.index(shape_type)
+            row['number'] = record.get('number') or first_number + i
+            row['class_id'] = class_id(record.get('defect_class'))
+            confidence = record.get('confidence')
+            row['confidence'] = confidence if isinstance(confidence, (int, float, np.floating)) else np.nan
+            row['checked'] = bool(record.get('checked', False))
+            row['manual'] = bool(record.get('manual', False))
+            if shape_type in ('rectangle', 'circle'):
+                row['x'], row['y'], row['w'], row['h'] = record.get('bbox') or (0, 0, 0, 0)
+            else:
+                vertices = as_vertices(record.get('points'))
+                row['point_start'], row['point_count'] = offset, len(vertices)
+                offset += len(vertices)
+                new_points.append(vertices)
+                if len(vertices):
+                    (x0, y0), (x1, y1) = vertices.min(axis=0), vertices.max(axis=0)
+                    row['x'], row['y'], row['w'], row['h'] = x0, y0, x1 - x0, y1 - y0
+        points = np.concatenate([self.points] + new_points) if new_points else self.points
+        self._set_arrays(np.concatenate([self.boxes, boxes]), points)
+        return ids.tolist()
+
+    def add(self, shape_type='rectangle', bbox=None, points=None, defect_class=None, confidence=None,
+            checked=True, manual=True, number=None):
+        """Appends one annotation; returns its id."""
+        return self.extend([{
+            'shape_type': shape_type, 'bbox': bbox, 'points': points, 'defect_class': defect_class,
+            'confidence': confidence, 'checked': checked, 'manual': manual, 'number': number,
+        }])[0]
+
+    def _keep(self, mask):
+        boxes = self.boxes[mask]
+        # Vertices of the removed shapes are dropped too
+        polygons = np.flatnonzero(boxes['point_count'])
+        chunks = []
+        offset = 0
+        for row in polygons:
+            start, count = boxes['point_start'][row], boxes['point_count'][row]
+            chunks.append(self.points[start:start + count])
+            boxes['point_start'][row] = offset
+            offset += count
+        points = np.concatenate(chunks) if chunks else np.zeros((0, 2), dtype=np.float32)
+        self._set_arrays(boxes, points)
+
+    def remove(self, ids):
+        self._keep(~np.isin(self.boxes['id'], np.asarray(list(ids), dtype=np.int64)))
+
+    def remove_unchecked(self):
+        if not self.boxes['checked'].all():
+            self._keep(self.boxes['checked'])
+
+    def clear(self):
+        self._set_arrays(np.zeros(0, dtype=BOX_DTYPE), np.zeros((0, 2), dtype=np.float32))
+
+    def copy_from(self, other, checked_only=False, checked=None):
+        """Replaces every row with (the checked) rows of ``other``, optionally (un)checking them all."""
+        boxes = other.boxes[other.boxes['checked']] if checked_only else other.boxes.copy()
+        if checked is not None:
+            boxes['checked'] = checked
+        self.boxes = boxes
+        self.points = other.points
+        self._keep(np.ones(len(boxes), dtype=bool))
+
+    def copy(self):
+        store = AnnotationStore()
+        store.copy_from(self)
+        return store
+
+    # ----- editing fields -----
+
+    def set_checked(self, ann_id, checked):
+        row = self._rows[ann_id]
+        if self.boxes['checked'][row] != checked:
+            self.boxes['checked'][row] = checked
+            self.changed.emit([ann_id])
+
+    def set_all_checked(self, checked=True):
+        if len(self.boxes):
+            self.boxes['checked'] = checked
+            self.changed.emit(self.ids())
+
+    def renumber(self):
+        """Numbers the rows 1..n in order, e.g. after one was erased."""
+        if len(self.boxes):
+            self.boxes['number'] = np.arange(1, len(self.boxes) + 1)
+            self.changed.emit(self.ids())
@@ -0,0 +1,206 @@
+"""Persistent, content-addressed cache of detection results.
+
+Reopening a folder that was already inspected used to run the model on every
+image again.  Results are stored in SQLite keyed by a hash of the image
+bytes, a hash of the weight file, the model name and the inference
+parameters, so a hit is only possible for exactly the same pixels, weights
+and settings.  Replacing ``best.pt`` or ``porosity_model.pt`` (or their ONNX
+exports, when that backend is selected) changes the weights hash and the old
+rows simply stop matching; ``prune_stale`` (or
+``python -m utils.detection_cache --prune``) deletes them.
+
+The database is kept under ``max_bytes`` by evicting least recently used rows.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from models.weights import ACTIVE_WEIGHTS
+
+DEFAULT_CACHE_DIR = os.environ.get("DRDO_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "drdo"))
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    key          TEXT PRIMARY KEY,
+    model        TEXT NOT NULL,
+    weights_hash TEXT NOT NULL,
+    width        INTEGER,
+    height       INTEGER,
+    bbox         BLOB NOT NULL,
+    confidence   BLOB NOT NULL,
+    classes      BLOB NOT NULL,
+    nbytes       INTEGER NOT NULL,
+    last_used    REAL NOT NULL,
+    stage        TEXT
+);
+CREATE INDEX IF NOT EXISTS detections_last_used ON detections (last_used);
+"""
+
+# (path, mtime, size) -> sha256, so unchanged files are only hashed once per process
+_file_hashes = {}
+_file_hashes_lock = threading.Lock()
+
+
+def file_hash(path):
+    """sha256 of a file's bytes, memoised on (path, mtime, size). None if missing."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    memo_key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    with _file_hashes_lock:
+        digest = _file_hashes.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with _file_hashes_lock:
+            _file_hashes[memo_key] = digest
+    return digest
+
+
+class DetectionCache:
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES, weights=ACTIVE_WEIGHTS):
+        if path is None:
+            os.makedirs(DEFAULT_CACHE_DIR, exist_ok=True)
+            path = os.path.join(DEFAULT_CACHE_DIR, "detections.sqlite")
+        self.path = path
+        self.max_bytes = max_bytes
+        self.weights = weights
+        self._lock = threading.Lock()
+        # Used from the GUI thread and from worker threads, always under _lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        # Caches created before cascaded inference have no stage column
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(detections)")]
+        if "stage" not in columns:
+            self._conn.execute("ALTER TABLE detections ADD COLUMN stage TEXT")
+
+    def weights_hash(self, model_name):
+        weight_path = self.weights.get(model_name)
+        if isinstance(weight_path, (tuple, list)):
+            # An ensemble: one hash over the weights of all its members
+            hashes = [file_hash(path) for path in weight_path]
+            return None if None in hashes else hashlib.sha256("\0".join(hashes).encode("utf-8")).hexdigest()
+        return file_hash(weight_path) if weight_path else None
+
+    def make_key(self, image_path, model_name, params=None):
+        """Returns (key, weights_hash), or (None, None) if either file cannot be hashed."""
+        image_hash = file_hash(image_path)
+        weights_hash = self.weights_hash(model_name)
+        if image_hash is None or weights_hash is None:
+            return None, None
+        key_src = json.dumps([image_hash, weights_hash, model_name, params or {}], sort_keys=True)
+        return hashlib.sha256(key_src.encode("utf-8")).hexdigest(), weights_hash
+
+    def get(self, image_path, model_name, params=None):
+        """Returns a dict with bbox (N, 4 xyxy), confidence, classes, width, height, stage; or None."""
+        key, _ = self.make_key(image_path, model_name, params)
+        if key is None:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT width, height, bbox, confidence, classes, stage FROM detections WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE detections SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        width, height, bbox, confidence, classes, stage = row
+        return {
+            "width": width,
+            "height": height,
+            "bbox": np.frombuffer(bbox, dtype=np.float32).reshape(-1, 4),
+            "confidence": np.frombuffer(confidence, dtype=np.float32),
+            "classes": np.frombuffer(classes, dtype=np.float32),
+            "stage": stage,
+        }
+
+    def put(self, image_path, model_name, params, bbox, confidence, classes, width=None, height=None, stage=None):
+        """Stores a result; ``stage`` is what a cascaded detection did (models/cascade.py), None otherwise."""
+        key, weights_hash = self.make_key(image_path, model_name, params)
+        if key is None:
+            return
+        bbox = np.asarray(bbox, dtype=np.float32).reshape(-1, 4).tobytes()
+        confidence = np.asarray(confidence, dtype=np.float32).reshape(-1).tobytes()
+        classes = np.asarray(classes, dtype=np.float32).reshape(-1).tobytes()
+        nbytes = len(key) + len(bbox) + len(confidence) + len(classes)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO detections (key, model, weights_hash, width, height, bbox, confidence, "
+                "classes, nbytes, last_used, stage) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, model_name, weights_hash, width, height, bbox, confidence, classes, nbytes, time.time(), stage),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM detections").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop the least recently used rows until we are back under budget
+        excess = total - self.max_bytes
+        freed = 0
+        stale = []
+        for key, nbytes in self._conn.execute("SELECT key, nbytes FROM detections ORDER BY last_used"):
+            stale.append((key,))
+            freed += nbytes
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM detections WHERE key = ?", stale)
+
+    def invalidate(self, model_name=None):
+        """Drops every cached result, or only those of ``model_name``."""
+        with self._lock:
+            if model_name is None:
+                self._conn.execute("DELETE FROM detections")
+            else:
+                self._conn.execute("DELETE FROM detections WHERE model = ?", (model_name,))
+            self._conn.commit()
+
+    def prune_stale(self):
+        """Drops results computed with weights that are no longer on disk. Returns the row count."""
+        removed = 0
+        with self._lock:
+            for model_name in self.weights:
+                weights_hash = self.weights_hash(model_name)
+                if weights_hash is None:
+                    continue
+                cur = self._conn.execute(
+                    "DELETE FROM detections WHERE model = ? AND weights_hash != ?", (model_name, weights_hash)
+                )
+                removed += cur.rowcount
+            self._conn.commit()
+        return removed
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the detection result cache.")
+    parser.add_argument("--path", help="Cache database (default: %(default)s)",
+                        default=os.path.join(DEFAULT_CACHE_DIR, "detections.sqlite"))
+    parser.add_argument("--prune", action="store_true", help="Drop results of replaced weight files")
+    parser.add_argument("--clear", nargs="?", const="__all__", metavar="MODEL",
+                        help="Drop all results, or only those of MODEL")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.path)), exist_ok=True)
+    cache = DetectionCache(args.path)
+    if args.clear:
+        cache.invalidate(None if args.clear == "__all__" else args.clear)
+        print("Cache cleared.")
+    if args.prune:
+        print(f"Removed {cache.prune_stale()} stale results.")
+    cache.close()
@@ -0,0 +1,239 @@
+"""Model/view list of detections for the right-hand panels.
+
+The bounding-box panels used to hold one QWidget + QCheckBox + rich-text
+QLabel per detection, which took seconds to build for porosity-heavy plates.
+They are now QListViews over ``DetectionListModel``, a thin view of an
+``AnnotationStore`` (utils/annotations.py): the check state lives in the
+store, and ``DetectionDelegate`` paints only the rows that are visible.
+"""
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+# Annotation of an index, for code that needs more than the display text
+ItemRole = QtCore.Qt.UserRole + 1
+
+
+class DetectionListModel(QtCore.QAbstractListModel):
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        # Shown as a single non-checkable row while the store is empty
+        self.message = None
+        store.reset.connect(self._store_reset)
+        store.changed.connect(self._store_changed)
+
+    # ----- Qt model interface -----
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.store) if len(self.store) else int(self.message is not None)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if self.is_message():
+            return self.message if role == QtCore.Qt.DisplayRole else None
+        if role == QtCore.Qt.DisplayRole:
+            return f"Box: {int(self.store.boxes['number'][index.row()])}"
+        if role == QtCore.Qt.CheckStateRole:
+            return QtCore.Qt.Checked if self.store.boxes['checked'][index.row()] else QtCore.Qt.Unchecked
+        if role == ItemRole:
+            return self.store.at(index.row())
+        return None
+
+    def setData(self, index, value, role=QtCore.Qt.EditRole):
+        if not index.isValid() or role != QtCore.Qt.CheckStateRole or not len(self.store):
+            return False
+        # The store's changed signal updates this row (and every other view)
+        self.store.set_checked(self.store.id_at(index.row()), value == QtCore.Qt.Checked)
+        return True
+
+    def flags(self, index):
+        if not index.isValid() or not len(self.store):
+            return QtCore.Qt.ItemIsEnabled
+        return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsUserCheckable
+
+    # ----- store notifications -----
+
+    def _store_reset(self):
+        self.beginResetModel()
+        self.endResetModel()
+
+    def _store_changed(self, ids):
+        rows = [self.store.row(ann_id) for ann_id in ids if ann_id in self.store]
+        if rows:
+            self.dataChanged.emit(self.index(min(rows)), self.index(max(rows)))
+
+    # ----- helpers -----
+
+    def is_message(self):
+        return not len(self.store) and self.message is not None
+
+    def set_message(self, text):
+        """Text (rich text) shown while the store is empty; None for none."""
+        self.beginResetModel()
+        self.message = text
+        self.endResetModel()
+
+
+class DetectionDelegate(QtWidgets.QStyledItemDelegate):
+    """Paints a row as the old panels did: a "Box: n" checkbox over labelled lines."""
+
+    PADDING = 5
+    FONT_PX = 14
+    HEADER_PX = 16
+
+    def __init__(self, parent=None, header_color="red", label_color="blue"):
+        super().__init__(parent)
+        self.header_color = QtGui.QColor(header_color)
+        self.label_color = QtGui.QColor(label_color)
+
+    # ----- row content -----
+
+    @staticmethod
+    def lines(annotation):
+        """(label, value) pairs shown under the checkbox of an Annotation."""
+        confidence = annotation.confidence
+        lines = [("Model:", "Manual Addition")] if annotation.manual else []
+        lines += [
+            ("Type of Defect:", annotation.defect_class),
+            ("Confidence:", f"{confidence:.2f}" if confidence is not None else "-"),
+        ]
+        if annotation.bbox is not None:
+            lines.extend(zip(("x:", "y:", "w:", "h:"), (f"{v:g}" for v in annotation.bbox)))
+        elif annotation.points is not None and len(annotation.points):
+            coords = [f"({int(x)},{int(y)})" for x, y in annotation.points.tolist()]
+            lines.append((f"{annotation.shape_type.capitalize()}:", ""))
+            lines.extend(("", ", ".join(coords[i:i + 4])) for i in range(0, len(coords), 4))
+        else:
+            lines.append(("No coordinates", ""))
+        return lines
+
+    def _fonts(self, option):
+        font = QtGui.QFont(option.font)
+        font.setPixelSize(self.FONT_PX)
+        bold = QtGui.QFont(font)
+        bold.setBold(True)
+        header = QtGui.QFont(font)
+        header.setPixelSize(self.HEADER_PX)
+        return font, bold, header
+
+    def _indicator_size(self, option):
+        style = option.widget.style() if option.widget else QtWidgets.QApplication.style()
+        return QtCore.QSize(style.pixelMetric(QtWidgets.QStyle.PM_IndicatorWidth, None, option.widget),
+                            style.pixelMetric(QtWidgets.QStyle.PM_IndicatorHeight, None, option.widget))
+
+    def _header_rect(self, option):
+        font, _, header = self._fonts(option)
+        height = max(self._indicator_size(option).height(), QtGui.QFontMetrics(header).height())
+        rect = option.rect.adjusted(self.PADDING, self.PADDING, -self.PADDING, 0)
+        rect.setHeight(height)
+        return rect
+
+    def _message_document(self, text, option, width):
+        document = QtGui.QTextDocument()
+        document.setDefaultFont(self._fonts(option)[0])
+        document.setHtml(text)
+        document.setTextWidth(max(width - 2 * self.PADDING, 50))
+        return document
+
+    def _view_width(self, option):
+        widget = option.widget
+        if option.rect.width() > 0:
+            return option.rect.width()
+        return widget.viewport().width() if isinstance(widget, QtWidgets.QAbstractScrollArea) else 200
+
+    # ----- QStyledItemDelegate -----
+
+    def sizeHint(self, option, index):
+        model = index.model()
+        width = self._view_width(option)
+        if model.is_message():
+            document = self._message_document(index.data(), option, width)
+            return QtCore.QSize(width, int(document.size().height()) + 2 * self.PADDING)
+        font, _, _ = self._fonts(option)
+        line_height = QtGui.QFontMetrics(font).lineSpacing()
+        lines = len(self.lines(index.data(ItemRole)))
+        return QtCore.QSize(width, self._header_rect(option).height() + lines * line_height + 3 * self.PADDING)
+
+    def paint(self, painter, option, index):
+        model = index.model()
+        painter.save()
+        if model.is_message():
+            document = self._message_document(index.data(), option, option.rect.width())
+            painter.translate(option.rect.left() + self.PADDING, option.rect.top() + self.PADDING)
+            context = QtGui.QAbstractTextDocumentLayout.PaintContext()
+            context.palette.setColor(QtGui.QPalette.Text, option.palette.color(QtGui.QPalette.Text))
+            document.documentLayout().draw(painter, context)
+            painter.restore()
+            return
+
+        item = index.data(ItemRole)
+        font, bold, header = self._fonts(option)
+        if option.state & QtWidgets.QStyle.State_Selected:
+            painter.fillRect(option.rect, option.palette.color(QtGui.QPalette.Highlight).lighter(170))
+        painter.setPen(option.palette.color(QtGui.QPalette.Mid))
+        painter.drawLine(option.rect.bottomLeft(), option.rect.bottomRight())
+
+        # Checkbox and "Box: n"
+        header_rect = self._header_rect(option)
+        indicator = self._indicator_size(option)
+        check = QtWidgets.QStyleOptionButton()
+        check.rect = QtCore.QRect(header_rect.left(), header_rect.top() + (header_rect.height() - indicator.height()) // 2,
+                                  indicator.width(), indicator.height())
+        check.state = QtWidgets.QStyle.State_Enabled | (
+            QtWidgets.QStyle.State_On if item.checked else QtWidgets.QStyle.State_Off)
+        style = option.widget.style() if option.widget else QtWidgets.QApplication.style()
+        style.drawPrimitive(QtWidgets.QStyle.PE_IndicatorCheckBox, check, painter, option.widget)
+        painter.setFont(header)
+        painter.setPen(self.header_color)
+        text_rect = header_rect.adjusted(indicator.width() + self.PADDING, 0, 0, 0)
+        painter.drawText(text_rect, QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter, index.data())
+
+        # Labelled lines
+        line_height = QtGui.QFontMetrics(font).lineSpacing()
+        ascent = QtGui.QFontMetrics(font).ascent()
+        x = option.rect.left() + self.PADDING
+        y = header_rect.bottom() + self.PADDING + ascent
+        text_color = option.palette.color(QtGui.QPalette.Text)
+        for label, value in self.lines(item):
+            offset = 0
+            if label:
+                painter.setFont(bold)
+                painter.setPen(self.label_color)
+                painter.drawText(x, y, label)
+                offset = QtGui.QFontMetrics(bold).horizontalAdvance(label + " ")
+            painter.setFont(font)
+            painter.setPen(text_color)
+            painter.drawText(x + offset, y, value)
+            y += line_height
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        # Clicking the checkbox or "Box: n" toggles the row, like the old QCheckBox
+        if not index.flags() & QtCore.Qt.ItemIsUserCheckable:
+            return False
+        toggle = False
+        if event.type() in (QtCore.QEvent.MouseButtonPress, QtCore.QEvent.MouseButtonDblClick):
+            return event.button() == QtCore.Qt.LeftButton and self._header_rect(option).contains(event.pos())
+        if event.type() == QtCore.QEvent.MouseButtonRelease:
+            toggle = event.button() == QtCore.Qt.LeftButton and self._header_rect(option).contains(event.pos())
+        elif event.type() == QtCore.QEvent.KeyPress:
+            toggle = event.key() in (QtCore.Qt.Key_Space, QtCore.Qt.Key_Select)
+        if not toggle:
+            return False
+        checked = index.data(QtCore.Qt.CheckStateRole) == QtCore.Qt.Checked
+        return model.setData(index, QtCore.Qt.Unchecked if checked else QtCore.Qt.Checked, QtCore.Qt.CheckStateRole)
+
+
+def setup_detection_view(view, model, uniform_rows=False):
+    """Puts ``model`` with a DetectionDelegate on ``view`` (a QListView)."""
+    view.setModel(model)
+    view.setItemDelegate(DetectionDelegate(view))
+    view.setVerticalScrollMode(QtWidgets.QAbstractItemView.ScrollPerPixel)
+    view.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+    view.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
+    # Row heights are then measured once, not per row (all rows of the upper list look alike)
+    view.setUniformItemSizes(uniform_rows)
+    view.setLayoutMode(QtWidgets.QListView.Batched)
+    view.setResizeMode(QtWidgets.QListView.Adjust)
@@ -0,0 +1,289 @@
+"""Virtualized image gallery for the left-hand column.
+
+The gallery used to list a folder with ``os.listdir`` on the GUI thread and
+append one QLabel per image to a scroll area whenever the scrollbar reached
+the bottom; the labels were never released, so memory grew with every page
+scrolled.  It is now a ``GalleryView`` (a QListView in icon mode) over a
+``GalleryModel`` that holds only paths: ``DirectoryScanner`` streams them in
+from ``os.scandir`` on a worker thread (optionally recursing into
+subfolders), and the view asks for thumbnails of the rows on screen plus a
+small margin once scrolling settles.  The model keeps a bounded number of
+thumbnails; rows scrolled far away fall back to their name and are decoded
+again (from the disk cache) when they come back into view.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from utils.thumbnails import THUMBNAIL_SIDE
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tif', '.tiff')
+
+# Path of an index
+PathRole = QtCore.Qt.UserRole + 1
+
+# Thumbnails kept by the model (least recently shown dropped first)
+MAX_THUMBNAILS = 256
+# Rows above and below the viewport whose thumbnails are also requested
+MARGIN_ROWS = 2
+
+
+def is_image(filename):
+    return filename.lower().endswith(IMAGE_EXTENSIONS)
+
+
+class DirectoryScanner(QtCore.QObject):
+    """Lists image files on a worker thread; ``found`` and ``finished`` are delivered on the GUI thread.
+
+    Each scan gets a new number, passed with every signal, so that results of
+    a cancelled or superseded scan can be told apart and ignored.
+    """
+
+    found = QtCore.pyqtSignal(int, list)   # scan number, batch of image paths
+    finished = QtCore.pyqtSignal(int, int)  # scan number, images found
+
+    # The first batch goes out quickly so the gallery fills at once; later ones are larger
+    FIRST_BATCH = 64
+    BATCH = 2048
+    BATCH_INTERVAL_S = 0.1
+
+    def __init__(self):
+        super().__init__()
+        self._scan = 0
+
+    def scan(self, folder, recursive=False):
+        """Starts listing ``folder`` (and its subfolders if ``recursive``); returns the scan number."""
+        self._scan += 1
+        threading.Thread(target=self._run, args=(folder, recursive, self._scan), daemon=True,
+                         name="gallery-scan").start()
+        return self._scan
+
+    def cancel(self):
+        self._scan += 1
+
+    def _run(self, folder, recursive, scan):
+        batch = []
+        limit = self.FIRST_BATCH
+        last_emit = time.monotonic()
+        total = 0
+        folders = [folder]
+        while folders and scan == self._scan:
+            subfolders = []
+            try:
+                with os.scandir(folders.pop()) as entries:
+                    for entry in entries:
+                        if scan != self._scan:
+                            return
+                        try:
+                            if entry.is_file() and is_image(entry.name):
+                                batch.append(entry.path)
+                            elif recursive and entry.is_dir(follow_symlinks=False):
+                                subfolders.append(entry.path)
+                        except OSError:
+                            continue
+                        if len(batch) >= limit or (batch and time.monotonic() - last_emit > self.BATCH_INTERVAL_S):
+                            total += len(batch)
+                            self.found.emit(scan, batch)
+                            batch = []
+                            limit = self.BATCH
+                            last_emit = time.monotonic()
+            except OSError as e:
+                print(f"Could not list {e.filename}:", e.strerror)
+            # Depth first, subfolders in name order
+            folders.extend(sorted(subfolders, reverse=True))
+        if scan != self._scan:
+            return
+        if batch:
+            total += len(batch)
+            self.found.emit(scan, batch)
+        self.finished.emit(scan, total)
+
+
+class GalleryModel(QtCore.QAbstractListModel):
+    """Image paths of the gallery, with the thumbnails of the rows recently on screen."""
+
+    def __init__(self, parent=None, max_thumbnails=MAX_THUMBNAILS):
+        super().__init__(parent)
+        self.paths = []
+        self._rows = {}  # path -> row
+        self.max_thumbnails = max_thumbnails
+        self._thumbnails = OrderedDict()  # path -> QIcon
+        self._unreadable = set()
+        self._marks = {}  # path -> note shown after the name, e.g. "screened clean"
+        # Blank icon of rows without a thumbnail, so that every row has the size of a loaded one
+        blank = QtGui.QPixmap(THUMBNAIL_SIDE, THUMBNAIL_SIDE)
+        blank.fill(QtCore.Qt.transparent)
+        self._placeholder = QtGui.QIcon(blank)
+
+    # ----- Qt model interface -----
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.paths)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        path = self.paths[index.row()]
+        if role == QtCore.Qt.DisplayRole:
+            name = os.path.basename(path)
+            if path in self._unreadable:
+                return f"{name} (unreadable)"
+            mark = self._marks.get(path)
+            return f"{name} ({mark})" if mark else name
+        if role == QtCore.Qt.DecorationRole:
+            return self._thumbnails.get(path, self._placeholder)
+        if role in (QtCore.Qt.ToolTipRole, PathRole):
+            return path
+        return None
+
+    # ----- paths -----
+
+    def append(self, paths):
+        paths = [path for path in paths if path not in self._rows]
+        if not paths:
+            return
+        first = len(self.paths)
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(paths) - 1)
+        self.paths.extend(paths)
+        self._rows.update(zip(paths, range(first, first + len(paths))))
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.paths = []
+        self._rows = {}
+        self._thumbnails.clear()
+        self._unreadable.clear()
+        self._marks.clear()
+        self.endResetModel()
+
+    def row_of(self, path):
+        """Row of ``path``; -1 if it is not in the gallery."""
+        return self._rows.get(path, -1)
+
+    def __contains__(self, path):
+        return path in self._rows
+
+    def set_mark(self, path, mark):
+        """Shows ``mark`` after the name of ``path`` (None to remove it)."""
+        row = self._rows.get(path)
+        if row is None or self._marks.get(path) == mark:
+            return
+        if mark:
+            self._marks[path] = mark
+        else:
+            self._marks.pop(path, None)
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [QtCore.Qt.DisplayRole])
+
+    # ----- thumbnails -----
+
+    def missing(self, first, last):
+        """Paths of rows first..last (inclusive) that have no thumbnail yet."""
+        last = min(last, len(self.paths) - 1)
+        return [path for path in self.paths[max(first, 0):last + 1]
+                if path not in self._thumbnails and path not in self._unreadable]
+
+    def set_thumbnail(self, path, image):
+        """Shows ``image`` (QImage; null if unreadable) for ``path``."""
+        row = self._rows.get(path)
+        if row is None:
+            return
+        if image.isNull():
+            self._unreadable.add(path)
+        else:
+            self._thumbnails[path] = QtGui.QIcon(QtGui.QPixmap.fromImage(image))
+            self._thumbnails.move_to_end(path)
+            while len(self._thumbnails) > self.max_thumbnails:
+                evicted, _ = self._thumbnails.popitem(last=False)
+                evicted_row = self._rows.get(evicted)
+                if evicted_row is not None:
+                    index = self.index(evicted_row)
+                    self.dataChanged.emit(index, index, [QtCore.Qt.DecorationRole])
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [QtCore.Qt.DisplayRole, QtCore.Qt.DecorationRole])
+
+
+class GalleryView(QtWidgets.QListView):
+    """Icon-mode list of thumbnails laid out on a fixed grid.
+
+    ``visibleRangeChanged(first, last)`` reports the rows on screen plus
+    ``MARGIN_ROWS`` grid rows around them, once scrolling, resizing or new
+    rows have settled.
+    """
+
+    visibleRangeChanged = QtCore.pyqtSignal(int, int)
+
+    SETTLE_MS = 30
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setViewMode(QtWidgets.QListView.IconMode)
+        self.setFlow(QtWidgets.QListView.LeftToRight)
+        self.setWrapping(True)
+        self.setResizeMode(QtWidgets.QListView.Adjust)
+        self.setMovement(QtWidgets.QListView.Static)
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QtWidgets.QListView.Batched)
+        self.setBatchSize(1000)
+        self.setVerticalScrollMode(QtWidgets.QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+        self.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
+        self.setTextElideMode(QtCore.Qt.ElideMiddle)
+        self.setWordWrap(False)
+
+        self._settle = QtCore.QTimer(self)
+        self._settle.setSingleShot(True)
+        self._settle.setInterval(self.SETTLE_MS)
+        self._settle.timeout.connect(self._emit_visible_range)
+        self.verticalScrollBar().valueChanged.connect(self._schedule)
+
+    def setModel(self, model):
+        super().setModel(model)
+        model.rowsInserted.connect(self._schedule)
+        model.modelReset.connect(self._schedule)
+
+    def resizeEvent(self, event):
+        self._fit_grid()
+        super().resizeEvent(event)
+        self._schedule()
+
+    def _schedule(self, *args):
+        # Restarted on every change, so a fast scroll asks only for where it stops
+        self._settle.start()
+
+    def _fit_grid(self):
+        # As many THUMBNAIL_SIDE columns as fit, sharing the width; one column in the usual narrow pane
+        width = max(self.viewport().width(), 1)
+        columns = max(1, width // (THUMBNAIL_SIDE + 20))
+        cell = width // columns
+        side = max(cell - 20, 32)
+        text = self.fontMetrics().height()
+        self.setIconSize(QtCore.QSize(side, side))
+        self.setGridSize(QtCore.QSize(cell, side + text + 12))
+
+    def columns(self):
+        grid = self.gridSize()
+        return max(1, self.viewport().width() // grid.width()) if grid.isValid() else 1
+
+    def visible_range(self, margin=MARGIN_ROWS):
+        """(first, last) rows on screen, widened by ``margin`` grid rows; (0, -1) if empty."""
+        model = self.model()
+        count = model.rowCount() if model is not None else 0
+        grid = self.gridSize()
+        if not count or not grid.isValid():
+            return 0, -1
+        columns = self.columns()
+        top = self.verticalScrollBar().value() // grid.height()
+        bottom = (self.verticalScrollBar().value() + self.viewport().height()) // grid.height()
+        first = max(0, (top - margin) * columns)
+        last = min(count - 1, (bottom + margin + 1) * columns - 1)
+        return first, last
+
+    def _emit_visible_range(self):
+        first, last = self.visible_range()
+        if last >= first:
+            self.visibleRangeChanged.emit(first, last)
@@ -8,12 +8,25 @@ from datetime import datetime
 import os
 from PIL import Image as PILImage, ImageDraw, ImageFont
 from io import BytesIO
+from PyQt5.QtGui import QImage
+from utils.image_store import get_image
+
+def _pil_from_store(image_path):
+    """RGB PIL copy of an image decoded once in the shared image store (the app has it already)."""
+    qimage = get_image(image_path)
+    if qimage is None:
+        return PILImage.open(image_path).convert("RGB")
+    qimage = qimage.convertToFormat(QImage.Format_RGB888)
+    bits = qimage.constBits()
+    bits.setsize(qimage.sizeInBytes())
+    return PILImage.frombuffer("RGB", (qimage.width(), qimage.height()), bytes(bits), "raw", "RGB",
+                               qimage.bytesPerLine(), 1)
 
 def generate_pdf_report(
     pdf_path,
     original_image_path,
     detected_image_path,
-    checklist,
+    annotations,
     inspector_name="Inspector Name",
     signature_path=None,
     logo_path="Assets/DRDOLogo.png"
@@ -64,18 +77,19 @@ def generate_pdf_report(
 
     if os.path.exists(original_image_path):
         # det_img = Image(detected_image_path, width=220, height=160)
-        det_img_pil = PILImage.open(detected_image_path).convert("RGB")
+        det_img_pil = _pil_from_store(detected_image_path)
         draw = ImageDraw.Draw(det_img_pil)
         try:
             font = ImageFont.truetype("arial.ttf", 18)
         except:
             font = ImageFont.load_default()
 
-        for item in checklist:
-            defect = item.get("defect_class", "Defect")
-            bbox = item.get("bbox")
-            shape_type = item.get("shape_type")
-            points = item.get("points")
+        # annotations: AnnotationStore (utils/annotations.py)
+        for item in annotations:
+            defect = item.defect_class or "Defect"
+            bbox = item.bbox
+            shape_type = item.shape_type
+            points = item.points
             color = (255, 0, 0)  # Red for defects
 
             if bbox:
@@ -83,8 +97,8 @@ def generate_pdf_report(
                 draw.rectangle([x, y, x + w, y + h], outline=color, width=3)
                 draw.text((x, y - 20), str(defect), fill=color, font=font)
                 
-            elif shape_type in ("polygon", "freehand") and points:
-                pts = [(int(p.x()), int(p.y())) for p in points]
+            elif shape_type in ("polygon", "freehand") and points is not None and len(points):
+                pts = [(int(x), int(y)) for x, y in points.tolist()]
                 if len(pts) > 1:
                     draw.line(pts + [pts[0]], fill=color, width=3)
                 if pts:
@@ -121,21 +135,21 @@ def generate_pdf_report(
     story.append(Paragraph("<b>Detected Defects</b>", styles["Heading3"]))
     story.append(Spacer(1, 10))
 
-    if not checklist:
+    if not len(annotations):
         story.append(Paragraph("No defects detected.", styles["Normal"]))
     else:
         defect_data = [["#", "Defect Type", "Confidence", "Coordinates / Points"]]
-        for idx, item in enumerate(checklist, 1):
-            defect = item.get("defect_class", "Unknown")
-            conf = f"{item.get('confidence', '-'):.2f}" if isinstance(item.get("confidence"), float) else "-"
-            bbox = item.get("bbox")
-            shape_type = item.get("shape_type")
-            points = item.get("points")
+        for idx, item in enumerate(annotations, 1):
+            defect = item.defect_class or "Unknown"
+            conf = f"{item.confidence:.2f}" if item.confidence is not None else "-"
+            bbox = item.bbox
+            shape_type = item.shape_type
+            points = item.points
             if bbox:
                 coord = f"x={bbox[0]}, y={bbox[1]}, w={bbox[2]}, h={bbox[3]}"
                 coord_paragraph = Paragraph(coord, styles["Normal"])
-            elif shape_type in ("polygon", "freehand") and points:
-                pts_list = [f"({int(p.x())},{int(p.y())})" for p in points]
+            elif shape_type in ("polygon", "freehand") and points is not None and len(points):
+                pts_list = [f"({int(x)},{int(y)})" for x, y in points.tolist()]
                 # Wrap every 4 points per line for better readability
                 pts_wrapped = "<br/>".join([", ".join(pts_list[i:i+4]) for i in range(0, len(pts_list), 4)])
                 coord_paragraph = Paragraph(f"Points:<br/>{pts_wrapped}", styles["Normal"])
@@ -185,15 +199,16 @@ def generate_pdf_report(
 
 # --- Example usage for testing ---
 if __name__ == "__main__":
-    checklist = [
-        {"defect_class": "crack", "confidence": 0.92, "bbox": (100, 120, 50, 60)},
-        {"defect_class": "porosity", "confidence": 0.81, "bbox": (200, 220, 40, 30)},
-    ]
+    from utils.annotations import AnnotationStore
+
+    annotations = AnnotationStore()
+    annotations.add(bbox=(100, 120, 50, 60), defect_class="crack", confidence=0.92, manual=False)
+    annotations.add(bbox=(200, 220, 40, 30), defect_class="porosity", confidence=0.81, manual=False)
     generate_pdf_report(
         "welding_defect_report.pdf",
         "Assets/box1.png",
         "Assets/box2.png",
-        checklist,
+        annotations,
         inspector_name= "XYZ",
         signature_path="Assets/signatur.png",
         logo_path="Assets/DRDOLogo.png"
@@ -0,0 +1,187 @@
+"""Process-wide store of decoded images.
+
+Box 1, box 3, the prefetcher, the edit window, the full-size viewers and the
+PDF report each used to decode the same radiograph from disk, which for large
+16-bit TIFFs meant seconds of decoding and one full-resolution copy per
+viewer.  Images are now decoded once and kept here as QImages (usable from
+any thread), keyed by path and file mtime so that an image rewritten on disk
+is decoded again.
+
+Next to the full-resolution image each entry keeps a small pyramid of
+proxies, each half the size of the previous one, built on demand; a viewer
+asking for a box-sized image is scaled from the smallest proxy that is still
+large enough.  Viewers that hold an image for a while ``acquire`` it and
+``release`` it when done; entries nobody holds are evicted least-recently-used
+first once the memory budget is exceeded.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from PyQt5 import QtCore, QtGui
+
+# Default budget, overridable with DRDO_IMAGE_CACHE_MB
+DEFAULT_BUDGET_BYTES = int(os.environ.get("DRDO_IMAGE_CACHE_MB", "512")) * 1024 * 1024
+# Proxies stop once their long side would drop below this
+MIN_PROXY_SIDE = 256
+
+
+class _Entry:
+    def __init__(self, image):
+        self.levels = [image]  # full resolution, then halves
+        self.refs = 0
+
+    @property
+    def nbytes(self):
+        return sum(level.sizeInBytes() for level in self.levels)
+
+
+class ImageStore:
+    def __init__(self, budget_bytes=DEFAULT_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()  # (path, mtime) -> _Entry
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(image_path):
+        path = os.path.abspath(image_path)
+        try:
+            return path, os.path.getmtime(path)
+        except OSError:
+            return None
+
+    def _entry(self, key):
+        """The entry for ``key``, decoding the image on a miss; None if unreadable. Call without the lock."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        # Decoded outside the lock so other images stay available meanwhile
+        image = QtGui.QImage(key[0])
+        if image.isNull():
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:  # decoded by another thread meanwhile
+                return entry
+            # The file was rewritten: drop the stale decode, unless a viewer still
+            # holds it (release() drops it then)
+            for stale in [k for k, e in self._entries.items() if k[0] == key[0] and e.refs == 0]:
+                self._evict(stale)
+            entry = self._entries[key] = _Entry(image)
+            self.total_bytes += entry.nbytes
+            self._trim()
+            return entry
+
+    def _trim(self):
+        # Held entries and the newest one always stay, even over budget
+        for key in list(self._entries)[:-1]:
+            if self.total_bytes <= self.budget_bytes:
+                break
+            if self._entries[key].refs == 0:
+                self._evict(key)
+
+    def _evict(self, key):
+        entry = self._entries.pop(key)
+        self.total_bytes -= entry.nbytes
+
+    def get(self, image_path):
+        """Full-resolution QImage of ``image_path``; None if it cannot be read."""
+        key = self._key(image_path)
+        entry = self._entry(key) if key else None
+        return entry.levels[0] if entry else None
+
+    def proxy(self, image_path, size):
+        """``image_path`` scaled to fit ``size`` (QSize), from the smallest proxy still large enough."""
+        key = self._key(image_path)
+        entry = self._entry(key) if key else None
+        if entry is None:
+            return None
+        image = entry.levels[0]
+        target = image.size().scaled(size, QtCore.Qt.KeepAspectRatio)
+        if target == image.size():
+            return image
+
+        with self._lock:
+            levels = list(entry.levels)
+        # Halved outside the lock (smooth scaling a large plate takes a while), then published under it
+        built = 0
+        while (levels[-1].width() // 2 >= target.width() and levels[-1].height() // 2 >= target.height()
+               and max(levels[-1].width(), levels[-1].height()) // 2 >= MIN_PROXY_SIDE):
+            last = levels[-1]
+            levels.append(last.scaled(last.width() // 2, last.height() // 2, QtCore.Qt.IgnoreAspectRatio,
+                                      QtCore.Qt.SmoothTransformation))
+            built += 1
+        if built:
+            with self._lock:
+                # Another thread may have added the same halvings meanwhile; only the missing ones are kept
+                new = levels[len(entry.levels):]
+                entry.levels.extend(new)
+                if self._entries.get(key) is entry:
+                    self.total_bytes += sum(level.sizeInBytes() for level in new)
+                    self._trim()
+        return levels[-1].scaled(target, QtCore.Qt.IgnoreAspectRatio, QtCore.Qt.SmoothTransformation)
+
+    def acquire(self, image_path):
+        """Like ``get``, but the image stays decoded until ``release``d."""
+        key = self._key(image_path)
+        entry = self._entry(key) if key else None
+        if entry is None:
+            return None
+        with self._lock:
+            entry.refs += 1
+        return entry.levels[0]
+
+    def release(self, image_path):
+        current = self._key(image_path)
+        path = os.path.abspath(image_path)
+        with self._lock:
+            # By path: the file may have changed on disk since it was acquired,
+            # in which case the oldest decode still held is the one being released
+            held = [k for k, entry in self._entries.items() if k[0] == path and entry.refs > 0]
+            if held:
+                key = min(held, key=lambda k: k[1])
+                self._entries[key].refs -= 1
+                if self._entries[key].refs == 0 and key != current:
+                    self._evict(key)
+            self._trim()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def __contains__(self, image_path):
+        return self._key(image_path) in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_store = ImageStore()
+
+
+def get_image(image_path):
+    """Returns the decoded QImage of ``image_path``, decoding it on first use."""
+    return _store.get(image_path)
+
+
+def get_proxy(image_path, size):
+    """Returns ``image_path`` scaled to fit ``size``, without decoding it again."""
+    return _store.proxy(image_path, size)
+
+
+def acquire_image(image_path):
+    return _store.acquire(image_path)
+
+
+def release_image(image_path):
+    _store.release(image_path)
+
+
+def clear_images():
+    _store.clear()
@@ -0,0 +1,215 @@
+"""Central scheduler for every model call made by the GUI.
+
+Jobs get an id, a priority (interactive before prefetch before batch) and an
+optional key (the prediction key of the image they infer) so that the same
+work is never queued twice.  A small pool of threads runs them; one thread
+is always kept free for interactive jobs, and background jobs do not start
+while an interactive one is waiting or running.
+
+Cancellation is cooperative: a pending job is simply dropped, a running job
+sees ``job.cancelled`` become True and may stop at its next checkpoint by
+raising ``JobCancelled``.  All signals are delivered on the GUI thread.
+"""
+import heapq
+import itertools
+import threading
+
+from PyQt5 import QtCore
+
+INTERACTIVE = 0
+PREFETCH = 1
+BATCH = 2
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, job_id, priority, fn, args, kwargs, key=None, kind=None):
+        self.id = job_id
+        self.priority = priority
+        self.key = key
+        # Free-form tag for the signal handlers, e.g. "detect" or "warmup"
+        self.kind = kind
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.state = PENDING
+        self.result = None
+        self.error = None
+        self._cancel = threading.Event()
+        self._scheduler = None
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        """Checkpoint for job functions: raises JobCancelled once the job was cancelled."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def report_progress(self, done, total, message=""):
+        if self._scheduler is not None:
+            self._scheduler.progress.emit(self.id, done, total, message)
+
+
+class JobScheduler(QtCore.QObject):
+    started = QtCore.pyqtSignal(object)  # Job
+    progress = QtCore.pyqtSignal(int, int, int, str)  # job id, done, total, message
+    finished = QtCore.pyqtSignal(object)  # Job, with .result set
+    failed = QtCore.pyqtSignal(object)  # Job, with .error set
+    cancelled = QtCore.pyqtSignal(object)  # Job
+
+    def __init__(self, max_workers=2):
+        super().__init__()
+        self.max_workers = max(1, max_workers)
+        self._heap = []  # (priority, seq, job)
+        self._jobs = {}  # id -> Job, pending or running
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+        self._running_background = 0
+        self._interactive_active = 0
+        self._stopped = False
+        self._cond = threading.Condition()
+        self._threads = [
+            threading.Thread(target=self._loop, name=f"jobs-{i}", daemon=True) for i in range(self.max_workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    # ----- submitting and finding -----
+
+    def submit(self, fn, *args, priority=INTERACTIVE, key=None, kind=None, **kwargs):
+        """Queues ``fn(job, *args, **kwargs)``; returns the job id."""
+        with self._cond:
+            job = Job(next(self._ids), priority, fn, args, kwargs, key, kind)
+            job._scheduler = self
+            self._jobs[job.id] = job
+            heapq.heappush(self._heap, (priority, next(self._seq), job))
+            if priority == INTERACTIVE:
+                self._interactive_active += 1
+            self._cond.notify_all()
+            return job.id
+
+    def find(self, key):
+        """The pending or running job for ``key``, if any."""
+        with self._cond:
+            for job in self._jobs.values():
+                if job.key == key and not job.cancelled:
+                    return job
+        return None
+
+    def promote(self, job_id, priority=INTERACTIVE):
+        """Raises the priority of a pending or running job (e.g. a prefetch the inspector now waits for)."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.priority <= priority:
+                return job is not None
+            if priority == INTERACTIVE:
+                self._interactive_active += 1
+                if job.state == RUNNING:
+                    self._running_background -= 1
+            if job.state == PENDING:
+                # Re-queued at the new priority; the old heap entry is skipped when popped
+                heapq.heappush(self._heap, (priority, next(self._seq), job))
+            job.priority = priority
+            self._cond.notify_all()
+            return True
+
+    # ----- cancelling -----
+
+    def cancel(self, job_id):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            job._cancel.set()
+            if job.state == PENDING:
+                self._finish(job, CANCELLED)
+            return True
+
+    def cancel_where(self, predicate):
+        """Cancels every pending or running job for which ``predicate(job)`` is True."""
+        with self._cond:
+            jobs = [job for job in self._jobs.values() if predicate(job)]
+        for job in jobs:
+            self.cancel(job.id)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            for job in list(self._jobs.values()):
+                job._cancel.set()
+            self._cond.notify_all()
+
+    # ----- workers -----
+
+    def _can_start(self, job):
+        if job.priority == INTERACTIVE:
+            return True
+        if self._interactive_active:
+            return False
+        # Keep one thread free for interactive work (unless there is only one)
+        return self._running_background < max(1, self.max_workers - 1)
+
+    def _next_job(self):
+        with self._cond:
+            while True:
+                if self._stopped:
+                    return None
+                # Drop entries of cancelled, finished or re-prioritised jobs
+                while self._heap:
+                    priority, _, job = self._heap[0]
+                    if job.state != PENDING or job.priority != priority:
+                        heapq.heappop(self._heap)
+                        continue
+                    break
+                if self._heap and self._can_start(self._heap[0][2]):
+                    job = heapq.heappop(self._heap)[2]
+                    job.state = RUNNING
+                    if job.priority != INTERACTIVE:
+                        self._running_background += 1
+                    return job
+                self._cond.wait()
+
+    def _finish(self, job, state):
+        # Called with self._cond held
+        if job.state == RUNNING and job.priority != INTERACTIVE:
+            self._running_background -= 1
+        if job.priority == INTERACTIVE:
+            self._interactive_active -= 1
+        job.state = state
+        self._jobs.pop(job.id, None)
+        self._cond.notify_all()
+        if state == CANCELLED:
+            self.cancelled.emit(job)
+
+    def _loop(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            self.started.emit(job)
+            try:
+                job.result = job.fn(job, *job.args, **job.kwargs)
+                state = DONE
+            except JobCancelled:
+                state = CANCELLED
+            except Exception as e:
+                job.error = e
+                state = FAILED
+                print(f"Job {job.id} failed:", e)
+            with self._cond:
+                self._finish(job, state)
+            if state == DONE:
+                self.finished.emit(job)
+            elif state == FAILED:
+                self.failed.emit(job)
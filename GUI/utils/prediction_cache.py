@@ -0,0 +1,77 @@
+"""In-memory cache of raw predictions for the threshold slider.
+
+Each image is inferred once at ``PREDICTION_FLOOR`` and the full prediction
+set is kept here.  Moving the threshold slider only re-filters the cached
+boxes, so it never goes back to the model.
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+# Confidence every image is inferred at; the slider filters above this
+PREDICTION_FLOOR = 0.01
+
+
+class Prediction:
+    """Full prediction set for one image and model.
+
+    ``bbox`` is an (N, 4) float32 array of xyxy boxes; ``confidence`` and
+    ``classes`` are length-N float32 arrays.  ``original`` is the decoded
+    image (a SharedImage) the boxes were predicted on, or None when the
+    result came from the on-disk detection cache.  ``timings`` holds the
+    per-stage timings (ms) of producing it and ``source`` where it came from
+    ("worker" or "disk_cache").  ``stage`` is what a cascaded detection did
+    (models.cascade.FULL or SCREENED_CLEAN), None for a plain one.
+    """
+
+    def __init__(self, original, bbox, confidence, classes, timings=None, source=None, stage=None):
+        self.original = original
+        self.timings = timings
+        self.source = source
+        self.stage = stage
+        self.bbox = np.asarray(bbox, dtype=np.float32).reshape(-1, 4)
+        self.confidence = np.asarray(confidence, dtype=np.float32).reshape(-1)
+        self.classes = np.asarray(classes, dtype=np.float32).reshape(-1)
+
+    def __len__(self):
+        return len(self.confidence)
+
+    def filtered(self, threshold):
+        """Returns (bbox, confidence, classes) for the boxes at or above ``threshold``."""
+        keep = self.confidence >= threshold
+        return self.bbox[keep], self.confidence[keep], self.classes[keep]
+
+
+def prediction_key(image_path, model_name, tiling=None, cascade=None):
+    """Cache key for one image, model and inference mode."""
+    return (image_path, model_name, tuple(sorted(tiling.items())) if tiling else None,
+            tuple(sorted(cascade.items())) if cascade else None)
+
+
+class PredictionCache:
+    """Small LRU of Predictions keyed by ``prediction_key``.
+
+    Entries hold the decoded image, so keep ``max_entries`` modest.
+    """
+
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        prediction = self._entries.get(key)
+        if prediction is not None:
+            self._entries.move_to_end(key)
+        return prediction
+
+    def put(self, key, prediction):
+        self._entries[key] = prediction
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def clear(self):
+        self._entries.clear()
@@ -0,0 +1,156 @@
+"""Speculative, low-priority inference of the next gallery images.
+
+While an inspector looks at image i, the images i+1..i+k are decoded and
+inferred in the background so that moving on shows detections at once.
+Prefetch jobs run on the shared JobScheduler below interactive work, back
+off while the CPU is busy with something else, and are cancelled as soon as
+the inspector moves to another image, model, tiling or cascade setting.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils.image_store import get_proxy
+from utils.jobs import PREFETCH
+from utils.prediction_cache import prediction_key
+
+PREFETCH_DEPTH = 3
+# Back off while the machine is busier than this (0-1), outside our own inference
+BUSY_THRESHOLD = 0.6
+BACKOFF_MIN_S = 0.5
+BACKOFF_MAX_S = 8.0
+# How often a backing-off prefetch checks whether it was promoted or cancelled
+PROMOTION_POLL_S = 0.05
+
+
+def _read_cpu_times():
+    with open("/proc/stat") as f:
+        fields = [int(v) for v in f.readline().split()[1:]]
+    idle = fields[3] + fields[4]  # idle + iowait
+    return idle, sum(fields)
+
+
+def cpu_busy_fraction(interval=0.2):
+    """System-wide CPU utilisation (0-1) over ``interval`` seconds, or None if unknown."""
+    try:
+        idle0, total0 = _read_cpu_times()
+        time.sleep(interval)
+        idle1, total1 = _read_cpu_times()
+    except (OSError, ValueError, IndexError):
+        # Not Linux: fall back to the load average, if there is one
+        try:
+            return min(os.getloadavg()[0] / (os.cpu_count() or 1), 1.0)
+        except (AttributeError, OSError):
+            return None
+    total = total1 - total0
+    return 1.0 - (idle1 - idle0) / total if total > 0 else None
+
+
+class PreviewCache:
+    """Small thread-safe LRU of box-sized QImages keyed by (path, mtime).
+
+    Filled by the prefetch thread (QImage, unlike QPixmap, may be used off
+    the GUI thread) so that showing the next image skips decoding it.
+    """
+
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(image_path, size):
+        try:
+            mtime = os.path.getmtime(image_path)
+        except OSError:
+            return None
+        return image_path, mtime, size.width(), size.height()
+
+    def get(self, image_path, size):
+        key = self._key(image_path, size)
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+            return image
+
+    def load(self, image_path, size):
+        """Returns the cached preview, decoding and scaling it on a miss. None if unreadable."""
+        image = self.get(image_path, size)
+        if image is not None:
+            return image
+        # Decoded once for every viewer; scaled from its smallest large-enough proxy
+        image = get_proxy(image_path, size)
+        if image is None:
+            return None
+        key = self._key(image_path, size)
+        with self._lock:
+            self._entries[key] = image
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return image
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class Prefetcher:
+    """Submits prefetch jobs for the images after the one being inspected.
+
+    Jobs go through the shared JobScheduler at PREFETCH priority, so they
+    only run while no interactive detection is waiting; ``job_fn(job, path,
+    model_name, tiling, cascade)`` does the inference.
+    """
+
+    def __init__(self, scheduler, job_fn, previews, preview_size, depth=PREFETCH_DEPTH,
+                 busy_threshold=BUSY_THRESHOLD):
+        self.scheduler = scheduler
+        self.job_fn = job_fn
+        self.previews = previews
+        self.preview_size = preview_size
+        self.depth = depth
+        self.busy_threshold = busy_threshold
+
+    def schedule(self, image_paths, index, model_name, tiling=None, skip=None, cascade=None):
+        """Prefetches the ``depth`` images after ``image_paths[index]``, cancelling other prefetches.
+
+        ``skip(key)`` returns True for prediction keys that are already cached.
+        """
+        wanted = {}
+        for path in image_paths[index + 1:index + 1 + self.depth]:
+            key = prediction_key(path, model_name, tiling, cascade)
+            if skip is None or not skip(key):
+                wanted[key] = path
+        # A prefetch of the image now on screen is kept too: Detect will wait for it
+        keep = set(wanted) | {prediction_key(image_paths[index], model_name, tiling, cascade)}
+        self.scheduler.cancel_where(lambda job: job.priority == PREFETCH and job.key not in keep)
+        for key, path in wanted.items():
+            if self.scheduler.find(key) is None:
+                self.scheduler.submit(self._prefetch, path, model_name, tiling, cascade, priority=PREFETCH,
+                                      key=key, kind="detect")
+
+    def cancel(self):
+        self.scheduler.cancel_where(lambda job: job.priority == PREFETCH)
+
+    def _wait_for_idle_cpu(self, job):
+        # Sampled between our own inferences, so this is someone else's load.
+        # A job promoted by Detect (jobs.promote) stops waiting at once.
+        backoff = BACKOFF_MIN_S
+        while job.priority == PREFETCH:
+            job.check_cancelled()
+            busy = cpu_busy_fraction()
+            if busy is None or busy <= self.busy_threshold:
+                return
+            deadline = time.monotonic() + backoff
+            while job.priority == PREFETCH and time.monotonic() < deadline:
+                job.check_cancelled()
+                time.sleep(max(0.0, min(PROMOTION_POLL_S, deadline - time.monotonic())))
+            backoff = min(backoff * 2, BACKOFF_MAX_S)
+
+    def _prefetch(self, job, path, model_name, tiling, cascade):
+        self._wait_for_idle_cpu(job)
+        self.previews.load(path, self.preview_size)
+        job.check_cancelled()
+        return self.job_fn(job, path, model_name, tiling, cascade)
@@ -0,0 +1,194 @@
+"""Gallery thumbnails, decoded off the GUI thread and cached on disk.
+
+``add_thumbnail`` used to decode every full-resolution image on the GUI
+thread and smooth-scale it, so opening a folder of large radiographs froze
+the window for every batch of thumbnails.  Thumbnails are now produced by a
+small thread pool with reduced-resolution decoding (JPEG DCT scaling through
+PIL's draft mode, ``cv2.IMREAD_REDUCED_*`` for other formats) and handed to
+the gallery through ``ThumbnailLoader.ready`` as they arrive.  Each one is
+also written to a disk cache keyed by path, mtime, file size and thumbnail
+size, so reopening a folder shows its thumbnails at once.
+"""
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from PIL import Image
+from PyQt5 import QtCore, QtGui
+
+from utils.detection_cache import DEFAULT_CACHE_DIR
+
+THUMBNAIL_SIDE = 320
+DEFAULT_THUMBNAIL_DIR = os.path.join(DEFAULT_CACHE_DIR, "thumbnails")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+_REDUCED_FLAGS = {2: cv2.IMREAD_REDUCED_COLOR_2, 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+
+def reduced_decode(image_path, side=THUMBNAIL_SIDE):
+    """RGB uint8 array of ``image_path`` fitting in side x side, decoded at reduced resolution; None if unreadable."""
+    try:
+        with Image.open(image_path) as image:
+            width, height = image.size
+            if image.format == "JPEG":
+                # libjpeg decodes straight to 1/2, 1/4 or 1/8 scale
+                image.draft("RGB", (side, side))
+                rgb = np.asarray(image.convert("RGB"))
+            else:
+                rgb = None
+    except (OSError, ValueError):
+        return None
+
+    if rgb is None:
+        # Largest power-of-two reduction that still leaves at least ``side`` pixels on the long edge
+        factor = 1
+        while factor < 8 and max(width, height) // (factor * 2) >= side:
+            factor *= 2
+        bgr = cv2.imread(image_path, _REDUCED_FLAGS.get(factor, cv2.IMREAD_COLOR))
+        if bgr is not None:
+            rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
+        else:
+            # e.g. GIF, which OpenCV cannot read
+            try:
+                with Image.open(image_path) as image:
+                    image.thumbnail((side, side))
+                    rgb = np.asarray(image.convert("RGB"))
+            except (OSError, ValueError):
+                return None
+
+    h, w = rgb.shape[:2]
+    scale = min(side / w, side / h)
+    if scale < 1:
+        rgb = cv2.resize(rgb, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+    return np.ascontiguousarray(rgb)
+
+
+def qimage_from_rgb(rgb):
+    """QImage owning a copy of an (H, W, 3) uint8 RGB array."""
+    h, w = rgb.shape[:2]
+    return QtGui.QImage(rgb.data, w, h, rgb.strides[0], QtGui.QImage.Format_RGB888).copy()
+
+
+class ThumbnailCache:
+    """Thumbnails as small JPEGs in a directory, named by a hash of (path, mtime, size, side)."""
+
+    def __init__(self, directory=DEFAULT_THUMBNAIL_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _file(self, image_path, side):
+        try:
+            st = os.stat(image_path)
+        except OSError:
+            return None
+        key_src = f"{os.path.abspath(image_path)}\0{st.st_mtime_ns}\0{st.st_size}\0{side}"
+        return os.path.join(self.directory, hashlib.sha1(key_src.encode("utf-8")).hexdigest() + ".jpg")
+
+    def get(self, image_path, side):
+        """The cached thumbnail (QImage), or None."""
+        path = self._file(image_path, side)
+        if path is None or not os.path.exists(path):
+            return None
+        image = QtGui.QImage(path)
+        return None if image.isNull() else image
+
+    def put(self, image_path, side, rgb):
+        path = self._file(image_path, side)
+        if path is None:
+            return
+        # Written aside and renamed, so a reader never sees half a file (the extension picks the encoder)
+        tmp = f"{path[:-len('.jpg')]}.{threading.get_ident()}.tmp.jpg"
+        try:
+            if cv2.imwrite(tmp, cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, 90]):
+                os.replace(tmp, path)
+        except (cv2.error, OSError) as e:
+            # The cache is only an optimisation; the thumbnail is still shown
+            print(f"Could not cache the thumbnail of {image_path}:", e)
+
+    def prune(self):
+        """Deletes the least recently used thumbnails until the directory is under ``max_bytes``."""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file():
+                    st = entry.stat()
+                    entries.append((max(st.st_atime, st.st_mtime), st.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+class ThumbnailLoader(QtCore.QObject):
+    """Produces thumbnails on a thread pool; ``ready`` is delivered on the GUI thread.
+
+    ``cancel()`` drops every request not yet started (e.g. when another
+    folder is opened); results of requests from before the cancel are not
+    delivered.  ``retain(paths)`` drops only the requests not yet started for
+    other paths, e.g. rows the gallery has scrolled away from.
+    """
+
+    ready = QtCore.pyqtSignal(str, QtGui.QImage)  # image path, thumbnail (null if unreadable)
+
+    def __init__(self, side=THUMBNAIL_SIDE, max_workers=None, cache=None):
+        super().__init__()
+        self.side = side
+        self.cache = cache if cache is not None else ThumbnailCache()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or min(4, os.cpu_count() or 1),
+                                        thread_name_prefix="thumbnails")
+        self._generation = 0
+        self._pending = set()  # paths requested and not delivered yet (GUI thread only)
+        self._retained = None  # if set, the only paths still worth decoding
+        self.ready.connect(self._delivered)
+        self._pool.submit(self.cache.prune)
+
+    def request(self, image_path):
+        if image_path in self._pending:
+            return
+        self._pending.add(image_path)
+        self._pool.submit(self._load, image_path, self._generation)
+
+    def retain(self, image_paths):
+        """Skips the requests not yet started unless they are for one of ``image_paths``."""
+        self._retained = frozenset(image_paths)
+        self._pending &= self._retained
+
+    def cancel(self):
+        self._generation += 1
+        self._pending.clear()
+        self._retained = None
+
+    def stop(self):
+        self.cancel()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _delivered(self, image_path, image):
+        self._pending.discard(image_path)
+
+    def _load(self, image_path, generation):
+        retained = self._retained
+        if generation != self._generation or (retained is not None and image_path not in retained):
+            return
+        try:
+            image = self.cache.get(image_path, self.side)
+            if image is None:
+                rgb = reduced_decode(image_path, self.side)
+                if rgb is None:
+                    image = QtGui.QImage()
+                else:
+                    image = qimage_from_rgb(rgb)
+                    self.cache.put(image_path, self.side, rgb)
+        except Exception as e:
+            print(f"Thumbnail of {image_path} failed:", e)
+            image = QtGui.QImage()
+        if generation == self._generation:
+            self.ready.emit(image_path, image)